@@ -1,9 +1,14 @@
+import os
 import socket
+import sys
 import threading
 import pickle
 import pygame
 import random
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ver8'))  # Share the client message codec
+from codec import encode
+
 pygame.init()
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
@@ -22,9 +27,10 @@ KEY_DIRECTION = {
 }
 
 class SnakeClient:
-    def __init__(self, host='localhost', port=5555):
+    def __init__(self, host='localhost', port=5555, room_id=0):
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.client.connect((host, port))
+        self.client.sendall(encode({"room_id": room_id}))  # The server waits for a room choice before the game starts
         self.running = True
         self.snake = [(random.randint(0, 19), random.randint(0, 19))]
         self.score = 0
@@ -53,7 +59,7 @@ class SnakeClient:
 
     def send_data(self, data):
         try:
-            self.client.send(pickle.dumps(data))
+            self.client.send(encode(data))  # The server only accepts the codec format
         except socket.error:
             self.stop()
 
@@ -1,9 +1,37 @@
+import collections
+import os
+import selectors
 import socket
+import sys
 import threading
 import pickle
 import random
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ver8'))  # Share the client message codec
+from codec import HEADER, MSG_INPUT, MSG_ROOM, ROOM_BODY, DecodeError, Decoder, decode
+
+IDLE_TIMEOUTS = 3  # Disconnect after this many consecutive silent timeouts (conn timeout is 10s)
+HANDSHAKE_TIMEOUT = 10  # Seconds a new connection gets to receive the room list and pick a room
+ROOM_CHOICE_SIZE = HEADER.size + ROOM_BODY.size  # Encoded {"room_id": n} (fixed size, parsed once complete)
+GRID_SIZE = (20, 20)  # (width, height) in cells; moves outside the grid are rejected by the decoder
+
+
+class Handshake:
+    """Room handshake of one new connection, advanced by the accept loop whenever its socket is ready"""
+    SENDING = "sending"  # Sending the room list
+    CHOOSING = "choosing"  # Waiting for the codec room choice {"room_id": ...}
+
+    def __init__(self, conn, addr, rooms_message):
+        self.conn = conn
+        self.addr = addr
+        self.state = Handshake.SENDING
+        self.outgoing = rooms_message
+        self.incoming = b''
+        self.accepted = time.monotonic()
+        self.deadline = self.accepted + HANDSHAKE_TIMEOUT
+
+
 class GameServer:
     def __init__(self, host='localhost', port=5555, max_rooms=5):
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -14,45 +42,63 @@ class GameServer:
         self.rooms = {i: [] for i in range(max_rooms)}
         self.scores = {i: {} for i in range(max_rooms)}  # Track scores per room
         self.top_scores = {i: 0 for i in range(max_rooms)}
+        self.selector = selectors.DefaultSelector()
+        self.handshakes = {}  # conn -> Handshake (only used by the accept loop)
+        self.join_latencies = collections.deque(maxlen=1000)  # Seconds from accept to playing, most recent clients
+        self.handshake_failures = collections.Counter()  # reason -> count
 
-    def handle_client(self, conn, addr, room_id):
+    def handle_client(self, conn, addr, room_id, accepted=None, initial=b''):
+        """:param initial: Bytes the client sent right after its room choice (read during the handshake)"""
         print(f"New connection from {addr} in Room {room_id}")
         conn.send(pickle.dumps({"message": "Welcome to the Snake Battle Game!"}))
+        if accepted is not None:
+            latency = time.monotonic() - accepted
+            self.join_latencies.append(latency)
+            print(f"Client {addr} playing {latency * 1000:.1f} ms after accept")
 
         player_snake = [(random.randint(0, 19), random.randint(0, 19))]  # Random spawn
         self.clients[conn] = {"snake": player_snake, "score": 0}
 
+        silent_timeouts = 0
+        decoder = Decoder(GRID_SIZE)  # Game input is schema-checked binary, never unpickled
         try:
             while True:
                 try:
-                    data = conn.recv(4096)
+                    data, initial = initial or conn.recv(4096), b''
                     if not data:
                         break
-                    # Packet loss detection and recovery exception handling
-                    try:
-                        data = pickle.loads(data)
-                    except (pickle.UnpicklingError, EOFError):
-                        print(f"Packet loss detected from {addr}. Ignoring corrupt data.")
-                        continue  # Ignore the data and process the next packet
-
-                    self.update_game_state(conn, data, room_id)
+                    silent_timeouts = 0
+                    # Several inputs can arrive in one recv, or one input can be split across recvs
+                    for message in decoder.feed(data):
+                        if message[0] == MSG_INPUT:  # Skip keepalives
+                            self.update_game_state(conn, message, room_id)
+                except DecodeError as e:
+                    # The rest of a malformed stream cannot be trusted either
+                    print(f"Invalid data received from {addr} ({e}). Closing connection.")
+                    break
                 except (ConnectionResetError, BrokenPipeError):
                     # Client disconnection exception handling
                     print(f"Connection lost with {addr}. Handling disconnection.")
                     break
                 except socket.timeout:
                     # Client response timeout exception handling
+                    silent_timeouts += 1
+                    if silent_timeouts >= IDLE_TIMEOUTS:
+                        # A peer that vanished without FIN/RST never wakes recv, so free its slot here
+                        print(f"No data from {addr} for {silent_timeouts * 10}s. Treating client as dead.")
+                        break
                     print(f"Timeout from {addr}. Client may have high latency.")
                     continue  # Wait again when timeout occurs
 
         finally:
             self.disconnect_client(conn, addr, room_id)
 
-    def update_game_state(self, conn, data, room_id):
-        if "move" in data:
-            self.clients[conn]["snake"] = data["move"]
-        if "score" in data:
-            self.clients[conn]["score"] = data["score"]
+    def update_game_state(self, conn, message, room_id):
+        _, move, score = message  # Decoded codec input (MSG_INPUT, cells, score)
+        if move is not None:
+            self.clients[conn]["snake"] = move
+        if score is not None:
+            self.clients[conn]["score"] = score
             # Update top score
             self.top_scores[room_id] = max(self.top_scores[room_id], self.clients[conn]["score"])
         self.broadcast_game_state(room_id)
@@ -81,22 +127,104 @@ class GameServer:
             del self.clients[conn]
 
     def start(self):
+        # Accept loop and room handshakes share one selector, so a slow client only delays itself
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ)
+        while True:
+            timeout = None
+            if self.handshakes:
+                timeout = max(0, min(h.deadline for h in self.handshakes.values()) - time.monotonic())
+            for key, events in self.selector.select(timeout):
+                if key.fileobj is self.server:
+                    self.accept_clients()
+                else:
+                    try:
+                        self.advance_handshake(key.data, events)
+                    except Exception as e:  # One bad client must never stop the accept loop
+                        print(f"Handshake with {key.data.addr} failed: {e!r}")
+                        if key.data.conn in self.handshakes:
+                            self.fail_handshake(key.data, "error")
+            self.expire_handshakes()
+
+    def accept_clients(self):
+        rooms_message = pickle.dumps({"rooms": list(self.rooms.keys())})
         while True:
-            conn, addr = self.server.accept()
-            conn.settimeout(10)  # Set client response latency
-            conn.send(pickle.dumps({"rooms": list(self.rooms.keys())}))
-            room_id = pickle.loads(conn.recv(4096)).get("room_id", 0)
             try:
+                conn, addr = self.server.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            handshake = Handshake(conn, addr, rooms_message)
+            self.handshakes[conn] = handshake
+            self.selector.register(conn, selectors.EVENT_WRITE, handshake)
+
+    def advance_handshake(self, handshake, events):
+        conn = handshake.conn
+        try:
+            if handshake.state == Handshake.SENDING and events & selectors.EVENT_WRITE:
+                sent = conn.send(handshake.outgoing)
+                handshake.outgoing = handshake.outgoing[sent:]
+                if not handshake.outgoing:
+                    handshake.state = Handshake.CHOOSING
+                    self.selector.modify(conn, selectors.EVENT_READ, handshake)
+            elif handshake.state == Handshake.CHOOSING and events & selectors.EVENT_READ:
+                data = conn.recv(4096)
+                if not data:
+                    self.fail_handshake(handshake, "closed")
+                    return
+                handshake.incoming += data
+                if len(handshake.incoming) < ROOM_CHOICE_SIZE:
+                    return  # Wait for the rest of the choice
+                try:
+                    choice = decode(handshake.incoming[:ROOM_CHOICE_SIZE])[0]  # Schema-checked, never unpickled
+                except DecodeError:
+                    choice = []
+                room_id = choice[0][1] if choice and choice[0][0] == MSG_ROOM else None
                 if room_id in self.rooms:
-                    self.rooms[room_id].append(conn)
-                    thread = threading.Thread(target=self.handle_client, args=(conn, addr, room_id))
-                    thread.start()
+                    self.join_room(handshake, room_id)
                 else:
-                    conn.close()
-            except (EOFError, pickle.UnpicklingError):
-                # Initial data processing failure exception handling
-                print(f"Invalid data received from {addr}. Closing connection.")
-                conn.close()
+                    self.fail_handshake(handshake, "invalid")
+        except (BlockingIOError, InterruptedError):
+            pass  # Spurious wakeup, try again on the next event
+        except OSError:
+            self.fail_handshake(handshake, "closed")
+
+    def join_room(self, handshake, room_id):
+        conn = handshake.conn
+        self.selector.unregister(conn)
+        del self.handshakes[conn]
+        conn.setblocking(True)
+        conn.settimeout(10)  # Set client response latency
+        self.rooms[room_id].append(conn)
+        thread = threading.Thread(target=self.handle_client,
+                                  args=(conn, handshake.addr, room_id, handshake.accepted, handshake.incoming[ROOM_CHOICE_SIZE:]))
+        thread.start()
+
+    def fail_handshake(self, handshake, reason):
+        if reason == "invalid":
+            # Initial data processing failure exception handling
+            print(f"Invalid data received from {handshake.addr}. Closing connection.")
+        elif reason == "timeout":
+            print(f"No room choice from {handshake.addr} within {HANDSHAKE_TIMEOUT}s. Closing connection.")
+        self.handshake_failures[reason] += 1
+        self.selector.unregister(handshake.conn)
+        del self.handshakes[handshake.conn]
+        handshake.conn.close()
+
+    def expire_handshakes(self):
+        now = time.monotonic()
+        for handshake in [h for h in self.handshakes.values() if h.deadline <= now]:
+            self.fail_handshake(handshake, "timeout")
+
+    def handshake_stats(self):
+        """Accept-to-playing latency (ms) of recent clients and handshake failure counts"""
+        latencies = sorted(self.join_latencies)
+        stats = {"pending": len(self.handshakes), "failures": dict(self.handshake_failures), "joined": len(latencies)}
+        if latencies:
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+            stats.update(p50_ms=percentile(0.5), p99_ms=percentile(0.99), max_ms=round(latencies[-1] * 1000, 1))
+        return stats
 
 if __name__ == "__main__":
     server = GameServer()
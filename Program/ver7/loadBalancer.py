@@ -85,13 +85,21 @@ class LoadBalancer:
         except (socket.error, socket.timeout):
             return False
 
+    @staticmethod
     def is_socket_alive(sock):
         """
         소켓이 유효한지 확인.
+        빈 데이터 전송은 아무 패킷도 보내지 않아 끊긴 상대를 알아낼 수 없으므로,
+        블로킹 없이 수신 버퍼를 엿봐서 상대가 연결을 닫았는지(b'') 확인.
         """
         try:
-            sock.send(b'')  # 빈 데이터를 전송하여 상태 확인
-            return True
+            sock.setblocking(False)
+            try:
+                return sock.recv(1, socket.MSG_PEEK) != b''  # 받은 데이터가 있으면 살아 있음
+            finally:
+                sock.setblocking(True)
+        except BlockingIOError:
+            return True  # 보낸 것은 없지만 연결은 열려 있음
         except socket.error:
             return False
 
@@ -0,0 +1,105 @@
+import json
+import socket
+import threading
+
+import jsonlog
+from matchmaking import DEFAULT_MAP
+
+log = jsonlog.get_logger("admin")
+
+HELP = """commands:
+  status                              backends, rooms, sessions and drain state
+  add HOST:PORT [CAPACITY] [WEIGHT] [MAP]
+                                      start routing to a new backend (MAP defaults to "default")
+  remove HOST:PORT                    stop routing to a backend (open sessions keep running)
+  capacity HOST:PORT N|none           change per-server client limit
+  weight HOST:PORT W                  change routing weight (0 = no new clients)
+  drain                               stop accepting clients, exit once sessions end"""
+
+
+def parse_address(text):
+    host, port = text.rsplit(':', 1)
+    return (host, int(port))
+
+
+class AdminServer:
+    """
+    로드 밸런서 관리 소켓 (localhost 전용, 한 줄 명령 -> 한 줄 JSON 응답).
+    밸런서를 재시작하지 않고 서버 목록/정원/가중치를 바꾸고 상태를 확인.
+    """
+
+    def __init__(self, balancer, host='localhost', port=8081):
+        self.balancer = balancer
+        self.host = host
+        self.port = port
+
+    def start(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen()
+        self.port = listener.getsockname()[1]
+        log.info("admin_started", host=self.host, port=self.port)
+        threading.Thread(target=self.accept_loop, args=(listener,), daemon=True).start()
+        return self
+
+    def accept_loop(self, listener):
+        while True:
+            conn, addr = listener.accept()
+            threading.Thread(target=self.handle, args=(conn, addr), daemon=True).start()
+
+    def handle(self, conn, addr):
+        with conn, conn.makefile('rw') as stream:
+            for line in stream:
+                if not line.strip():
+                    continue
+                try:
+                    response = self.execute(line.split())
+                except (ValueError, IndexError) as e:
+                    response = {"ok": False, "error": str(e) or "bad arguments", "help": HELP}
+                log.info("admin_command", addr=addr, command=line.strip(), ok=response.get("ok"))
+                stream.write(json.dumps(response) + "\n")
+                stream.flush()
+
+    def execute(self, args):
+        """명령 실행. :return: 응답 dict"""
+        command, rest = args[0].lower(), args[1:]
+        balancer = self.balancer
+        if command == "status":
+            return {"ok": True, **balancer.describe()}
+        if command == "add":
+            capacity = int(rest[1]) if len(rest) > 1 and rest[1] != "none" else None
+            weight = float(rest[2]) if len(rest) > 2 else 1.0
+            map_name = rest[3] if len(rest) > 3 else DEFAULT_MAP
+            return {"ok": balancer.add_server(parse_address(rest[0]), capacity, weight, map_name)}
+        if command == "remove":
+            return {"ok": balancer.remove_server(parse_address(rest[0]))}
+        if command == "capacity":
+            capacity = None if rest[1] == "none" else int(rest[1])
+            return {"ok": balancer.set_capacity(parse_address(rest[0]), capacity)}
+        if command == "weight":
+            return {"ok": balancer.set_weight(parse_address(rest[0]), float(rest[1]))}
+        if command == "drain":
+            balancer.drain()
+            return {"ok": True, "sessions": len(balancer.sessions)}
+        return {"ok": False, "error": f"unknown command {command!r}", "help": HELP}
+
+
+def send_command(command, host='localhost', port=8081):
+    """관리 소켓에 명령 한 줄을 보내고 응답 반환"""
+    with socket.create_connection((host, port), timeout=5) as sock, sock.makefile('rw') as stream:
+        stream.write(command + "\n")
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load balancer admin CLI", epilog=HELP,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8081, help='Admin port of the load balancer')
+    parser.add_argument('command', nargs='+', help='Command and arguments')
+    args = parser.parse_args()
+
+    print(json.dumps(send_command(" ".join(args.command), port=args.port), indent=2))
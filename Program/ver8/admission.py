@@ -0,0 +1,128 @@
+import collections
+import pickle
+import socket
+import threading
+import time
+
+MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+
+
+class TokenBucket:
+    """
+    토큰 버킷. 초당 rate 개씩 채워지고 최대 burst 개까지 쌓임.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now=None):
+        """토큰 하나를 쓸 수 있으면 True"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AdmissionControl:
+    """
+    로드 밸런서 연결 수락 제어.
+      - 전체 / 출발지 IP 별 토큰 버킷으로 초당 수락 수 제한 (None 이면 제한 없음)
+      - 빈 서버가 없을 때 기다릴 수 있는 연결 수를 queue_limit 으로 제한 (넘치면 바로 거절)
+      - 최근 세션 종료 간격으로 대기 시간을 추정해 클라이언트에 알려 줌
+    """
+
+    def __init__(self, rate=None, burst=None, per_ip_rate=None, per_ip_burst=None, queue_limit=64):
+        self.global_bucket = TokenBucket(rate, burst or max(1, rate)) if rate else None
+        self.per_ip_rate = per_ip_rate
+        self.per_ip_burst = per_ip_burst or (max(1, per_ip_rate) if per_ip_rate else None)
+        self.ip_buckets = {}  # IP -> TokenBucket
+        self.queue_limit = queue_limit
+        self.waiting = collections.deque()  # [(클라이언트 연결, 주소, 대기 시작 시각, 요청 맵)]
+        self.departure_interval = None  # 세션 종료 간격 지수 이동 평균 (초)
+        self.last_departure = None
+        self.lock = threading.Lock()
+
+    def admit(self, ip):
+        """이번 연결을 받아도 되는지 (전체, IP 별 버킷 모두 토큰이 있어야 함)"""
+        now = time.monotonic()
+        with self.lock:
+            if self.per_ip_rate:
+                bucket = self.ip_buckets.get(ip)
+                if bucket is None:
+                    if len(self.ip_buckets) >= 10000:
+                        self.prune(now)
+                    bucket = self.ip_buckets[ip] = TokenBucket(self.per_ip_rate, self.per_ip_burst)
+                if not bucket.take(now):
+                    return False
+            return self.global_bucket is None or self.global_bucket.take(now)
+
+    def prune(self, now):
+        """버킷이 가득 찰 만큼 오래 조용했던 IP 정리 (메모리 상한 유지)"""
+        full_after = self.per_ip_burst / self.per_ip_rate
+        for ip, bucket in list(self.ip_buckets.items()):
+            if now - bucket.updated > full_after:
+                del self.ip_buckets[ip]
+
+    def enqueue(self, conn, addr, map_name=None):
+        """
+        :param map_name: 클라이언트가 원하는 맵 (None 이면 아무 맵)
+        :return: 대기 순번 (1부터), 대기열이 가득 찼으면 None
+        """
+        with self.lock:
+            if len(self.waiting) >= self.queue_limit:
+                return None
+            self.waiting.append((conn, addr, time.monotonic(), map_name))
+            return len(self.waiting)
+
+    def dequeue(self):
+        """가장 오래 기다린 연결 (없으면 None)"""
+        with self.lock:
+            return self.waiting.popleft() if self.waiting else None
+
+    def requeue(self, entry):
+        """배정에 실패한 연결을 맨 앞으로 되돌림 (여러 개면 뒤에서부터 되돌려야 순서 유지)"""
+        with self.lock:
+            self.waiting.appendleft(entry)
+
+    def note_departure(self):
+        """세션 종료 기록 (대기 시간 추정용)"""
+        now = time.monotonic()
+        with self.lock:
+            if self.last_departure is not None:
+                interval = now - self.last_departure
+                self.departure_interval = interval if self.departure_interval is None else \
+                    0.8 * self.departure_interval + 0.2 * interval
+            self.last_departure = now
+
+    def estimated_wait(self, position):
+        """대기 순번의 예상 대기 시간 (초). 아직 추정할 기록이 없으면 None"""
+        if self.departure_interval is None:
+            return None
+        return round(position * self.departure_interval, 1)
+
+
+def notify(conn, message):
+    """
+    거절/대기 안내 메시지를 블로킹 없이 한 번 보내 봄 (클라이언트가 읽지 않아도 accept 루프가 멈추지 않도록)
+    :return: 보냈으면 True, 연결이 끊겼거나 송신 버퍼가 가득 찼으면 False
+    """
+    try:
+        if MSG_DONTWAIT:
+            conn.send(pickle.dumps(message), MSG_DONTWAIT)
+        else:
+            conn.setblocking(False)
+            try:
+                conn.send(pickle.dumps(message))
+            finally:
+                conn.setblocking(True)
+        return True
+    except OSError:
+        return False
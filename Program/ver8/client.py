@@ -1,15 +1,20 @@
 import socket
 import threading
-import pickle
 import pygame
 import random
 
+from codec import encode
+from protocol import MessageStream, is_keepalive
+from world import DEFAULT_SIZE as DEFAULT_WORLD_SIZE, Viewport
+
 # 파이게임 초기화 🌟 뱀이 움직일 준비 완료!
 pygame.init()
 WHITE = (255, 255, 255)  # 화면 배경색 🎨
 RED = (255, 0, 0)        # 사과 색 🍎
 GREEN = (0, 255, 0)      # 뱀 색 🐍
-size = [400, 440]        # 화면 크기 설정 (점수 영역 포함) 📏
+CELL = 20                # 칸 한 변의 픽셀 수 📏
+VIEW_ROWS, VIEW_COLS = 20, 20  # 화면에 보이는 칸 수 (월드가 더 크면 뱀을 따라 스크롤) 🗺️
+size = [VIEW_COLS * CELL, VIEW_ROWS * CELL + 40]  # 화면 크기 설정 (점수 영역 포함) 📏
 screen = pygame.display.set_mode(size)  # 게임 창 생성
 pygame.display.set_caption("Multiplayer Snake Game")  # 게임 제목 설정 🌟
 FONT = pygame.font.Font(None, 36)  # 점수 표시 폰트 🎨
@@ -29,7 +34,8 @@ class SnakeClient:
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # 서버와 연결할 소켓 생성 📡
         self.client.connect((host, port))  # 서버 연결 🔗
         self.running = True  # 게임 실행 여부 🌟
-        self.snake = [(random.randint(1, 19), random.randint(0, 19))]  # 뱀 초기 위치 설정 (점수 영역 제외) 🐍
+        self.world = DEFAULT_WORLD_SIZE  # 월드 크기 (가로, 세로). 서버가 세션 메시지로 알려 줌 🗺️
+        self.snake = [(random.randrange(self.world[1]), random.randrange(self.world[0]))]  # 뱀 초기 위치 설정 🐍
         self.score = 0  # 점수 초기화 🎯
         self.top_score = 0  # 최고 점수 초기화 🏆
 
@@ -38,29 +44,37 @@ class SnakeClient:
 
     # 서버에서 데이터 받기 📩
     def receive_data(self):
+        stream = MessageStream()  # recv 경계에서 잘린 상태는 다음 recv 와 이어 붙여 복원
         while self.running:
             try:
                 data = self.client.recv(4096)  # 서버로부터 데이터 받기
                 if not data:  # 연결 종료 시
                     print("Connection closed by the server.")
                     break
-                game_state = pickle.loads(data)  # 데이터 디코딩
-                self.update_game_state(game_state)  # 게임 상태 업데이트
-            except (EOFError, ConnectionResetError):
+                for game_state in stream.feed(data):  # 데이터 디코딩 (서버가 틱 단위로 묶어 보낸 상태 포함)
+                    self.update_game_state(game_state)  # 게임 상태 업데이트
+            except (EOFError, ValueError, ConnectionResetError):
                 print("Connection to the server was interrupted.")
                 break
         self.stop()  # 연결 종료 시 클라이언트 멈춤
 
     # 게임 상태 업데이트 🐍
     def update_game_state(self, state):
+        if is_keepalive(state):  # 서버 keepalive 는 상태가 아님
+            return
+        if "session" in state:  # 세션 메시지: 월드 크기와 서버가 빈 칸에 정해 준 시작 위치 🗺️
+            self.world = tuple(state.get("world", self.world))
+            if state.get("snake"):
+                self.snake = [tuple(cell) for cell in state["snake"]]
+            return
         server_score = state.get("scores", {}).get(self.client, 0)  # 서버 점수 확인
         self.score = max(self.score, server_score)  # 높은 점수로 업데이트 🎯
-        self.top_score = state.get("top_score", 0)  # 최고 점수 업데이트 🏆
+        self.top_score = max(state.get("top_score", 0), state.get("global_top_score", 0))  # 최고 점수 업데이트 (전체 서버 기준) 🏆
 
     # 데이터 서버로 보내기 📤
     def send_data(self, data):
         try:
-            self.client.send(pickle.dumps(data))  # 데이터 인코딩 후 전송
+            self.client.send(encode(data))  # 데이터 인코딩 후 전송 (서버는 codec 형식만 받음)
         except socket.error:
             self.stop()
 
@@ -71,15 +85,17 @@ class SnakeClient:
 
 # 사과 클래스 🍎
 class Apple:
-    def __init__(self):
-        self.position = (random.randint(1, 19), random.randint(0, 19))  # 사과 위치 랜덤 생성 (점수 영역 제외)
+    def __init__(self, world=DEFAULT_WORLD_SIZE):
+        self.position = (random.randrange(world[1]), random.randrange(world[0]))  # 사과 위치 랜덤 생성
 
-    def draw(self):
-        draw_block(screen, RED, self.position)  # 사과 화면에 그리기
+    def draw(self, view):
+        position = view.to_screen(self.position)
+        if position is not None:  # 화면 밖 사과는 그리지 않음
+            draw_block(screen, RED, position)  # 사과 화면에 그리기
 
 # 블록 그리는 함수 🎨
 def draw_block(screen, color, position):
-    block = pygame.Rect((position[1] * 20, position[0] * 20 + 40), (20, 20))  # 블록 크기와 위치 (점수 영역 하단부터 시작)
+    block = pygame.Rect((position[1] * CELL, position[0] * CELL + 40), (CELL, CELL))  # 블록 크기와 위치 (점수 영역 하단부터 시작)
     pygame.draw.rect(screen, color, block)  # 화면에 블록 그리기
 
 # 메인 게임 함수 🎮
@@ -88,10 +104,11 @@ def main():
     running = True  # 게임 루프 실행 여부 🌟
     direction = "E"  # 뱀 초기 방향 설정 🐍➡️
     last_direction = direction  # 이전 방향 저장
-    snake_body = client.snake  # 뱀의 몸체 🐍
-    apple = Apple()  # 사과 생성 🍎
+    apple = Apple(client.world)  # 사과 생성 🍎
+    view = Viewport(VIEW_ROWS, VIEW_COLS)  # 뱀을 따라가는 화면 🗺️
 
     while running:
+        snake_body = client.snake  # 뱀의 몸체 🐍 (서버가 시작 위치를 정해 주면 바뀜)
         screen.fill(WHITE)  # 화면 초기화 🎨
 
         # 점수 표시 영역 배경 그리기 🎯
@@ -125,12 +142,12 @@ def main():
             new_head = (head_y, head_x + 1)
 
         # 벽을 넘어가면 반대편으로 이동 🚧➡️⬅️
-        new_head = (new_head[0] % 20, new_head[1] % 20)
+        new_head = (new_head[0] % client.world[1], new_head[1] % client.world[0])
 
         # 뱀이 사과 먹기 🍎🐍
         if new_head == apple.position:
             snake_body = [new_head] + snake_body  # 몸 길이 증가
-            apple = Apple()  # 새로운 사과 생성
+            apple = Apple(client.world)  # 새로운 사과 생성
             client.score += 1  # 점수 증가 🎯
             client.send_data({"score": client.score})  # 점수 서버에 전송
         else:
@@ -142,12 +159,16 @@ def main():
             running = False
             client.stop()
 
+        client.snake = snake_body
         client.send_data({"move": snake_body})  # 이동 데이터 서버에 전송
 
-        # 뱀과 사과 그리기 🐍🍎
+        # 뱀과 사과 그리기 🐍🍎 (보이는 칸만)
+        view.follow(snake_body[0], client.world)
         for segment in snake_body:
-            pygame.draw.rect(screen, GREEN, (segment[1] * 20, segment[0] * 20 + 40, 20, 20))
-        apple.draw()
+            position = view.to_screen(segment)
+            if position is not None:
+                draw_block(screen, GREEN, position)
+        apple.draw(view)
 
         # 점수 표시 🎯
         score_text = FONT.render(f"Your Score: {client.score}", True, (0, 0, 0))
@@ -3,6 +3,13 @@ import threading
 import pickle
 import pygame
 import random
+import time
+
+from codec import KEEPALIVE, encode
+from protocol import MessageStream, is_keepalive
+from sockopts import DEFAULT as DEFAULT_SOCKET_OPTIONS
+from udp_transport import MAX_DATAGRAM, STATE, InputSender, LossySocket, decode_packet, seq_newer
+from world import DEFAULT_SIZE as DEFAULT_WORLD_SIZE, Viewport
 
 # 파이게임 초기화 🌟
 pygame.init()
@@ -10,11 +17,15 @@ WHITE = (255, 255, 255)  # 화면 배경색 🎨
 RED = (255, 0, 0)        # 사과 색 🍎
 GREEN = (0, 255, 0)      # 자신의 뱀 색 🐍
 LIGHT_GRAY = (200, 200, 200)  # 다른 플레이어의 뱀 색 🐍
-size = [400, 440]        # 화면 크기 설정 📏
+CELL = 20  # 칸 한 변의 픽셀 수
+VIEW_ROWS, VIEW_COLS = 20, 20  # 화면에 보이는 칸 수 (월드가 더 크면 플레이어를 따라 스크롤)
+size = [VIEW_COLS * CELL, VIEW_ROWS * CELL + 40]  # 화면 크기 설정 (점수 영역 포함) 📏
 screen = pygame.display.set_mode(size)
 pygame.display.set_caption("Multiplayer Snake Game")
 FONT = pygame.font.Font(None, 36)
 clock = pygame.time.Clock()
+KEEPALIVE_INTERVAL = 5.0  # TCP 로 이만큼 보낸 것이 없으면 keepalive 전송 (UDP 입력 중에도 세션 유지)
+SERVER_TIMEOUT = 15.0  # 이만큼 아무것도 받지 못하면 서버 연결이 끊긴 것으로 보고 재접속
 
 # 방향키 설정 🧭
 KEY_DIRECTION = {
@@ -26,57 +37,166 @@ KEY_DIRECTION = {
 
 # 클라이언트 클래스 정의 🐍
 class SnakeClient:
-    def __init__(self, host='localhost', port=8080):
+    def __init__(self, host='localhost', port=8080, udp=False, udp_loss=0.0, map_name=None):
+        """
+        :param udp: True 이면 서버가 허용할 때 이동 입력과 상태를 UDP 로 주고받음 (참가/재접속은 TCP)
+        :param udp_loss: 시험용 UDP 송신 손실 확률
+        :param map_name: 로드 밸런서에 요청할 맵 (None 이면 밸런서가 아무 맵의 방에 배정)
+        """
+        self.host = host
+        self.port = port
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        DEFAULT_SOCKET_OPTIONS.apply(self.client)  # 작은 이동 패킷을 Nagle 지연 없이 바로 전송
         self.client.connect((host, port))
+        if map_name:
+            self.client.sendall(b'MATCH ' + map_name.encode() + b'\n')  # 밸런서가 읽고 서버로는 보내지 않음
+        self.client.settimeout(SERVER_TIMEOUT)
+        self.last_sent = time.monotonic()  # 마지막 TCP 전송 시각
         self.running = True
-        self.snake = [(random.randint(1, 19), random.randint(0, 19))]  # 시작 뱀 길이 한 칸
+        self.session_token = None  # 서버가 발급한 재접속 토큰
+        self.reconnecting = False
+        self.world = DEFAULT_WORLD_SIZE  # (가로, 세로) 칸 수. 서버가 세션 메시지로 알려 줌
+        self.snake = [self.random_cell()]  # 시작 뱀 길이 한 칸 (서버가 정해 준 위치로 바뀜)
         self.score = 0
         self.top_score = 0
-        self.apples = [(random.randint(0, 19), random.randint(0, 19))]  # 초기 사과 위치
+        self.apples = [self.random_cell() for _ in range(self.apple_count())]  # 초기 사과 위치
         self.other_snakes = {}  # 다른 플레이어 뱀 정보
+        self.udp = None
+        self.udp_ready = False  # 서버가 UDP 를 지원한다고 알려 준 뒤에만 UDP 로 전송
+        self.state_seq = None  # 마지막으로 반영한 UDP 상태 순번
+        if udp:
+            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            udp_socket.connect((host, port))
+            self.udp = LossySocket(udp_socket, udp_loss) if udp_loss else udp_socket
+            self.inputs = InputSender(self.udp)
+            threading.Thread(target=self.receive_udp, daemon=True).start()
         threading.Thread(target=self.receive_data).start()
+        threading.Thread(target=self.keepalive_loop, daemon=True).start()
+
+    def receive_udp(self):
+        """UDP 상태 수신. 늦게 도착한 오래된 스냅샷은 버리고 최신 상태만 반영"""
+        while self.running:
+            try:
+                kind, seq, _, body = decode_packet(self.udp.recv(MAX_DATAGRAM))
+                if kind == STATE and seq_newer(seq, self.state_seq):
+                    self.state_seq = seq
+                    self.update_game_state(pickle.loads(body))
+            except (ValueError, EOFError, ConnectionError):
+                continue
+            except OSError:
+                break
 
     def receive_data(self):
+        source, stream = self.client, MessageStream()  # recv 경계에서 잘린 상태는 다음 recv 와 이어 붙임
         while self.running:
             try:
-                data = self.client.recv(4096)
+                if self.client is not source:  # 재접속한 연결은 새 버퍼로 시작
+                    source, stream = self.client, MessageStream()
+                data = source.recv(4096)
                 if not data:
+                    raise ConnectionResetError
+                for game_state in stream.feed(data):  # 서버가 틱 단위로 묶어 보낸 상태를 순서대로 반영
+                    self.update_game_state(game_state)
+            except (EOFError, ValueError, OSError):
+                if not self.running or not self.reconnect():
                     break
-                game_state = pickle.loads(data)
-                self.update_game_state(game_state)
-            except (EOFError, ConnectionResetError):
-                break
         self.stop()
 
+    def reconnect(self, attempts=6, delay=0.5):
+        """
+        연결이 끊기면 지수 백오프로 다시 접속하고 재접속 토큰으로 이전 세션(뱀, 점수)을 이어 받음.
+        :return: 재접속 성공 여부
+        """
+        if self.session_token is None:
+            return False
+        self.reconnecting = True
+        try:
+            for _ in range(attempts):
+                time.sleep(delay)
+                delay *= 2
+                try:
+                    conn = socket.create_connection((self.host, self.port), timeout=5)
+                    conn.settimeout(SERVER_TIMEOUT)
+                    DEFAULT_SOCKET_OPTIONS.apply(conn)
+                    conn.sendall(b'RESUME ' + self.session_token.encode() + b'\n')
+                except OSError:
+                    continue
+                old, self.client = self.client, conn
+                old.close()
+                return True
+            return False
+        finally:
+            self.reconnecting = False
+
+    def random_cell(self):
+        return random.randrange(self.world[1]), random.randrange(self.world[0])
+
+    def apple_count(self):
+        """기존 20x20 보드의 사과 하나와 같은 밀도"""
+        return max(1, self.world[0] * self.world[1] // 400)
+
+    def keepalive_loop(self):
+        """TCP 로 한동안 보낸 것이 없으면 keepalive 전송 (서버/밸런서가 끊긴 연결로 보고 정리하지 않도록)"""
+        while self.running:
+            time.sleep(1)
+            if self.reconnecting or time.monotonic() - self.last_sent < KEEPALIVE_INTERVAL:
+                continue
+            try:
+                self.client.send(KEEPALIVE)
+                self.last_sent = time.monotonic()
+            except OSError:
+                pass  # 수신 쓰레드가 재접속 처리
+
     def update_game_state(self, state):
+        if is_keepalive(state):
+            return
+        if "session" in state:
+            self.session_token = state["session"]
+            self.udp_ready = self.udp is not None and state.get("udp", False)
+            self.state_seq = None  # 재접속한 서버의 순번은 새로 시작
+            world = tuple(state.get("world", self.world))
+            if world != self.world:
+                self.world = world
+                self.apples = [self.random_cell() for _ in range(self.apple_count())]
+            if state.get("snake"):
+                self.snake = [tuple(cell) for cell in state["snake"]]  # 서버가 빈 칸에 정해 준 시작 위치 (재접속이면 이어 받은 뱀)
+            return
         self.other_snakes = state.get("snakes", {})
-        self.top_score = state.get("top_score", 0)
+        # 리더보드에 연결된 서버는 전체 서버 최고 점수도 함께 보냄
+        self.top_score = max(state.get("top_score", 0), state.get("global_top_score", 0))
 
     def send_data(self, data):
         try:
-            self.client.send(pickle.dumps(data))
+            if self.udp_ready:
+                self.inputs.send(self.session_token, data)
+            else:
+                self.client.send(encode(data))  # 서버는 codec 형식만 받음
+                self.last_sent = time.monotonic()
         except socket.error:
-            self.stop()
+            if not self.reconnecting and self.session_token is None:
+                self.stop()  # 토큰이 있으면 수신 쓰레드가 재접속 처리
 
     def stop(self):
         self.running = False
         self.client.close()
+        if self.udp is not None:
+            self.udp.close()
 
 # 화면 블록 그리기 함수 🎨
 def draw_block(screen, color, position):
-    block = pygame.Rect((position[1] * 20, position[0] * 20 + 40), (20, 20))
+    block = pygame.Rect((position[1] * CELL, position[0] * CELL + 40), (CELL, CELL))
     pygame.draw.rect(screen, color, block)
 
 # 메인 게임 함수 🎮
-def main():
-    client = SnakeClient()
+def main(udp=False, map_name=None):
+    client = SnakeClient(udp=udp, map_name=map_name)
     running = True
     direction = "E"  # 초기 방향 설정
     last_direction = direction
-    snake_body = client.snake
+    view = Viewport(VIEW_ROWS, VIEW_COLS)
 
     while running:
+        snake_body = client.snake
         screen.fill(WHITE)
         pygame.draw.rect(screen, (200, 200, 200), (0, 0, size[0], 40))  # 점수 영역
 
@@ -108,13 +228,13 @@ def main():
             new_head = (head_y, head_x + 1)
 
         # 벽 넘어가기
-        new_head = (new_head[0] % 20, new_head[1] % 20)
+        new_head = (new_head[0] % client.world[1], new_head[1] % client.world[0])
 
         # 사과 먹기 🍎
         if new_head in client.apples:
             snake_body = [new_head] + snake_body  # 뱀 길이 증가
             client.apples.remove(new_head)  # 먹은 사과 제거
-            client.apples.append((random.randint(0, 19), random.randint(0, 19)))  # 새로운 사과 추가
+            client.apples.append(client.random_cell())  # 새로운 사과 추가
             client.score += 1
         else:
             snake_body = [new_head] + snake_body[:-1]  # 뱀 이동, 길이 유지
@@ -126,20 +246,27 @@ def main():
             client.stop()
 
         # 서버로 데이터 전송
+        client.snake = snake_body
         client.send_data({"move": snake_body, "score": client.score})
 
-        # 자신의 뱀 그리기 🐍 (항상 초록색)
-        for segment in snake_body:
-            draw_block(screen, GREEN, segment)
+        # 월드가 화면보다 크면 머리를 가운데에 두고 보이는 칸만 그림
+        view.follow(snake_body[0], client.world)
+
+        def draw(color, cells):
+            for cell in cells:
+                position = view.to_screen(cell)
+                if position is not None:
+                    draw_block(screen, color, position)
 
         # 다른 플레이어의 뱀 그리기 (항상 회색)
         for player_id, other_snake in client.other_snakes.items():
-            for segment in other_snake:
-                draw_block(screen, LIGHT_GRAY, segment)
+            draw(LIGHT_GRAY, other_snake)
+
+        # 자신의 뱀 그리기 🐍 (항상 초록색)
+        draw(GREEN, snake_body)
 
         # 사과 그리기 🍎
-        for apple in client.apples:
-            draw_block(screen, RED, apple)
+        draw(RED, client.apples)
 
         # 점수 표시
         score_text = FONT.render(f"Your Score: {client.score}", True, (0, 0, 0))
@@ -154,4 +281,10 @@ def main():
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Snake Client")
+    parser.add_argument('--udp', action='store_true', help='Send moves and receive state over UDP when the server allows it')
+    parser.add_argument('--map', default=None, help='Ask the load balancer for a room on this map')
+    args = parser.parse_args()
+    main(udp=args.udp, map_name=args.map)
\ No newline at end of file
@@ -0,0 +1,435 @@
+import struct
+import sys
+from array import array
+
+# 클라이언트 -> 서버 게임 메시지의 바이너리 형식. 받은 바이트를 pickle 로 복원하지 않음 (임의 코드 실행 방지)
+# 메시지 = 헤더(매직, 종류, 본문 길이) + 본문. 정수는 모두 리틀 엔디언
+HEADER = struct.Struct("<BBH")
+MAGIC = 0xA5
+MSG_INPUT = 1  # 본문: 플래그, 점수, 칸 수 + 칸마다 (행, 열)
+MSG_KEEPALIVE = 2  # 본문 없음
+MSG_RESTORE = 3  # 본문은 MSG_INPUT 과 같음 (밸런서가 이전한 세션의 뱀과 점수)
+MSG_ROOM = 4  # 본문: 룸 번호 (룸 샤딩 서버의 룸 선택)
+HAS_MOVE = 1
+HAS_SCORE = 2
+INPUT_HEADER = struct.Struct("<BIH")  # 플래그, 점수(uint32), 칸 수(uint16)
+INPUT_MESSAGE = struct.Struct("<BBHBIH")  # 헤더 + INPUT_HEADER (이동 입력 빠른 경로)
+MOVE_HEAD = struct.Struct("<5xIHI")  # 이동 입력 메시지의 점수, 칸 수, 머리 칸 키 (빠른 경로)
+CELL = struct.Struct("<HH")  # 칸 하나 (행, 열)
+ROOM_BODY = struct.Struct("<H")
+SEQ = struct.Struct("<I")  # UDP 입력 묶음의 입력 순번
+MAX_CELLS = 4096  # 뱀 한 마리의 최대 칸 수
+TABLE_CELLS = 1 << 14  # 칸 수가 이 이하인 월드는 칸 튜플 표를 만들어 좌표 확인과 복원을 사전 조회 한 번으로
+SHORT_SNAKE = 16  # 이 칸 수 이하는 좌표를 한 번에 풀어 zip 으로 묶는 편이 빠름 (그보다 길면 바이트 단위 확인 + iter_unpack)
+MAX_BODY = INPUT_HEADER.size + 4 * MAX_CELLS  # 이보다 긴 본문은 기다리지 않고 바로 거절
+KEEPALIVE = HEADER.pack(MAGIC, MSG_KEEPALIVE, 0)
+
+# 복원한 메시지는 (종류, 값, 점수) 튜플 (메시지마다 dict 를 만들지 않음). 보내지 않은 값은 None
+#   (MSG_INPUT, [(행, 열)], 점수)  (MSG_RESTORE, [(행, 열)], 점수)  (MSG_KEEPALIVE, None, None)  (MSG_ROOM, 룸 번호, None)
+_KEEPALIVE_MESSAGE = (MSG_KEEPALIVE, None, None)
+_cell_structs = {}  # 칸 수 -> 좌표 Struct
+_key_structs = {}  # 칸 수 -> 칸 키(행 | 열 << 16, uint32) Struct
+_cell_tables = {}  # 월드 크기 -> {칸 키: (행, 열)}. 디코더끼리 공유
+_move_prefixes = {}  # 메시지 길이 -> (이동 + 점수 입력 메시지의 앞 5바이트(헤더, 플래그), 칸 수)
+
+
+class DecodeError(ValueError):
+    """형식에 맞지 않는 메시지. 스트림의 나머지도 믿을 수 없으므로 연결을 끊어야 함"""
+
+
+def _cells_struct(count):
+    cells = _cell_structs.get(count)
+    if cells is None:
+        cells = _cell_structs[count] = struct.Struct(f"<{2 * count}H")
+    return cells
+
+
+def _keys_struct(count):
+    keys = _key_structs.get(count)
+    if keys is None:
+        keys = _key_structs[count] = struct.Struct(f"<{count}I")
+    return keys
+
+
+def _cell_table(world):
+    """월드 안 모든 칸의 {칸 키: (행, 열)}. 키는 칸 4바이트를 uint32 로 읽은 값이라 표에 없으면 월드 밖 좌표"""
+    table = _cell_tables.get(world)
+    if table is None:
+        width, height = world
+        table = _cell_tables[world] = {row | col << 16: (row, col) for row in range(height) for col in range(width)}
+    return table
+
+
+def _encode_input(kind, move, score):
+    flags = (HAS_MOVE if move is not None else 0) | (HAS_SCORE if score is not None else 0)
+    count = len(move) if move is not None else 0
+    if count > MAX_CELLS or (move is not None and not count):
+        raise ValueError(f"snake must have 1..{MAX_CELLS} cells")
+    try:
+        cells = array('H', [value for cell in move for value in cell]) if count else array('H')
+        if sys.byteorder == "big":
+            cells.byteswap()
+        body = INPUT_HEADER.pack(flags, score or 0, count) + cells.tobytes()
+    except (OverflowError, struct.error) as e:
+        raise ValueError(f"value out of range: {e}") from None
+    return HEADER.pack(MAGIC, kind, len(body)) + body
+
+
+def encode(message):
+    """
+    메시지를 바이너리로 변환.
+    :param message: {"move": [(행, 열)], "score": n} (둘 중 하나만 있어도 됨), {"keepalive": True},
+                    {"restore": {"snake": ..., "score": ...}}, {"room_id": n} 또는 디코더가 복원한 (종류, 값, 점수) 튜플
+    """
+    if type(message) is tuple:
+        kind, value, score = message
+        if kind == MSG_INPUT or kind == MSG_RESTORE:
+            return _encode_input(kind, value, score)
+        if kind == MSG_KEEPALIVE:
+            return KEEPALIVE
+        message = {"room_id": value}
+    if "restore" in message:
+        state = message["restore"]
+        return _encode_input(MSG_RESTORE, state.get("snake"), state.get("score"))
+    if "keepalive" in message:
+        return KEEPALIVE
+    if "room_id" in message:
+        try:
+            return HEADER.pack(MAGIC, MSG_ROOM, ROOM_BODY.size) + ROOM_BODY.pack(message["room_id"])
+        except struct.error as e:
+            raise ValueError(f"value out of range: {e}") from None
+    return _encode_input(MSG_INPUT, message.get("move"), message.get("score"))
+
+
+def _decode_body(kind, data, start, length, width, height):
+    """본문 하나를 스키마에 맞춰 복원 (길이, 플래그, 칸 수, 좌표 범위 확인)"""
+    if kind == MSG_INPUT or kind == MSG_RESTORE:
+        if length < INPUT_HEADER.size:
+            raise DecodeError("input body too short")
+        flags, score, count = INPUT_HEADER.unpack_from(data, start)
+        if flags & ~(HAS_MOVE | HAS_SCORE):
+            raise DecodeError(f"unknown input flags {flags:#x}")
+        if length != INPUT_HEADER.size + 4 * count:
+            raise DecodeError("cell count does not match body length")
+        move = None
+        if flags & HAS_MOVE:
+            if not 0 < count <= MAX_CELLS:
+                raise DecodeError(f"snake must have 1..{MAX_CELLS} cells")
+            flat = _cells_struct(count).unpack_from(data, start + INPUT_HEADER.size)
+            # 이전된 세션(MSG_RESTORE)은 월드 크기가 다른 서버에서 올 수 있으므로 서버가 감싸서 사용
+            if kind == MSG_INPUT and width is not None and max(flat) >= min(width, height) \
+                    and (max(flat[0::2]) >= height or max(flat[1::2]) >= width):
+                raise DecodeError("cell outside the world")
+            cells = iter(flat)
+            move = list(zip(cells, cells))
+        elif count:
+            raise DecodeError("cells without move flag")
+        if not flags & HAS_SCORE:
+            if score:
+                raise DecodeError("score without score flag")
+            score = None
+        return kind, move, score
+    if kind == MSG_KEEPALIVE:
+        if length:
+            raise DecodeError("keepalive with body")
+        return _KEEPALIVE_MESSAGE
+    if kind == MSG_ROOM:
+        if length != ROOM_BODY.size:
+            raise DecodeError("room body has wrong length")
+        return MSG_ROOM, ROOM_BODY.unpack_from(data, start)[0], None
+    raise DecodeError(f"unknown message type {kind}")
+
+
+def restored(message):
+    """MSG_RESTORE 메시지 -> 세션 상태 {"snake", "score"} (보낸 값만)"""
+    _, snake, score = message
+    state = {}
+    if snake is not None:
+        state["snake"] = snake
+    if score is not None:
+        state["score"] = score
+    return state
+
+
+def decode(data, world=None):
+    """
+    bytes 안의 메시지를 모두 복원.
+    :param world: (가로, 세로). 지정하면 MSG_INPUT 좌표가 월드 안인지 확인 (서버는 감싸지 않고 그대로 사용)
+    :return: (메시지 목록, 사용한 바이트 수). 마지막 메시지가 잘려 있으면 그 앞까지만. 형식이 틀리면 DecodeError
+    """
+    return Decoder(world).decode(data)
+
+
+class Decoder:
+    """
+    연결 하나의 스트림 디코더. recv 경계가 메시지 경계와 달라도 잘린 메시지는 다음 feed() 까지 보관
+    (보관하는 바이트는 메시지 하나 크기 미만).
+    :param world: (가로, 세로). 지정하면 MSG_INPUT 좌표가 월드 안인지 확인
+    """
+
+    __slots__ = ("width", "height", "limit", "rows", "cols", "cell", "last", "last_cells", "pending")
+
+    def __init__(self, world=None):
+        self.width, self.height = world if world is not None else (None, None)
+        self.limit = min(world) if world is not None else 1 << 16  # 모든 좌표가 이보다 작으면 행/열 따로 볼 필요 없음
+        # 한 변이 256 칸 이하인 월드의 긴 뱀은 좌표 범위를 바이트 단위로 확인 (translate 로 범위 안의 값을 지워 남는 것이 없는지)
+        small = world is not None and max(world) <= 256
+        self.rows = bytes(range(self.height)) if small else None
+        self.cols = bytes(range(self.width)) if small else None
+        # 작은 월드는 칸 키로 표를 조회해 확인과 복원을 한 번에 (칸마다 튜플을 만들지 않고 표의 튜플을 공유)
+        table = world is not None and world[0] * world[1] <= TABLE_CELLS
+        self.cell = _cell_table(tuple(world)).__getitem__ if table else None
+        self.last, self.last_cells = b'', []  # 빠른 경로로 복원한 마지막 이동 입력 메시지와 그 칸 목록
+        self.pending = b''
+
+    def feed(self, data, _shape=_move_prefixes.get, _head=MOVE_HEAD.unpack_from):
+        """
+        :return: 완성된 메시지 목록. 형식이 틀리면 DecodeError
+                 (복원한 칸 목록은 다음 입력 복원에 재사용하므로 받는 쪽에서 수정하지 않음)
+        """
+        if self.pending:
+            data = self.pending + data
+        else:
+            # 가장 흔한 경우: recv 한 번에 이동 + 점수 입력 하나가 통째로 도착
+            shape = _shape(len(data))
+            if shape is not None and data.startswith(shape[0]):
+                score, count, key = _head(data)
+                cell = self.cell
+                if count == shape[1] and cell is None:
+                    return [(MSG_INPUT, self.cells(data, INPUT_MESSAGE.size, count), score)]
+                if count == shape[1]:
+                    # 뱀은 틱마다 머리 한 칸이 새로 붙고 (자라지 않으면) 꼬리 한 칸이 빠지므로,
+                    # 나머지 칸이 직전 입력과 같으면 머리만 표에서 찾고 직전 칸 목록을 이어 붙임
+                    try:
+                        if count == 1:
+                            return [(MSG_INPUT, [cell(key)], score)]
+                        last = self.last
+                        if len(data) == len(last) and data.endswith(last[INPUT_MESSAGE.size:-CELL.size]):
+                            cells = [cell(key), *self.last_cells[:-1]]  # 이동
+                        elif len(data) == len(last) + CELL.size and data.endswith(last[INPUT_MESSAGE.size:]):
+                            cells = [cell(key), *self.last_cells]  # 먹이를 먹고 한 칸 자람
+                        else:
+                            cells = list(map(cell, _keys_struct(count).unpack_from(data, INPUT_MESSAGE.size)))
+                    except KeyError:
+                        raise DecodeError("cell outside the world") from None
+                    self.last, self.last_cells = data, cells
+                    return [(MSG_INPUT, cells, score)]
+            elif data == KEEPALIVE:
+                return [_KEEPALIVE_MESSAGE]
+        messages, used = self.decode(data)
+        self.pending = data[used:] if used < len(data) else b''
+        return messages
+
+    def cells(self, data, start, count):
+        """start 부터 count 칸을 [(행, 열)] 로 복원. 월드 밖 좌표면 DecodeError"""
+        if self.cell is not None:
+            try:
+                return list(map(self.cell, _keys_struct(count).unpack_from(data, start)))
+            except KeyError:
+                raise DecodeError("cell outside the world") from None
+        if count == 1:  # 한 칸이면 iterator 를 만드는 것보다 바로 읽는 편이 빠름
+            cell = CELL.unpack_from(data, start)
+            if self.width is not None and (cell[0] >= self.height or cell[1] >= self.width):
+                raise DecodeError("cell outside the world")
+            return [cell]
+        if count <= SHORT_SNAKE or self.rows is None:
+            flat = _cells_struct(count).unpack_from(data, start)
+            if self.width is not None and max(flat) >= self.limit \
+                    and (max(flat[0::2]) >= self.height or max(flat[1::2]) >= self.width):
+                raise DecodeError("cell outside the world")
+            cells = iter(flat)
+            return list(zip(cells, cells))
+        # 긴 뱀: 리틀 엔디언 uint16 의 상위 바이트는 모두 0, 하위 바이트는 행/열 범위 안인지 바이트 단위로 확인한 뒤
+        # iter_unpack 으로 (행, 열) 튜플을 바로 만듦 (좌표마다 int 를 만들어 비교하지 않음)
+        end = start + 4 * count
+        if data[start + 1:end:2].count(0) != 2 * count or data[start:end:4].translate(None, self.rows) \
+                or data[start + 2:end:4].translate(None, self.cols):
+            raise DecodeError("cell outside the world")
+        return list(CELL.iter_unpack(data[start:end]))
+
+    def decode(self, data, _input=INPUT_MESSAGE.unpack_from, _header=HEADER.unpack_from):
+        """:return: (메시지 목록, 사용한 바이트 수)"""
+        messages = []
+        position, end = 0, len(data)
+        while end - position >= HEADER.size:
+            if end - position >= INPUT_MESSAGE.size:
+                # 대부분을 차지하는 이동 + 점수 입력은 헤더와 본문 앞부분을 한 번에 읽음
+                magic, kind, length, flags, score, count = _input(data, position)
+                if magic == MAGIC and kind == MSG_INPUT and flags == HAS_MOVE | HAS_SCORE and 0 < count <= MAX_CELLS:
+                    start = position + INPUT_MESSAGE.size
+                    if length != INPUT_HEADER.size + 4 * count:
+                        raise DecodeError("cell count does not match body length")
+                    if start + 4 * count > end:
+                        break
+                    size = INPUT_MESSAGE.size + 4 * count
+                    if size not in _move_prefixes:
+                        _move_prefixes[size] = (bytes(data[position:position + 5]), count)  # 다음부터는 feed() 에서 바로 처리
+                    messages.append((MSG_INPUT, self.cells(data, start, count), score))
+                    position = start + 4 * count
+                    continue
+            magic, kind, length = _header(data, position)
+            if magic != MAGIC:
+                raise DecodeError(f"bad magic byte {magic:#x}")
+            if length > MAX_BODY:
+                raise DecodeError(f"message too large: {length}")
+            start = position + HEADER.size
+            if start + length > end:
+                break
+            messages.append(_decode_body(kind, data, start, length, self.width, self.height))
+            position = start + length
+        if position < end and data[position] != MAGIC:
+            raise DecodeError(f"bad magic byte {data[position]:#x}")  # 헤더가 다 오기 전이라도 잘못된 스트림은 바로 거절
+        return messages, position
+
+
+def encode_batch(entries):
+    """UDP 입력 묶음 [(순번, 입력 dict)] -> bytes"""
+    return b"".join(SEQ.pack(seq & 0xFFFFFFFF) + encode(message) for seq, message in entries)
+
+
+def decode_batch(data, world=None):
+    """:return: [(순번, 입력)]. 잘리거나 형식이 틀린 묶음은 DecodeError (데이터그램은 항상 통째로 도착)"""
+    width, height = world if world is not None else (None, None)
+    entries = []
+    position, end = 0, len(data)
+    while position < end:
+        if end - position < SEQ.size + HEADER.size:
+            raise DecodeError("truncated batch")
+        (seq,) = SEQ.unpack_from(data, position)
+        magic, kind, length = HEADER.unpack_from(data, position + SEQ.size)
+        start = position + SEQ.size + HEADER.size
+        if magic != MAGIC:
+            raise DecodeError(f"bad magic byte {magic:#x}")
+        if length > MAX_BODY or start + length > end:
+            raise DecodeError("truncated batch")
+        entries.append((seq, _decode_body(kind, data, start, length, width, height)))
+        position = start + length
+    return entries
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+    import random
+
+    # 퍼징: 올바른 메시지 스트림을 무작위로 변형해 디코더에 넣고, DecodeError 외의 예외나 스키마 위반이 없는지 확인
+    parser = argparse.ArgumentParser(description="Codec fuzzer")
+    parser.add_argument('--iterations', type=int, default=20000, help='Mutated streams to decode')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    worlds = [(20, 20), (32, 24), (200, 100), (300, 60)]  # 칸 표, 바이트 단위 범위 확인(한 변 256 이하), 일반 경로 모두
+    world = worlds[0]
+
+    def random_message():
+        kind = rng.random()
+        snake = [(rng.randrange(world[1]), rng.randrange(world[0])) for _ in range(rng.choice((1, 2, 10, 50)))]
+        if kind < 0.6:
+            return rng.choice(({"move": snake, "score": rng.randrange(1 << 32)}, {"move": snake}, {"score": rng.randrange(100)}))
+        if kind < 0.8:
+            return {"keepalive": True}
+        if kind < 0.9:
+            return {"restore": {"snake": snake, "score": rng.randrange(100)}}
+        return {"room_id": rng.randrange(1 << 16)}
+
+    def mutate(data):
+        data = bytearray(data)
+        for _ in range(rng.randint(1, 4)):
+            choice = rng.randrange(7)
+            position = rng.randrange(len(data) + 1)
+            if choice == 0 and data:
+                data[min(position, len(data) - 1)] ^= 1 << rng.randrange(8)  # 비트 뒤집기
+            elif choice == 1 and data:
+                data[min(position, len(data) - 1)] = rng.randrange(256)  # 바이트 바꾸기
+            elif choice == 2:
+                del data[position:]  # 자르기
+            elif choice == 3:
+                data[position:position] = bytes(rng.randrange(256) for _ in range(rng.randint(1, 8)))  # 끼워 넣기
+            elif choice == 4 and len(data) >= HEADER.size:
+                data[2:4] = rng.randrange(1 << 16).to_bytes(2, "little")  # 길이 필드 조작
+            elif choice == 5:
+                data = bytearray(pickle.dumps(random_message()))  # 예전 pickle 클라이언트
+            elif choice == 6:
+                data = bytearray(rng.randbytes(rng.randint(0, 64)))
+        return bytes(data)
+
+    def check_schema(message):
+        """복원된 메시지가 스키마를 만족하는지 (입력 좌표는 월드 안, 칸 수 제한)"""
+        kind, value, score = message
+        assert kind in (MSG_INPUT, MSG_KEEPALIVE, MSG_RESTORE, MSG_ROOM)
+        if kind in (MSG_INPUT, MSG_RESTORE) and value is not None:
+            assert 0 < len(value) <= MAX_CELLS
+            assert kind == MSG_RESTORE or all(0 <= row < world[1] and 0 <= col < world[0] for row, col in value)
+        if score is not None:
+            assert kind in (MSG_INPUT, MSG_RESTORE) and 0 <= score < 1 << 32
+
+    def outcome(data, chunks=None):
+        """:return: 복원된 메시지 목록 또는 "error" (chunks 가 있으면 그 크기로 나눠 Decoder 에 넣음)"""
+        try:
+            if chunks is None:
+                return decode(data, world)[0]
+            decoder = Decoder(world)
+            messages, position = [], 0
+            while position < len(data):
+                size = rng.choice(chunks)
+                messages += decoder.feed(data[position:position + size])
+                position += size
+            return messages
+        except DecodeError:
+            return "error"
+
+    failures = 0
+    rejected = 0
+    for iteration in range(args.iterations):
+        world = worlds[iteration % len(worlds)]
+        stream = b"".join(encode(random_message()) for _ in range(rng.randint(1, 4)))
+        if iteration == 0 or rng.random() < 0.1:
+            messages = decode(stream, world)[0]  # 변형 없는 스트림은 그대로 왕복
+            assert b"".join(encode(message) for message in messages) == stream
+            continue
+        data = mutate(stream)
+        try:
+            whole = outcome(data)
+            chunked = outcome(data, chunks=(1, 2, 3, 7, 64))
+            assert whole == chunked, "chunked decode differs from whole decode"  # recv 경계와 무관해야 함
+            if whole == "error":
+                rejected += 1
+            else:
+                for message in whole:
+                    check_schema(message)
+            decode_batch(SEQ.pack(iteration) + data, world)
+        except DecodeError:
+            pass
+        except Exception as e:
+            failures += 1
+            if failures <= 5:
+                print(f"FAIL {type(e).__name__}: {e} input={data.hex()}")
+
+    # 틱마다 한 칸 움직이거나 자라는 뱀의 입력을 하나씩 넣어 (직전 칸 목록을 재사용하는 빠른 경로) decode() 와 같은지 확인
+    for iteration in range(args.iterations // 10):
+        world = worlds[iteration % len(worlds)]
+        decoder = Decoder(world)
+        snake = [(rng.randrange(world[1]), rng.randrange(world[0])) for _ in range(rng.choice((1, 2, 10, 50)))]
+        for _ in range(20):
+            row, col = snake[0]
+            head = ((row + rng.choice((-1, 0, 1))) % world[1], (col + rng.choice((-1, 0, 1))) % world[0])
+            snake = [head] + (snake if rng.random() < 0.2 else snake[:-1])
+            data = encode({"move": snake, "score": len(snake)})
+            if rng.random() < 0.1:
+                data = mutate(data)
+            expected, got = outcome(data), None
+            try:
+                got = decoder.feed(data)
+            except DecodeError:
+                got = "error"
+            except Exception as e:
+                got = e
+            if got != expected:
+                failures += 1
+                if failures <= 5:
+                    print(f"FAIL move sequence decoded {got!r}, expected {expected!r} input={data.hex()}")
+            if got == "error" or decoder.pending:
+                decoder = Decoder(world)
+    print(f"{args.iterations} streams, {rejected} rejected, {failures} failures")
+    sys.exit(1 if failures else 0)
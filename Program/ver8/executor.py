@@ -0,0 +1,88 @@
+import collections
+import threading
+
+import jsonlog
+
+log = jsonlog.get_logger("executor")
+
+POLICIES = ("reject", "caller_runs", "block")
+
+
+class BoundedExecutor:
+    """
+    크기가 정해진 작업 쓰레드 풀 (연결 처리처럼 오래 막히는 작업용).
+    쓰레드는 필요할 때 max_workers 까지만 만들고, 모두 바쁘면 queue_limit 개까지 대기열에 둠.
+    대기열도 가득 차면 policy 에 따라 처리:
+      - "reject": 작업을 받지 않고 submit() 이 False 반환 (호출한 쪽이 연결을 닫는 등 정리)
+      - "caller_runs": 호출한 쓰레드에서 바로 실행 (accept 루프가 느려져 자연스럽게 유입을 늦춤)
+      - "block": 대기열에 자리가 날 때까지 호출한 쓰레드가 기다림
+    :param idle_timeout: 이 시간 동안 일이 없는 쓰레드는 종료 (부하가 줄면 풀도 줄어듦)
+    """
+
+    def __init__(self, name, max_workers, queue_limit=0, policy="reject", idle_timeout=60.0):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown rejection policy: {policy}")
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.policy = policy
+        self.idle_timeout = idle_timeout
+        self.tasks = collections.deque()
+        self.lock = threading.Lock()
+        self.has_task = threading.Condition(self.lock)  # 쉬는 작업 쓰레드가 기다림
+        self.has_space = threading.Condition(self.lock)  # policy="block" 인 submit 이 기다림
+        self.workers = 0
+        self.idle = 0
+        self.active = 0
+        self.rejected = 0  # 대기열이 넘친 횟수 (caller_runs 로 실행한 경우 포함)
+
+    def queued(self):
+        """쓰레드를 기다리는 작업 수 (깨어나고 있는 쉬는 쓰레드가 가져갈 작업은 제외)"""
+        return max(0, len(self.tasks) - self.idle)
+
+    def submit(self, fn, *args):
+        """:return: 작업을 받았으면 True, policy="reject" 로 거절했으면 False"""
+        with self.lock:
+            while True:
+                if self.idle > len(self.tasks):
+                    self.tasks.append((fn, args))
+                    self.has_task.notify()
+                    return True
+                if self.workers < self.max_workers:
+                    self.workers += 1
+                    self.active += 1  # 새 쓰레드는 첫 작업을 바로 받아 실행
+                    threading.Thread(target=self.work, args=((fn, args),), name=f"{self.name}-{self.workers}",
+                                     daemon=True).start()
+                    return True
+                if len(self.tasks) - self.idle < self.queue_limit:
+                    self.tasks.append((fn, args))
+                    return True
+                if self.policy != "block":
+                    break
+                self.has_space.wait()  # 작업이 시작되어 대기열에 자리가 나면 깨어남
+            self.rejected += 1
+        if self.policy == "caller_runs":
+            fn(*args)
+            return True
+        log.warning("task_rejected", pool=self.name, active=self.active, queued=self.queued())
+        return False
+
+    def work(self, task):
+        while True:
+            fn, args = task
+            try:
+                fn(*args)
+            except Exception as e:
+                log.error("task_failed", pool=self.name, error=repr(e))
+            with self.lock:
+                self.active -= 1
+                while not self.tasks:
+                    self.idle += 1
+                    notified = self.has_task.wait(self.idle_timeout)
+                    self.idle -= 1
+                    if not notified and not self.tasks:
+                        self.workers -= 1
+                        return
+                task = self.tasks.popleft()
+                self.active += 1
+                self.has_space.notify()
@@ -0,0 +1,319 @@
+import heapq
+import random
+import socket
+import threading
+import time
+
+import jsonlog
+
+log = jsonlog.get_logger("impairment")
+
+
+class Impairment:
+    """
+    네트워크 장애 조건.
+    :param delay: 기본 단방향 지연 (초)
+    :param jitter: 지연에 더하는 ±무작위 변동 (초)
+    :param loss: 패킷 손실 확률. TCP 스트림에서는 버리는 대신 retransmit_delay 만큼 늦게 전달 (재전송)
+    :param bandwidth: 대역폭 제한 (bytes/s, None 이면 제한 없음)
+    :param reorder: 패킷을 reorder_delay 만큼 더 붙잡아 뒤 패킷이 먼저 도착하게 할 확률 (UDP 만 해당)
+    """
+
+    FIELDS = ("delay", "jitter", "loss", "bandwidth", "reorder", "reorder_delay", "retransmit_delay")
+
+    def __init__(self, delay=0.0, jitter=0.0, loss=0.0, bandwidth=None, reorder=0.0, reorder_delay=0.02,
+                 retransmit_delay=0.2, seed=None):
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.bandwidth = bandwidth
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay
+        self.retransmit_delay = retransmit_delay
+        self.seed = seed
+
+    @classmethod
+    def parse(cls, text):
+        """'delay=0.05,jitter=0.01,loss=0.02,bandwidth=125000' 형식 문자열로 생성"""
+        options = {}
+        for item in filter(None, text.split(',')):
+            key, _, value = item.partition('=')
+            key = key.strip()
+            if key not in cls.FIELDS and key != "seed":
+                raise ValueError(f"unknown impairment option: {key}")
+            options[key] = int(value) if key == "seed" else float(value)
+        return cls(**options)
+
+    def describe(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class ImpairedLink:
+    """
+    단방향 장애 링크. send() 로 받은 데이터를 조건에 따라 늦추거나 버린 뒤 전용 쓰레드에서 deliver(data) 호출.
+    stream=True 이면 TCP 처럼 순서를 지키므로 한 패킷이 늦어지면 뒤 패킷도 함께 늦어짐 (head-of-line blocking).
+    """
+
+    def __init__(self, deliver, impairment, stream=False):
+        self.deliver = deliver
+        self.impairment = impairment
+        self.stream = stream
+        self.random = random.Random(impairment.seed)
+        self.queue = []  # [(전달 시각, 순번, 데이터)]
+        self.counter = 0
+        self.link_free = 0.0  # 대역폭 제한: 직전 데이터 전송이 끝나는 시각
+        self.last_due = 0.0
+        self.condition = threading.Condition()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def send(self, data):
+        impairment = self.impairment
+        now = time.monotonic()
+        extra = 0.0
+        self.sent += 1
+        if impairment.loss and self.random.random() < impairment.loss:
+            if not self.stream:
+                self.dropped += 1
+                return
+            extra = impairment.retransmit_delay
+        if not self.stream and impairment.reorder and self.random.random() < impairment.reorder:
+            extra += impairment.reorder_delay
+        start = now
+        if impairment.bandwidth:
+            self.link_free = max(now, self.link_free) + len(data) / impairment.bandwidth
+            start = self.link_free
+        due = start + max(0.0, impairment.delay + self.random.uniform(-impairment.jitter, impairment.jitter)) + extra
+        with self.condition:
+            if self.stream:
+                due = max(due, self.last_due)
+                self.last_due = due
+            self.counter += 1
+            heapq.heappush(self.queue, (due, self.counter, data))
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.closed and (not self.queue or self.queue[0][0] > time.monotonic()):
+                    self.condition.wait(self.queue[0][0] - time.monotonic() if self.queue else None)
+                if self.closed:
+                    return
+                _, _, data = heapq.heappop(self.queue)
+            try:
+                self.deliver(data)
+            except OSError:
+                self.close()
+                return
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class ImpairedSocket:
+    """
+    TCP 소켓 래퍼. 보내는 데이터와 받는 데이터 모두 장애 링크를 거치므로,
+    LoadBalancer 중계 코드나 클라이언트 코드를 바꾸지 않고 그대로 끼워 넣을 수 있음.
+    지연된 전송이 실패하면 다음 sendall 에서 예외를 올림.
+    """
+
+    def __init__(self, sock, impairment, inbound=None):
+        self.sock = sock
+        self.error = None
+        self.buffer = b''
+        self.eof = False
+        self.closing = False
+        self.ready = threading.Condition()
+        self.outbound = ImpairedLink(self._write, impairment, stream=True)
+        self.inbound = ImpairedLink(self._arrive, inbound or impairment, stream=True)
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _write(self, data):
+        try:
+            if data:
+                self.sock.sendall(data)
+            elif self.closing:
+                self.outbound.close()
+                self.sock.close()
+            else:
+                self.sock.shutdown(socket.SHUT_WR)
+        except OSError as e:
+            self.error = e
+            raise
+
+    def _pump(self):
+        """실제 소켓에서 읽은 데이터를 수신 방향 장애 링크에 넣음 (빈 bytes 는 EOF 표시)"""
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                data = b''
+            self.inbound.send(data)
+            if not data:
+                return
+
+    def _arrive(self, data):
+        with self.ready:
+            if data:
+                self.buffer += data
+            else:
+                self.eof = True
+            self.ready.notify_all()
+
+    def recv(self, bufsize, flags=0):
+        with self.ready:
+            while not self.buffer and not self.eof:
+                self.ready.wait()
+            data, self.buffer = self.buffer[:bufsize], self.buffer[bufsize:]
+            return data
+
+    def sendall(self, data, flags=0):
+        if self.error is not None:
+            raise self.error
+        self.outbound.send(bytes(data))
+
+    def send(self, data, flags=0):
+        """장애 링크에 넣기만 하므로 막히지 않음 (MSG_DONTWAIT 등 flags 는 무시)"""
+        self.sendall(data)
+        return len(data)
+
+    def shutdown(self, how):
+        if how in (socket.SHUT_WR, socket.SHUT_RDWR):
+            self.outbound.send(b'')  # 앞서 보낸 데이터가 모두 전달된 뒤 종료
+        if how in (socket.SHUT_RD, socket.SHUT_RDWR):
+            self._arrive(b'')
+
+    def close(self):
+        """앞서 보낸 데이터가 지연을 거쳐 모두 전달된 뒤 실제 소켓을 닫음"""
+        self.closing = True
+        self.inbound.close()
+        self._arrive(b'')
+        self.outbound.send(b'')
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class ImpairmentProxy:
+    """
+    단독 실행용 장애 중계기. listen 주소로 받은 연결(TCP) 또는 데이터그램(UDP)을 target 으로 전달하며
+    양방향에 장애 조건을 적용.
+    """
+
+    def __init__(self, listen, target, impairment, udp=False):
+        self.listen = listen
+        self.target = target
+        self.impairment = impairment
+        self.udp = udp
+
+    def start(self):
+        if self.udp:
+            self.serve_udp()
+        else:
+            self.serve_tcp()
+
+    def serve_tcp(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(self.listen)
+        listener.listen()
+        log.info("impairment_proxy_started", listen=listener.getsockname(), target=self.target, protocol="tcp",
+                 **self.impairment.describe())
+        while True:
+            conn, addr = listener.accept()
+            threading.Thread(target=self.relay_tcp, args=(conn, addr), daemon=True).start()
+
+    def relay_tcp(self, conn, addr):
+        try:
+            upstream = socket.create_connection(self.target, timeout=5)
+            upstream.settimeout(None)
+        except OSError as e:
+            log.warning("impairment_target_unavailable", target=self.target, error=str(e))
+            conn.close()
+            return
+        client = ImpairedSocket(conn, self.impairment)
+
+        def pump(source, destination):
+            try:
+                while True:
+                    data = source.recv(65536)
+                    if not data:
+                        break
+                    destination.sendall(data)
+            except OSError:
+                pass
+            try:
+                destination.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+        upstream_pump = threading.Thread(target=pump, args=(client, upstream), daemon=True)
+        upstream_pump.start()
+        pump(upstream, client)
+        upstream_pump.join()
+        client.close()
+        upstream.close()
+
+    def serve_udp(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(self.listen)
+        log.info("impairment_proxy_started", listen=sock.getsockname(), target=self.target, protocol="udp",
+                 **self.impairment.describe())
+        routes = {}  # 클라이언트 주소 -> 업스트림 소켓 (응답을 돌려줄 경로)
+        lock = threading.Lock()
+
+        def relay_back(client_addr, upstream):
+            link = ImpairedLink(lambda data: sock.sendto(data, client_addr), self.impairment)
+            while True:
+                try:
+                    link.send(upstream.recv(65536))
+                except ConnectionRefusedError:
+                    continue
+                except OSError:
+                    break
+            link.close()
+            with lock:
+                routes.pop(client_addr, None)
+
+        while True:
+            try:
+                packet, client_addr = sock.recvfrom(65536)
+            except ConnectionError:
+                continue
+            with lock:
+                route = routes.get(client_addr)
+                if route is None:
+                    upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    upstream.connect(self.target)
+                    upstream.settimeout(30)
+                    route = routes[client_addr] = (upstream, ImpairedLink(upstream.send, self.impairment))
+                    threading.Thread(target=relay_back, args=(client_addr, upstream), daemon=True).start()
+            route[1].send(packet)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from admin import parse_address
+
+    parser = argparse.ArgumentParser(description="Network impairment proxy (delay, jitter, loss, bandwidth, reordering)")
+    parser.add_argument('--listen', default='localhost:9000', help='Address to accept clients on')
+    parser.add_argument('--target', default='localhost:8080', help='Balancer or game server to forward to')
+    parser.add_argument('--udp', action='store_true', help='Relay UDP datagrams instead of TCP connections')
+    parser.add_argument('--delay', type=float, default=0.0, help='One-way delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- delay variation in seconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='Loss probability (TCP: delayed by a retransmit)')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Bandwidth cap in bytes per second')
+    parser.add_argument('--reorder', type=float, default=0.0, help='Probability of holding a datagram back (UDP)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    parser.add_argument('--log-level', default='info', choices=list(jsonlog.LEVELS), help='Minimum log level')
+    args = parser.parse_args()
+    jsonlog.set_level(args.log_level)
+
+    impairment = Impairment(delay=args.delay, jitter=args.jitter, loss=args.loss, bandwidth=args.bandwidth,
+                            reorder=args.reorder, seed=args.seed)
+    ImpairmentProxy(parse_address(args.listen), parse_address(args.target), impairment, udp=args.udp).start()
@@ -0,0 +1,153 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+
+class _Writer:
+    """
+    로그 기록 전용 백그라운드 쓰레드.
+    호출한 쓰레드는 큐에 넣기만 하고, JSON 변환과 stdout 쓰기는 이 쓰레드가 묶어서 처리.
+    """
+
+    def __init__(self, stream, queue_size=10000, batch_size=256):
+        self.stream = stream
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.dropped = 0  # 큐가 가득 차서 버린 로그 수
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # 로그 때문에 게임 쓰레드가 멈추지 않도록 버림
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [json.dumps(self.format(record), default=str) for record in batch]
+            if self.dropped:
+                lines.append(json.dumps({"ts": time.time(), "level": "warning", "event": "log_dropped", "count": self.dropped}))
+                self.dropped = 0
+            try:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+            for _ in batch:
+                self.queue.task_done()
+
+    @staticmethod
+    def format(record):
+        ts, level, logger, event, fields = record
+        line = {"ts": round(ts, 6), "level": level, "logger": logger, "event": event}
+        line.update(fields)
+        return line
+
+    def flush(self):
+        """큐에 쌓인 로그를 모두 쓸 때까지 대기"""
+        self.queue.join()
+
+
+class Logger:
+    """
+    JSON lines 구조화 로거.
+    :param rate: 이벤트 종류별 초당 허용 로그 수 (초과분은 요약 후 버림)
+    :param burst: 순간적으로 허용하는 최대 로그 수
+    """
+
+    def __init__(self, name, level=None, rate=20.0, burst=50):
+        self.name = name
+        self.set_level(level or os.environ.get("SNAKE_LOG_LEVEL", "info"))
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # 이벤트 -> [남은 토큰, 마지막 갱신 시각, 억제된 수]
+        self.lock = threading.Lock()
+
+    def set_level(self, level):
+        self.level = LEVELS[level]
+
+    def allow(self, event, now):
+        """이벤트 종류별 토큰 버킷. 허용되면 그동안 억제된 개수, 아니면 None 반환"""
+        with self.lock:
+            bucket = self.buckets.get(event)
+            if bucket is None:
+                bucket = self.buckets[event] = [self.burst, now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return None
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+            return suppressed
+
+    def log(self, level, event, **fields):
+        if LEVELS[level] < self.level:
+            return
+        now = time.time()
+        suppressed = self.allow(event, now)
+        if suppressed is None:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed  # 직전까지 속도 제한으로 생략된 같은 이벤트 수
+        _get_writer().put((now, level, self.name, event, fields))
+
+    def debug(self, event, **fields):
+        self.log("debug", event, **fields)
+
+    def info(self, event, **fields):
+        self.log("info", event, **fields)
+
+    def warning(self, event, **fields):
+        self.log("warning", event, **fields)
+
+    def error(self, event, **fields):
+        self.log("error", event, **fields)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = _Writer(sys.stdout)
+    return _writer
+
+
+def flush():
+    """종료 직전 등에 남은 로그를 모두 출력"""
+    if _writer is not None:
+        _writer.flush()
+
+
+_loggers = {}
+
+
+def get_logger(name, **options):
+    """이름별 로거 (같은 이름이면 같은 로거 반환)"""
+    if name not in _loggers:
+        _loggers[name] = Logger(name, **options)
+    return _loggers[name]
+
+
+def set_level(level):
+    """모든 로거의 로그 레벨 변경 (debug / info / warning / error)"""
+    os.environ["SNAKE_LOG_LEVEL"] = level  # 이후 생성되는 로거에도 적용
+    for logger in list(_loggers.values()):
+        logger.set_level(level)
@@ -0,0 +1,163 @@
+import socket
+import threading
+import time
+
+import jsonlog
+from protocol import recv_frame, send_frame
+
+log = jsonlog.get_logger("leaderboard")
+
+
+class LeaderboardService:
+    """
+    전체 서버 통합 리더보드.
+    게임 서버들이 점수를 묶음으로 보내면 플레이어별 최고 점수로 상위 K 개를 갱신하고,
+    변경이 있을 때 연결된 모든 게임 서버에 결과를 다시 보냄.
+    상위 K 개 밖의 점수는 보관하지 않음: 점수는 최고 점수로만 반영되고 K 번째 점수는 내려가지 않으므로
+    밖으로 밀려난 점수가 나중에 필요해지는 일은 없음 (플레이어가 늘어도 메모리는 K 개).
+    """
+
+    def __init__(self, host='localhost', port=6000, top_k=10, push_interval=1.0):
+        self.host = host
+        self.port = port
+        self.top_k = top_k
+        self.push_interval = push_interval
+        self.best = {}  # (서버 이름, 플레이어) -> 최고 점수 (상위 K 개만)
+        self.floor = -1  # 상위 K 개가 찼을 때 가장 낮은 점수 (이하의 새 플레이어 점수는 바로 무시)
+        self.top = []  # [(점수, 서버 이름, 플레이어)] 내림차순
+        self.dirty = False
+        self.servers = {}  # 연결 -> 서버 이름
+        self.lock = threading.Lock()
+
+    def apply_batch(self, server_name, scores):
+        """점수 묶음 반영. 상위 K 가 바뀐 경우에만 K 개를 다시 정렬 (전체 플레이어를 다시 훑지 않음)"""
+        with self.lock:
+            changed = False
+            for player, score in scores:
+                key = (server_name, player)
+                if score <= self.best.get(key, -1):
+                    continue
+                if key not in self.best and len(self.best) >= self.top_k:
+                    if score <= self.floor:
+                        continue  # 상위 K 에 들지 못하는 점수
+                    del self.best[min(self.best, key=self.best.get)]  # 가장 낮은 항목을 밀어냄
+                self.best[key] = score
+                if len(self.best) >= self.top_k:
+                    self.floor = min(self.best.values())
+                changed = True
+            if changed:
+                self.top = sorted(((score, server, player) for (server, player), score in self.best.items()), reverse=True)
+                self.dirty = True
+
+    def handle_server(self, conn, addr):
+        """게임 서버 하나의 점수 묶음 수신"""
+        try:
+            while True:
+                message = recv_frame(conn)
+                server_name = message.get("server", f"{addr[0]}:{addr[1]}")
+                with self.lock:
+                    self.servers[conn] = server_name
+                self.apply_batch(server_name, message.get("scores", []))
+        except (OSError, EOFError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                self.servers.pop(conn, None)
+            conn.close()
+            log.info("server_left", addr=addr)
+
+    def push_loop(self):
+        """주기적으로 변경된 상위 목록을 모든 게임 서버에 전송"""
+        while True:
+            time.sleep(self.push_interval)
+            with self.lock:
+                if not self.dirty:
+                    continue
+                self.dirty = False
+                message = {"leaderboard": [(player, score, server) for score, server, player in self.top]}
+                targets = list(self.servers)
+            for conn in targets:
+                try:
+                    send_frame(conn, message)
+                except OSError:
+                    pass  # 수신 쓰레드가 정리
+
+    def start(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen()
+        log.info("leaderboard_started", host=self.host, port=listener.getsockname()[1], top_k=self.top_k)
+        threading.Thread(target=self.push_loop, daemon=True).start()
+        while True:
+            conn, addr = listener.accept()
+            log.info("server_joined", addr=addr)
+            with self.lock:
+                self.servers[conn] = f"{addr[0]}:{addr[1]}"
+                self.dirty = True  # 새 서버도 현재 상위 목록을 바로 받도록
+            threading.Thread(target=self.handle_server, args=(conn, addr), daemon=True).start()
+
+
+class LeaderboardClient:
+    """
+    게임 서버 쪽 리더보드 연결.
+    report() 는 최신 점수를 메모리에 기록만 하고, 전송/수신은 백그라운드 쓰레드가 처리하므로
+    게임 처리 경로에서 네트워크 왕복이 발생하지 않음.
+    """
+
+    def __init__(self, address, server_name, flush_interval=0.5):
+        self.address = address
+        self.server_name = server_name
+        self.flush_interval = flush_interval
+        self.pending = {}  # 플레이어 -> 아직 보내지 않은 최신 점수
+        self.top = []  # 마지막으로 받은 전체 상위 목록 [(플레이어, 점수, 서버)]
+        self.lock = threading.Lock()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def report(self, player, score):
+        with self.lock:
+            self.pending[player] = score
+
+    def top_score(self):
+        return self.top[0][1] if self.top else 0
+
+    def run(self):
+        """연결 유지 및 주기적 묶음 전송 (끊기면 지수 백오프로 재연결)"""
+        backoff = 1
+        while True:
+            try:
+                with socket.create_connection(self.address, timeout=5) as conn:
+                    conn.settimeout(None)
+                    backoff = 1
+                    log.info("leaderboard_connected", address=self.address)
+                    threading.Thread(target=self.receive, args=(conn,), daemon=True).start()
+                    while True:
+                        time.sleep(self.flush_interval)
+                        with self.lock:
+                            batch, self.pending = self.pending, {}
+                        if batch:
+                            send_frame(conn, {"server": self.server_name, "scores": list(batch.items())})
+            except OSError as e:
+                log.warning("leaderboard_unavailable", address=self.address, error=str(e), retry_in=backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def receive(self, conn):
+        try:
+            while True:
+                message = recv_frame(conn)
+                if "leaderboard" in message:
+                    self.top = message["leaderboard"]
+        except (OSError, EOFError, ValueError):
+            pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Global Leaderboard Service")
+    parser.add_argument('--port', type=int, default=6000, help='Port to listen on for game servers')
+    parser.add_argument('--top-k', type=int, default=10, help='Number of entries in the global leaderboard')
+    args = parser.parse_args()
+
+    LeaderboardService(port=args.port, top_k=args.top_k).start()
@@ -1,68 +1,179 @@
+import collections
+import os
+import signal
 import socket
 import threading
-import random
 import time
-import pickle  # pickle 모듈 추가
+
+import jsonlog
+from admin import AdminServer, parse_address
+from admission import AdmissionControl, notify
+from codec import encode
+from executor import POLICIES, BoundedExecutor
+from impairment import Impairment, ImpairedSocket
+from matchmaking import DEFAULT_MAP, Matchmaker
+from metrics import Registry, start_metrics_server
+from protocol import loads_all, recv_frame
+from sockopts import DEFAULT as DEFAULT_SOCKET_OPTIONS, SocketOptions
+from timerwheel import shared_wheel
+from tracing import tracer
+from udp_transport import UdpRelay
+
+log = jsonlog.get_logger("balancer")
 
 class LoadBalancer:
-    def __init__(self, server_addresses):
+    def __init__(self, server_addresses, checkpoint_interval=1.0, capacity=None, impairment=None, socket_options=None,
+                 max_sessions=1024, session_queue=128, pool_policy="reject", admission=None, idle_timeout=10.0,
+                 server_maps=None, room_size=4, checkpoint_secret=None, request_timeout=1.0):
         """
         로드 밸런서 초기화.
         :param server_addresses: 분산 서버의 (IP, 포트) 목록
+        :param checkpoint_interval: 서버에서 플레이어 상태를 받아 두는 주기 (초)
+        :param capacity: 서버당 기본 최대 클라이언트 수 (None 이면 제한 없음)
+        :param impairment: 시험용 장애 조건(Impairment). 지정 시 클라이언트 쪽 중계에 지연/손실 등을 적용
+        :param socket_options: 클라이언트/서버 중계 연결에 적용할 TCP 옵션 (기본 TCP_NODELAY)
+        :param max_sessions: 동시에 중계할 최대 세션 수 (세션당 중계 쓰레드 2개를 각각의 풀에서 사용)
+        :param session_queue: 중계 쓰레드를 기다릴 수 있는 연결 수
+        :param pool_policy: 풀과 대기열이 모두 찼을 때의 처리 (BoundedExecutor 참고)
+        :param admission: 연결 수락 제어(AdmissionControl). 초당 수락 수 제한과 빈 서버 대기열 크기
+        :param idle_timeout: 클라이언트가 이 시간 동안 아무것도(keepalive 포함) 보내지 않으면 세션 종료 (0 이면 사용 안 함)
+        :param server_maps: {서버 주소: 맵 이름}. 없는 서버는 DEFAULT_MAP
+        :param room_size: 매치메이킹 방 하나에 모을 인원
+        :param checkpoint_secret: CHECKPOINT 요청에 붙여 보낼 공유 비밀값 (서버의 --checkpoint-secret 과 같아야 함)
+        :param request_timeout: 수락한 때부터 첫 패킷(재접속 토큰, 맵 요청)을 기다리는 시간 (풀 대기 시간 포함)
         """
-        self.server_addresses = server_addresses  # 서버 주소 목록
+        self.server_addresses = list(server_addresses)  # 서버 주소 목록 (변경 시 통째로 교체)
         self.server_status = {address: True for address in server_addresses}  # 서버 상태 관리
+        self.server_draining = {address: False for address in server_addresses}  # 드레인 중인 서버 (새 클라이언트 배정 제외)
+        self.server_capacity = {address: capacity for address in server_addresses}  # 서버별 최대 클라이언트 수
+        self.server_weight = {address: 1.0 for address in server_addresses}  # 서버별 배정 가중치
+        self.server_map = {address: (server_maps or {}).get(address, DEFAULT_MAP) for address in server_addresses}  # 서버별 맵
+        self.default_capacity = capacity
+        self.config_lock = threading.RLock()  # 서버 목록 변경 직렬화 (add_server 안의 ping_server 가 update_server 호출)
+        self.draining = False  # 밸런서 자체 드레인 (새 연결 수락 중단)
+        self.listener = None
         self.server_clients = {address: [] for address in server_addresses}  # 서버별 클라이언트 관리
+        self.sessions = {}  # 클라이언트 연결 -> Session
+        self.session_tokens = {}  # 서버가 발급한 세션 토큰 -> Session (UDP 중계가 확인한 토큰만 경로를 만듦)
+        self.sessions_lock = threading.Lock()
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_secret = checkpoint_secret
+        self.impairment = impairment
+        self.socket_options = socket_options or DEFAULT_SOCKET_OPTIONS
+        self.pools = {
+            "session": BoundedExecutor("session", max_sessions, session_queue, pool_policy),  # 연결 설정 + 서버 -> 클라이언트
+            "relay": BoundedExecutor("relay", max_sessions, session_queue, pool_policy),  # 클라이언트 -> 서버
+            "timer": BoundedExecutor("timer", 4, 16),  # 타이머 휠에서 넘긴 막힐 수 있는 주기 작업 (상태 확인, 체크포인트, 대기열)
+        }
+        self.admission = admission or AdmissionControl()
+        self.dispatching = threading.Lock()  # 대기열 배정은 한 번에 하나만
+        self.drained = threading.Event()  # 드레인 중 설정 중인 연결과 세션이 모두 끝나면 설정
+        self.setups = 0  # 수락했지만 아직 세션이 되지 않은 연결 수 (풀 대기, 요청 확인, 서버 연결 중)
+        self.request_timeout = request_timeout
+        self.reserved = collections.Counter()  # 배정했지만 아직 서버에 연결 중인 세션 수 (정원 계산에 포함)
+        self.idle_timeout = idle_timeout
+        self.timers = shared_wheel()  # 주기 작업, 카운트다운, 유휴 검사를 모두 처리하는 공용 타이머 휠
+        self.matchmaker = Matchmaker(room_size)
+        self.placement_lock = threading.Lock()  # 방 선택과 자리 예약을 한 번에 (동시 배정이 정원을 넘지 않도록)
+        self.init_metrics()
+
+    def init_metrics(self):
+        """
+        운영 지표 등록. start(metrics_port=...) 로 /metrics 엔드포인트에 노출.
+        """
+        self.metrics = Registry()
+        self.connections_total = self.metrics.counter("snake_balancer_connections_total", "Accepted client connections")
+        self.rejected_total = self.metrics.counter("snake_balancer_rejected_total", "Clients closed because no server was available")
+        self.bytes_relayed = self.metrics.counter("snake_balancer_bytes_relayed_total", "Bytes relayed between clients and servers", ["direction"])
+        self.probe_rtt = self.metrics.histogram("snake_balancer_health_probe_seconds", "Health probe round trip time", ["server"])
+        self.migrations_total = self.metrics.counter("snake_balancer_migrations_total", "Sessions moved to another server after a failure")
+        self.probe_failures = self.metrics.counter("snake_balancer_health_probe_failures_total", "Failed health probes", ["server"])
+        self.metrics.gauge("snake_balancer_server_clients", "Clients assigned per server", ["server"],
+                           callback=lambda: {(f"{host}:{port}",): len(clients) for (host, port), clients in self.server_clients.items()})
+        self.metrics.gauge("snake_balancer_server_draining", "Server drain status (1 = draining)", ["server"],
+                           callback=lambda: {(f"{host}:{port}",): int(flag) for (host, port), flag in self.server_draining.items()})
+        self.metrics.gauge("snake_balancer_sessions", "Active proxied sessions", callback=lambda: len(self.sessions))
+        self.idle_sessions_closed_total = self.metrics.counter("snake_balancer_idle_sessions_closed_total",
+                                                               "Sessions closed because the client went silent")
+        self.rate_limited_total = self.metrics.counter("snake_balancer_rate_limited_total",
+                                                       "Connections refused by the accept rate limit")
+        self.queue_rejected_total = self.metrics.counter("snake_balancer_queue_rejected_total",
+                                                         "Connections refused because the wait queue was full")
+        self.queue_wait_seconds = self.metrics.histogram("snake_balancer_queue_wait_seconds", "Time spent waiting for a free server",
+                                                         buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+        self.metrics.gauge("snake_balancer_wait_queue", "Connections waiting for a free server",
+                           callback=lambda: len(self.admission.waiting))
+        self.pool_rejected_total = self.metrics.counter("snake_balancer_pool_rejected_total",
+                                                        "Tasks refused because a worker pool and its queue were full", ["pool"])
+        self.metrics.gauge("snake_balancer_pool_active", "Running tasks per worker pool", ["pool"],
+                           callback=lambda: {(name,): pool.active for name, pool in self.pools.items()})
+        self.metrics.gauge("snake_balancer_pool_queued", "Queued tasks per worker pool", ["pool"],
+                           callback=lambda: {(name,): pool.queued() for name, pool in self.pools.items()})
+        self.matches_total = self.metrics.counter("snake_balancer_matches_total", "Players placed into a room", ["map"])
+        self.metrics.gauge("snake_balancer_rooms", "Open matchmaking rooms per map", ["map"],
+                           callback=lambda: {(map_name,): count for map_name, count in collections.Counter(
+                               room.map_name for room in list(self.matchmaker.rooms.values())).items()})
+        self.metrics.gauge("snake_balancer_server_up", "Server health status (1 = up)", ["server"],
+                           callback=lambda: {(f"{host}:{port}",): int(up) for (host, port), up in self.server_status.items()})
 
     def health_check(self):
         """
-        서버 상태를 주기적으로 확인하여 비정상 서버를 제외.
+        서버 상태를 확인하여 비정상 서버를 제외 (타이머 휠이 5초마다 timer 풀에서 실행).
         """
-        while True:
-            for address in self.server_addresses:
-                is_alive = self.ping_server(address)  # 서버 상태 확인
+        for address in self.server_addresses:
+            is_alive = self.ping_server(address)  # 서버 상태 확인
+            if address not in self.server_status:
+                continue  # 확인하는 동안 관리 소켓으로 제거된 서버
 
-                if is_alive and not self.server_status[address]:
-                    print(f"Server {address} has reconnected.")  # 서버 재연결 메시지 출력
-                elif not is_alive and self.server_status[address]:
-                    print(f"Server {address} is down.")
-                    self.close_clients_of_server(address)  # 서버 다운 시 연결된 클라이언트 종료
+            if is_alive and not self.server_status[address]:
+                log.info("server_reconnected", server=address)  # 서버 재연결 메시지 출력
+            elif not is_alive and self.server_status[address]:
+                log.warning("server_down", server=address)
+                self.update_server("server_status", address, is_alive)
+                self.close_clients_of_server(address)  # 서버 다운 시 연결된 세션을 다른 서버로 이전
 
-                self.server_status[address] = is_alive
-            
-            time.sleep(5)  # 5초마다 상태 확인
+            self.update_server("server_status", address, is_alive)
 
     def close_clients_of_server(self, server_address):
         """
-        특정 서버에 연결된 모든 클라이언트 연결 종료.
+        특정 서버가 다운되었을 때 그 서버의 세션을 정상 서버로 이전.
+        이전할 서버가 없으면 기존처럼 카운트다운 후 연결 종료.
         """
-        if server_address in self.server_clients:
-            clients = self.server_clients[server_address]
-            for client in clients:
-                threading.Thread(target=self.close_client_with_countdown, args=(client,)).start()
-            self.server_clients[server_address] = []  # 클라이언트 목록 초기화
+        with self.sessions_lock:
+            sessions = [session for session in self.sessions.values() if session.server_address == server_address]
+        for session in sessions:
+            try:
+                session.server_conn.shutdown(socket.SHUT_RDWR)  # 하향 중계 쓰레드가 감지하고 migrate_session 실행
+            except (OSError, AttributeError):
+                pass
 
-    def close_client_with_countdown(self, client_conn):
+    def close_client_with_countdown(self, client_conn, seconds=5):
         """
         클라이언트를 5초 카운트다운 후 종료.
+        클라이언트마다 쓰레드를 두지 않고 타이머 휠이 1초마다 다음 메시지를 보냄 (블로킹 없는 전송).
         """
+        if notify(client_conn, {"message": f"Server is down. Connection will close in {seconds} seconds."}):
+            self.timers.schedule(1, self.countdown_step, client_conn, seconds)
+        else:
+            self.close_client(client_conn)  # 클라이언트 연결이 이미 닫힌 경우
+
+    def countdown_step(self, client_conn, remaining):
+        if not notify(client_conn, {"message": f"{remaining}..."}):
+            self.close_client(client_conn)  # 클라이언트가 닫힌 경우 카운트다운 중단
+        elif remaining > 1:
+            self.timers.schedule(1, self.countdown_step, client_conn, remaining - 1)
+        else:
+            notify(client_conn, {"message": "Connection closed."})
+            self.close_client(client_conn)
+
+    @staticmethod
+    def close_client(client_conn):
+        """상향 중계 쓰레드가 recv 에서 깨어나도록 shutdown 후 닫음 (close 만으로는 recv 중인 소켓이 닫히지 않음)"""
         try:
-            # 메시지를 pickle로 직렬화하여 전송
-            message = {"message": "Server is down. Connection will close in 5 seconds."}
-            client_conn.sendall(pickle.dumps(message))
-            for i in range(5, 0, -1):
-                time.sleep(1)
-                try:
-                    countdown_message = {"message": f"{i}..."}
-                    client_conn.sendall(pickle.dumps(countdown_message))
-                except socket.error:
-                    break  # 클라이언트가 닫힌 경우 루프 종료
-            final_message = {"message": "Connection closed."}
-            client_conn.sendall(pickle.dumps(final_message))
-        except socket.error:
-            pass  # 클라이언트 연결이 이미 닫힌 경우 예외 무시
-        finally:
-            client_conn.close()
+            client_conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client_conn.close()
 
     def ping_server(self, address):
         """
@@ -70,119 +181,742 @@ class LoadBalancer:
         :param address: 서버 주소 (IP, Port)
         :return: True(정상), False(비정상)
         """
+        label = f"{address[0]}:{address[1]}"
+        start = time.perf_counter()
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
                 sock.settimeout(2)  # 타임아웃 설정
                 sock.connect(address)
                 sock.sendall(b'PING')  # 하트비트 메시지 전송
                 response = sock.recv(1024)
-                return response == b'PONG'  # 서버에서 PONG 응답 확인
+                alive = response in (b'PONG', b'DRAINING')  # 서버에서 PONG (또는 드레인 중) 응답 확인
+                draining = response == b'DRAINING'
+                if address in self.server_draining and draining != self.server_draining[address]:
+                    log.warning("server_draining" if draining else "server_undrained", server=address)
+                    self.update_server("server_draining", address, draining)
         except (socket.error, socket.timeout):
-            return False
+            alive = False
+        self.probe_rtt.observe(time.perf_counter() - start, server=label)
+        if not alive:
+            self.probe_failures.inc(server=label)
+        return alive
 
-    def get_next_server(self):
+    def candidates(self, exclude=None):
         """
-        클라이언트를 할당할 다음 서버를 가져옵니다.
-        :return: 선택된 서버 주소
+        새 클라이언트를 받을 수 있는 서버 목록 (활성, 드레인 아님, 가중치 > 0).
+        :param exclude: 제외할 서버 주소 (세션 이전 시 장애 서버)
+        :return: [(서버 주소, 맵, 남은 자리(정원 없으면 None), 가중치 대비 부하)]
         """
-        # 활성화된 서버 중 랜덤으로 선택
-        active_servers = [server for server, status in self.server_status.items() if status]
-        if not active_servers:
-            return None
+        status, clients, capacity, weight = self.server_status, self.server_clients, self.server_capacity, self.server_weight
+        servers = []
+        for server in self.server_addresses:
+            if not status.get(server) or server == exclude or self.server_draining.get(server) or weight.get(server, 1.0) <= 0:
+                continue
+            taken = len(clients.get(server, ())) + self.reserved[server]
+            free = None if capacity.get(server) is None else capacity[server] - taken
+            servers.append((server, self.server_map.get(server, DEFAULT_MAP), free, taken / weight.get(server, 1.0)))
+        return servers
 
-        target_server = random.choice(active_servers)
+    def matchmake(self, client_addr, map_name, exclude=None):
+        """
+        클라이언트를 map_name 맵의 방에 넣고 그 방 서버에 자리 예약 (연결 시도가 끝나면 reserve(-1) 로 해제).
+        같은 맵의 덜 찬 방부터 채우고, 열린 방이 없으면 가장 한가한 서버에 새 방을 엶 (Matchmaker 참고).
+        :param map_name: 원하는 맵 (None 이면 아무 맵)
+        :return: 배정된 Room, 자리가 없으면 None
+        """
+        with self.placement_lock:
+            self.matchmaker.leave(client_addr)  # 이전하는 세션은 원래 방에서 나감
+            room = self.matchmaker.place(client_addr, map_name, self.candidates(exclude))
+            if room is not None:
+                self.reserve(room.server, 1)
+        if room is not None:
+            self.matches_total.inc(map=room.map_name)
+            log.info("client_matched", addr=client_addr, room=room.room_id, map=room.map_name, server=room.server,
+                     players=len(room.members), target=room.target)
+        return room
 
-        # 특정 서버에 클라이언트가 과도하게 몰린 경우 부하 분산
-        avg_clients = sum(len(self.server_clients[server]) for server in active_servers) / len(active_servers)
-        if len(self.server_clients[target_server]) > avg_clients * 1.5:  # 과도한 부하 기준
-            target_server = min(active_servers, key=lambda server: len(self.server_clients[server]))
-            print(f"Reassigning to least loaded server: {target_server}")
-        return target_server
+    def add_server(self, address, capacity=None, weight=1.0, map_name=DEFAULT_MAP):
+        """
+        실행 중에 서버 추가. 모든 상태를 준비한 뒤 목록을 교체하므로 다른 쓰레드에는 한 번에 반영됨.
+        """
+        with self.config_lock:
+            if address in self.server_addresses:
+                return False
+            self.server_status = {**self.server_status, address: self.ping_server(address)}
+            self.server_draining = {**self.server_draining, address: False}
+            self.server_clients = {**self.server_clients, address: []}
+            self.server_capacity = {**self.server_capacity, address: capacity if capacity is not None else self.default_capacity}
+            self.server_weight = {**self.server_weight, address: weight}
+            self.server_map = {**self.server_map, address: map_name}
+            self.server_addresses = self.server_addresses + [address]
+        log.warning("server_added", server=address, map=map_name, up=self.server_status[address])
+        return True
+
+    def remove_server(self, address):
+        """
+        서버를 배정 대상에서 제거. 이미 중계 중인 세션은 끊지 않고 끝날 때까지 유지.
+        """
+        with self.config_lock:
+            if address not in self.server_addresses:
+                return False
+            self.server_addresses = [server for server in self.server_addresses if server != address]
+            for name in ("server_status", "server_draining", "server_clients", "server_capacity", "server_weight",
+                         "server_map"):
+                setattr(self, name, {key: value for key, value in getattr(self, name).items() if key != address})
+        log.warning("server_removed", server=address)
+        return True
 
-    def start(self, host='localhost', port=8080):
+    def update_server(self, name, address, value):
+        """
+        서버별 상태 사전(server_status 등) 한 항목 변경. add_server/remove_server 처럼 복사본을 고쳐 통째로 교체하고,
+        그 사이 제거된 서버는 다시 넣지 않음 (상태 확인이나 세션 이전 도중 관리 소켓으로 제거된 경우).
+        :return: 등록된 서버면 True (값이 같아 바꾸지 않은 경우 포함)
+        """
+        with self.config_lock:
+            current = getattr(self, name)
+            if address not in current:
+                return False
+            if current[address] != value:
+                setattr(self, name, {**current, address: value})
+            return True
+
+    def set_capacity(self, address, capacity):
+        """서버 정원 변경 (None 이면 제한 없음)"""
+        if not self.update_server("server_capacity", address, capacity):
+            return False
+        log.warning("server_capacity_changed", server=address, capacity=capacity)
+        return True
+
+    def set_weight(self, address, weight):
+        """서버 배정 가중치 변경 (0 이면 새 배정 없음)"""
+        if not self.update_server("server_weight", address, weight):
+            return False
+        log.warning("server_weight_changed", server=address, weight=weight)
+        return True
+
+    def describe(self):
+        """관리 소켓용 현재 상태"""
+        with self.sessions_lock:
+            sessions = list(self.sessions.values())
+        return {
+            "draining": self.draining,
+            "sessions": len(sessions),
+            "waiting": len(self.admission.waiting),
+            "rooms": self.matchmaker.describe(),
+            "servers": [
+                {
+                    "address": f"{host}:{port}",
+                    "up": self.server_status.get((host, port)),
+                    "draining": self.server_draining.get((host, port)),
+                    "clients": len(self.server_clients.get((host, port), [])),
+                    "sessions": sum(1 for session in sessions if session.server_address == (host, port)),
+                    "capacity": self.server_capacity.get((host, port)),
+                    "weight": self.server_weight.get((host, port)),
+                    "map": self.server_map.get((host, port)),
+                }
+                for host, port in self.server_addresses
+            ],
+        }
+
+    def start(self, host='localhost', port=8080, metrics_port=None, admin_port=None, udp=False, backlog=128):
         """
         로드 밸런서를 실행하여 클라이언트 요청 처리.
         :param host: 로드 밸런서가 수신할 IP
         :param port: 로드 밸런서가 수신할 포트
+        :param metrics_port: 지정 시 이 포트로 /metrics HTTP 엔드포인트 실행
+        :param admin_port: 지정 시 localhost 에서 관리 명령(admin.py)을 받음
+        :param udp: True 이면 같은 포트의 UDP 패킷을 세션 토큰의 게임 서버로 중계
+        :param backlog: 커널 수락 대기열 크기 (listen backlog)
         """
         balancer_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         balancer_socket.bind((host, port))
-        balancer_socket.listen()
-        print(f"Load Balancer started on {host}:{port}")
+        balancer_socket.listen(backlog)
+        self.listener = balancer_socket
+        log.info("balancer_started", host=host, port=balancer_socket.getsockname()[1])
+        if metrics_port is not None:
+            start_metrics_server(self.metrics, host, metrics_port)
+        if admin_port is not None:
+            AdminServer(self, 'localhost', admin_port).start()
+        if udp:
+            UdpRelay(self.udp_target, max_routes=self.pools["session"].max_workers,
+                     timers=self.timers).start(host, balancer_socket.getsockname()[1])
 
-        # 서버 상태 확인 쓰레드 실행
-        threading.Thread(target=self.health_check, daemon=True).start()
+        # 서버 상태 확인 / 체크포인트 수집 / 대기열 배정을 공용 타이머 휠에 등록 (막힐 수 있으므로 timer 풀에서 실행)
+        self.timers.repeat(5, self.health_check, executor=self.pools["timer"], delay=0)
+        self.timers.repeat(self.checkpoint_interval, self.collect_checkpoints, executor=self.pools["timer"])
+        self.timers.repeat(0.5, self.dispatch_waiting, executor=self.pools["timer"])
 
-        while True:
+        while not self.draining:
             # 클라이언트 연결 수락
-            client_conn, client_addr = balancer_socket.accept()
-            print(f"Client connected: {client_addr}")
+            try:
+                client_conn, client_addr = balancer_socket.accept()
+            except OSError:
+                break  # drain() 이 수신 소켓을 닫음
+            log.info("client_connected", addr=client_addr)
+            self.connections_total.inc()
+            if not self.admission.admit(client_addr[0]):
+                self.rate_limited_total.inc()
+                log.warning("client_rate_limited", addr=client_addr)
+                notify(client_conn, {"message": "Too many connections. Please try again shortly.", "retry_after": 1})
+                client_conn.close()
+                continue
 
-            # 서버 선택
-            target_server = self.get_next_server()
-            if not target_server:
-                print("No active servers available. Closing client connection.")
+            if not any(self.server_status.get(address) and not self.server_draining.get(address)
+                       for address in self.server_addresses):
+                log.warning("no_active_servers", addr=client_addr)
+                self.rejected_total.inc()
                 client_conn.close()
                 continue
 
-            print(f"Forwarding client {client_addr} to server {target_server}")
+            # 요청 확인, 매치메이킹, 서버 연결은 풀에서 (accept 루프는 첫 패킷을 기다리지 않음)
+            self.setup_started()
+            deadline = time.monotonic() + self.request_timeout
+            if not self.pools["session"].submit(self.redirect_client, client_conn, client_addr, deadline):
+                self.setup_finished()
+                self.pool_rejected_total.inc(pool="session")
+                self.rejected_total.inc()
+                client_conn.close()
 
-            # 클라이언트 연결을 서버에 매핑
-            self.server_clients[target_server].append(client_conn)
+        self.wait_until_drained()
 
-            # 클라이언트를 서버로 전달하는 쓰레드 생성
-            threading.Thread(target=self.redirect_client, args=(client_conn, target_server)).start()
+    def drain(self):
+        """
+        밸런서 드레인: 새 연결 수락을 멈추고 기존 세션은 끝날 때까지 계속 중계.
+        모든 세션이 끝나면 start() 가 반환됨.
+        """
+        if self.draining:
+            return
+        self.draining = True
+        log.warning("drain_started", sessions=len(self.sessions), setups=self.setups)
+        self.check_drained()
+        if self.listener is not None:
+            try:
+                self.listener.shutdown(socket.SHUT_RDWR)  # 다른 쓰레드에서 대기 중인 accept() 깨우기
+            except OSError:
+                pass
+            self.listener.close()
+        while (entry := self.admission.dequeue()) is not None:  # 대기 중인 연결은 배정 없이 돌려보냄
+            notify(entry[0], {"message": "Server is shutting down. Please try again later."})
+            entry[0].close()
+
+    def setup_started(self):
+        with self.sessions_lock:
+            self.setups += 1
+
+    def setup_finished(self):
+        with self.sessions_lock:
+            self.setups -= 1
+        self.check_drained()
+
+    def check_drained(self):
+        """드레인 중 설정 중인 연결도 세션도 없으면 drained 설정 (설정 중인 연결이 곧 세션이 될 수 있으므로 함께 확인)"""
+        with self.sessions_lock:
+            if self.draining and not self.setups and not self.sessions:
+                self.drained.set()
+
+    def enqueue_client(self, client_conn, client_addr, map_name=None):
+        """빈 서버를 기다리는 대기열에 넣고 예상 대기 시간을 안내. 대기열이 가득 차면 바로 거절"""
+        if self.draining:  # drain() 이 대기열을 이미 비웠으므로 새로 넣지 않음
+            notify(client_conn, {"message": "Server is shutting down. Please try again later."})
+            client_conn.close()
+            return
+        position = self.admission.enqueue(client_conn, client_addr, map_name)
+        if position is None:
+            self.queue_rejected_total.inc()
+            self.rejected_total.inc()
+            retry_after = self.admission.estimated_wait(self.admission.queue_limit + 1)
+            log.warning("wait_queue_full", addr=client_addr, retry_after=retry_after)
+            notify(client_conn, {"message": "All servers are full. Please try again later.", "retry_after": retry_after})
+            client_conn.close()
+            return
+        wait = self.admission.estimated_wait(position)
+        log.info("client_queued", addr=client_addr, map=map_name, position=position, estimated_wait=wait)
+        notify(client_conn, {"message": f"All servers are full. You are number {position} in line"
+                                        + (f", estimated wait {wait:.0f}s." if wait is not None else "."),
+                             "queue_position": position, "estimated_wait": wait})
 
-    def redirect_client(self, client_conn, target_server):
+    def dispatch_waiting(self):
         """
-        클라이언트와 서버 간 직접 연결 설정.
+        대기 중인 연결을 빈 서버의 방에 배정 (세션이 끝날 때, 그리고 0.5초마다 timer 풀에서 실행).
+        원하는 맵이 가득 찬 연결은 순서를 유지한 채 남겨 두고 다른 맵을 기다리는 연결은 계속 배정 (맵 간 head-of-line 방지).
         """
+        if not self.dispatching.acquire(blocking=False):
+            return  # 이미 배정 중인 쪽이 이어서 처리
+        skipped = []
+        full_maps = set()  # 이번 회차에 자리가 없던 맵 (None 은 모든 맵)
         try:
-            # 서버와 연결
-            server_conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server_conn.connect(target_server)
+            while None not in full_maps:
+                self.setup_started()  # 꺼낸 연결이 세션이 될 때까지 드레인 완료로 보지 않음
+                try:
+                    if (entry := self.admission.dequeue()) is None:
+                        break
+                    client_conn, client_addr, enqueued, map_name = entry
+                    room = None if map_name in full_maps else self.matchmake(client_addr, map_name)
+                    if room is None:
+                        full_maps.add(map_name)
+                        skipped.append(entry)
+                        continue
+                    self.queue_wait_seconds.observe(time.monotonic() - enqueued)
+                    log.info("client_dequeued", addr=client_addr, server=room.server, room=room.room_id)
+                    session = self.open_session(client_conn, room.server, client_addr, map_name)
+                    if session is None:
+                        continue
+                    if not self.pools["session"].submit(self.forward, session):
+                        self.pool_rejected_total.inc(pool="session")
+                        self.end_session(session)
+                        session.server_conn.close()
+                        session.client_conn.close()
+                finally:
+                    self.setup_finished()
+        finally:
+            for entry in reversed(skipped):
+                self.admission.requeue(entry)
+            self.dispatching.release()
 
-            # 클라이언트를 서버로 직접 연결
-            self.forward(client_conn, server_conn)
+    def wait_until_drained(self):
+        self.drained.wait()
+        log.warning("drain_complete")
 
-        except ConnectionRefusedError:
-            print(f"Connection to server {target_server} failed. Closing client connection.")
-            self.close_client_with_countdown(client_conn)
+    def redirect_client(self, client_conn, client_addr, deadline):
+        """
+        세션을 설정한 뒤 중계 (session 풀). 설정이 끝나면 setups 에서 빠지고 이후에는 세션으로 드레인에 반영됨.
+        :param deadline: 첫 패킷을 기다릴 마감 시각 (time.monotonic 기준, 수락 시각 + request_timeout)
+        """
+        try:
+            session = self.setup_client(client_conn, client_addr, deadline)
+        finally:
+            self.setup_finished()
+        if session is not None:
+            self.forward(session)
 
-    def forward(self, client_conn, server_conn):
+    def setup_client(self, client_conn, client_addr, deadline):
         """
-        클라이언트와 서버 간의 직접 통신을 설정.
+        클라이언트 요청을 읽고 서버를 정해 세션 연결.
+          - 재접속 토큰이면 토큰을 발급한 서버 (원래 서버가 없으면 일반 배정)
+          - 아니면 요청한 맵(없으면 아무 맵)의 방에 배정, 자리가 없으면 대기열
+        :return: 연결된 세션, 대기열에 넣었거나 닫았으면 None
+        """
+        resume_server, map_name = self.read_request(client_conn, deadline)
+        if resume_server is not None:
+            with self.placement_lock:
+                self.matchmaker.place(client_addr, None, [(resume_server, self.server_map.get(resume_server, DEFAULT_MAP), None, 0)])
+                self.reserve(resume_server, 1)
+            target_server = resume_server
+        else:
+            room = self.matchmake(client_addr, map_name)
+            if room is None:
+                self.enqueue_client(client_conn, client_addr, map_name)  # 서버는 있지만 맞는 서버가 모두 정원이 찬 경우
+                return None
+            target_server = room.server
+        log.info("client_forwarded", addr=client_addr, server=target_server)
+        return self.open_session(client_conn, target_server, client_addr, map_name, resume=resume_server is not None)
+
+    def open_session(self, client_conn, target_server, client_addr=None, map_name=None, resume=False):
+        """
+        세션을 만들고 서버에 연결 (서버의 클라이언트 목록에 들어가 정원에 반영됨).
+        :param target_server: reserve() 로 자리를 예약해 둔 서버 (연결 시도가 끝나면 예약 해제)
+        :param map_name: 클라이언트가 요청한 맵 (세션 이전 시에도 같은 맵 우선)
+        :param resume: 클라이언트의 첫 패킷이 재접속 토큰 (서버가 토큰으로 원래 방을 복원하므로 방 번호를 보내지 않음)
+        :return: 연결된 세션, 옮길 서버도 없어 클라이언트를 닫았으면 None
         """
         try:
-            # 서버와 클라이언트 간 양방향 데이터 전송
-            threading.Thread(target=self.transfer, args=(client_conn, server_conn)).start()
-            self.transfer(server_conn, client_conn)
+            return self.connect_client(client_conn, target_server, client_addr, map_name, resume)
         finally:
-            client_conn.close()
+            self.reserve(target_server, -1)
+
+    def reserve(self, address, count):
+        with self.sessions_lock:
+            self.reserved[address] += count
+
+    def connect_client(self, client_conn, target_server, client_addr, map_name=None, resume=False):
+        self.socket_options.apply(client_conn)
+        if self.impairment is not None:
+            client_conn = ImpairedSocket(client_conn, self.impairment)  # 이후 중계는 장애 링크를 거침
+        session = Session(client_conn, client_addr, target_server, map_name)
+        session.resuming = resume
+        with self.sessions_lock:
+            self.sessions[client_conn] = session
+        if self.idle_timeout:
+            self.timers.schedule(self.idle_timeout, self.check_idle, session)
+        try:
+            self.connect_session(session, target_server)
+        except OSError:
+            log.error("server_connect_failed", server=target_server)
+            if not self.migrate_session(session, None):
+                self.end_session(session)
+                self.close_client_with_countdown(client_conn)
+                return None
+        return session
+
+    def read_request(self, client_conn, deadline):
+        """
+        첫 패킷으로 클라이언트 요청 확인 (deadline 까지 오지 않으면 요청 없음으로 보고 일반 배정).
+          - b'RESUME <서버 이름>/...': 재접속. 확인만(MSG_PEEK) 하므로 서버가 토큰을 그대로 받음
+          - b'MATCH <맵>\\n': 원하는 맵. 밸런서에 보내는 요청이므로 그 줄만 읽어 없앰
+        :return: (재접속할 서버 주소 또는 None, 요청 맵 또는 None)
+        """
+        try:
+            client_conn.settimeout(max(0.0, deadline - time.monotonic()) or 0.001)  # 마감이 지났으면 이미 온 패킷만 확인
+            first_packet = client_conn.recv(1024, socket.MSG_PEEK)
+            if first_packet.startswith(b'MATCH '):
+                line = first_packet.split(b'\n', 1)[0]
+                client_conn.recv(len(line) + 1 if len(line) < len(first_packet) else len(line))
+                return None, line[6:].decode(errors='replace').strip() or None
+        except OSError:
+            return None, None
+        finally:
+            client_conn.settimeout(None)
+        if not first_packet.startswith(b'RESUME '):
+            return None, None
+        address = self.server_for_token(first_packet[7:].decode(errors='replace'))
+        if address is not None and self.server_status.get(address) and not self.server_draining.get(address):
+            log.info("client_resume_routed", server=address)
+            return address, None
+        return None, None  # 원래 서버가 없거나 다운된 경우 일반 배정 (서버가 새 뱀으로 시작)
+
+    def server_for_token(self, token):
+        """세션 토큰('<IP>:<포트>/...')을 발급한 서버 주소 (목록에 없으면 None)"""
+        server_name = token.split('/', 1)[0]
+        for address in self.server_addresses:
+            if f"{address[0]}:{address[1]}" == server_name:
+                return address
+        return None
+
+    def udp_target(self, token):
+        """UDP 패킷의 세션 토큰을 발급한 살아 있는 세션의 현재 서버 주소 (모르는 토큰이면 None)"""
+        with self.sessions_lock:
+            session = self.session_tokens.get(token)
+        if session is None or session.closed:
+            return None
+        return session.server_address
+
+    def note_session_token(self, session, data):
+        """
+        서버 연결의 첫 메시지({"session": 토큰, ...})에서 토큰을 읽어 UDP 중계가 확인할 수 있게 등록.
+        메시지가 여러 번에 나뉘어 와도 이어 붙여 확인하고, 토큰 없이 다른 메시지가 오면 더 보지 않음.
+        """
+        session.greeting += data
+        messages = loads_all(session.greeting)
+        if not messages:
+            if len(session.greeting) > 65536:
+                session.greeting = None  # 세션 메시지가 아님
+            return
+        session.greeting = None
+        if isinstance(messages[0], dict) and isinstance(messages[0].get("session"), str):
+            with self.sessions_lock:
+                if self.sessions.get(session.client_conn) is session:
+                    session.token = messages[0]["session"]
+                    self.session_tokens[session.token] = session
+
+    def forget_session_token(self, session):
+        """세션이 끝나거나 다른 서버로 옮겨 가면 이전 토큰으로는 UDP 경로를 만들 수 없게 함"""
+        with self.sessions_lock:
+            if session.token is not None and self.session_tokens.get(session.token) is session:
+                del self.session_tokens[session.token]
+            session.token = None
+
+    def connect_session(self, session, address):
+        """세션을 address 서버에 연결 (연결을 열고 바로 세션에 연결, 다른 쓰레드가 아직 세션을 쓰지 않을 때)"""
+        self.attach_server(session, address, self.dial_server(session, address))
+
+    def dial_server(self, session, address):
+        """
+        address 서버에 세션용 연결을 열어 반환 (세션 상태는 바꾸지 않으므로 session.lock 없이 호출).
+        첫 패킷으로 매치메이킹 방 번호를 보내 같은 방 플레이어끼리 한 월드에 두고,
+        체크포인트가 있으면 함께 보내 플레이어 상태를 복원.
+        재접속(첫 연결)이면 클라이언트의 RESUME 이 첫 패킷이어야 하므로 보내지 않음 (서버가 토큰으로 방을 복원).
+        """
+        server_conn = socket.create_connection(address, timeout=2)
+        try:
+            server_conn.settimeout(None)
+            self.socket_options.apply(server_conn)
+            first_packet = b''
+            room = self.matchmaker.room_of(session.client_addr)
+            if room is not None and not session.resuming:
+                first_packet += encode({"room_id": room.room_id})
+            if session.checkpoint is not None:
+                try:
+                    first_packet += encode({"restore": session.checkpoint})
+                except ValueError:
+                    log.warning("checkpoint_not_encodable", addr=session.client_addr)  # 새 뱀으로 시작
+            if first_packet:
+                server_conn.sendall(first_packet)
+        except OSError:
             server_conn.close()
+            raise
+        return server_conn
+
+    def attach_server(self, session, address, server_conn):
+        """dial_server 로 연 연결을 세션의 서버 연결로 교체하고 서버별 클라이언트 목록 갱신"""
+        session.resuming = False  # 이전할 새 서버에는 RESUME 이 가지 않음
+        previous = session.server_address
+        self.forget_session_token(session)
+        session.greeting = b''  # 새 서버가 발급할 토큰을 기다림
+        session.server_conn = server_conn
+        session.server_local = server_conn.getsockname()  # 서버가 보는 이 세션의 주소 (체크포인트 매칭용)
+        session.server_address = address
+        if previous in self.server_clients and session.client_conn in self.server_clients[previous]:
+            self.server_clients[previous].remove(session.client_conn)
+        clients = self.server_clients.get(address)
+        if clients is not None:  # 관리 소켓으로 제거된 서버면 목록 없이 세션만 유지
+            clients.append(session.client_conn)
+
+    def migrate_session(self, session, failed_conn):
+        """
+        서버 연결이 끊긴 세션을 다른 정상 서버로 옮김.
+        하트비트와 새 서버 연결(각각 최대 2초)은 session.lock 밖에서 하고, 잠금은 세션이 그대로인지 확인하고
+        서버 연결을 교체할 때만 잡음 (그동안 end_session 이나 반대 방향 중계가 잠금을 기다리지 않도록).
+        :param failed_conn: 끊긴 서버 연결 (다른 쓰레드가 이미 교체했으면 그대로 성공 처리)
+        :return: 새 서버 연결이 준비되면 True
+        """
+        with session.lock:
+            if session.closed:
+                return False
+            if session.server_conn is not failed_conn:
+                return True  # 반대 방향 쓰레드가 이미 이전함
+            failed_address = session.server_address
+            if failed_conn is not None:
+                failed_conn.close()
+        if not self.ping_server(failed_address):
+            self.update_server("server_status", failed_address, False)
+        for _ in range(len(self.server_addresses)):
+            # 같은 맵의 방을 우선으로, 없으면 다른 맵이라도 이어서 플레이
+            room = self.matchmake(session.client_addr, session.map_name, exclude=failed_address)
+            if room is None and session.map_name is not None:
+                room = self.matchmake(session.client_addr, None, exclude=failed_address)
+            if room is None:
+                break
+            target_server = room.server
+            try:
+                server_conn = self.dial_server(session, target_server)
+            except OSError:
+                self.update_server("server_status", target_server, False)
+                continue
+            finally:
+                self.reserve(target_server, -1)
+            with session.lock:
+                if session.closed or session.server_conn is not failed_conn:
+                    server_conn.close()  # 그사이 세션이 끝났거나 반대 방향 쓰레드가 먼저 이전함
+                    return not session.closed
+                self.attach_server(session, target_server, server_conn)
+            self.migrations_total.inc()
+            log.info("session_migrated", addr=session.client_addr, source=failed_address, server=target_server,
+                     restored=session.checkpoint is not None)
+            return True
+        log.warning("session_migration_failed", addr=session.client_addr, source=failed_address)
+        return False
+
+    def end_session(self, session):
+        """세션 종료 및 서버별 클라이언트 목록에서 제거"""
+        with session.lock:
+            session.closed = True
+        with self.sessions_lock:
+            ended = self.sessions.pop(session.client_conn, None)
+        self.forget_session_token(session)
+        clients = self.server_clients.get(session.server_address, [])
+        if session.client_conn in clients:
+            clients.remove(session.client_conn)
+        if ended is not None:
+            self.matchmaker.leave(session.client_addr)  # 빈 방은 닫힘
+            self.admission.note_departure()
+            if self.admission.waiting:
+                self.pools["timer"].submit(self.dispatch_waiting)  # 비워진 자리에 대기 중인 연결 배정
+            self.check_drained()
+
+    def forward(self, session):
+        """
+        클라이언트와 서버 간 양방향 중계. 서버 연결이 끊기면 세션을 이전하고 계속 중계.
+        """
+        outcome = False
+        try:
+            if not self.pools["relay"].submit(self.relay_upstream, session):
+                self.pool_rejected_total.inc(pool="relay")
+                return
+            outcome = self.relay_downstream(session)
+        finally:
+            self.end_session(session)
+            if session.server_conn is not None:
+                session.server_conn.close()
+            if outcome is None:
+                self.close_client_with_countdown(session.client_conn)  # 옮길 서버가 없는 경우
+            else:
+                session.client_conn.close()
 
-    def transfer(self, source_conn, destination_conn):
+    def relay_upstream(self, session):
         """
-        데이터 전송 처리.
+        클라이언트 -> 서버 중계. 서버로 보내기 실패 시 이전된 새 서버로 재전송.
         """
         try:
             while True:
-                data = source_conn.recv(4096)
+                data = session.client_conn.recv(4096)
                 if not data:  # 데이터가 없으면 연결 종료
                     break
-                destination_conn.sendall(data)
-        except (ConnectionResetError, BrokenPipeError, ConnectionAbortedError):
-            print("Connection between client and server was interrupted.")
+                session.last_seen = time.monotonic()
+                self.socket_options.after_recv(session.client_conn)
+                while True:
+                    server_conn = session.server_conn
+                    try:
+                        with tracer.span("relay.sendall"):
+                            server_conn.sendall(data)
+                        break
+                    except OSError:
+                        if not self.migrate_session(session, server_conn):
+                            return
+                self.bytes_relayed.inc(len(data), direction="upstream")
+        except OSError:
+            log.info("relay_interrupted", direction="upstream")
         finally:
-            source_conn.close()
-            destination_conn.close()
+            # 클라이언트 종료: 하향 쓰레드가 이전을 시도하지 않도록 먼저 닫힘 표시
+            with session.lock:
+                session.closed = True
+            try:
+                session.server_conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def check_idle(self, session):
+        """
+        유휴 검사 타이머 (휠 쓰레드). 클라이언트가 idle_timeout 동안 조용하면 연결을 끊어
+        중계 쓰레드를 깨우고 server_clients 자리를 비움. 아니면 남은 시간만큼 다시 예약.
+        """
+        if session.closed or self.sessions.get(session.client_conn) is not session:
+            return
+        idle = time.monotonic() - session.last_seen
+        if idle < self.idle_timeout:
+            self.timers.schedule(self.idle_timeout - idle, self.check_idle, session)
+            return
+        log.warning("session_idle_timeout", addr=session.client_addr, server=session.server_address, idle=round(idle, 1))
+        self.idle_sessions_closed_total.inc()
+        try:
+            session.client_conn.shutdown(socket.SHUT_RDWR)  # 상향 중계의 recv 가 깨어나 세션 정리
+        except OSError:
+            pass
+
+    def relay_downstream(self, session):
+        """
+        서버 -> 클라이언트 중계.
+        :return: 정상 종료 False, 서버 장애 후 옮길 서버가 없으면 None
+        """
+        while True:
+            server_conn = session.server_conn
+            try:
+                data = server_conn.recv(4096)
+                self.socket_options.after_recv(server_conn)
+            except OSError:
+                data = b''
+            if session.closed:
+                return False
+            if not data:
+                if self.migrate_session(session, server_conn):
+                    continue  # 새 서버에서 계속 수신
+                return None if not session.closed else False
+            if session.greeting is not None:
+                self.note_session_token(session, data)
+            try:
+                session.client_conn.sendall(data)
+            except OSError:
+                log.info("relay_interrupted", direction="downstream")
+                return False
+            self.bytes_relayed.inc(len(data), direction="downstream")
+
+    def collect_checkpoints(self):
+        """
+        각 서버에서 플레이어 상태(뱀, 점수)를 받아 세션에 보관 (checkpoint_interval 마다 timer 풀에서 실행).
+        서버 장애 시 이 체크포인트로 새 서버에서 상태를 복원.
+        """
+        for address in self.server_addresses:
+            if not self.server_status.get(address) or not self.server_clients.get(address):
+                continue
+            states = self.fetch_checkpoint(address)
+            if states is None:
+                continue
+            with self.sessions_lock:
+                sessions = [session for session in self.sessions.values() if session.server_address == address]
+            for session in sessions:
+                if session.server_local is not None:
+                    state = states.get(f"{session.server_local[0]}:{session.server_local[1]}")
+                    if state is not None:
+                        session.checkpoint = state
+
+    def fetch_checkpoint(self, address):
+        """서버에 CHECKPOINT 요청. :return: {세션 주소: 플레이어 상태} 또는 None"""
+        try:
+            with socket.create_connection(address, timeout=2) as sock:
+                sock.sendall(b'CHECKPOINT ' + self.checkpoint_secret.encode() if self.checkpoint_secret else b'CHECKPOINT')
+                return recv_frame(sock)
+        except (OSError, EOFError, ValueError):
+            return None
+
+
+class Session:
+    """
+    클라이언트 한 명의 중계 세션. 서버 장애 시 server_conn 만 새 서버 연결로 교체.
+    """
+
+    def __init__(self, client_conn, client_addr, server_address, map_name=None):
+        self.client_conn = client_conn
+        self.client_addr = client_addr
+        self.server_address = server_address
+        self.map_name = map_name  # 클라이언트가 요청한 맵 (None 이면 아무 맵)
+        self.server_conn = None
+        self.server_local = None
+        self.checkpoint = None  # 마지막으로 받은 플레이어 상태 {"snake": ..., "score": ...}
+        self.resuming = False  # 클라이언트 첫 패킷이 재접속 토큰 (첫 서버 연결에 방 번호를 앞세우지 않음)
+        self.token = None  # 현재 서버가 발급한 세션 토큰 (UDP 중계 확인용)
+        self.greeting = b''  # 토큰을 읽기 전까지 받은 서버 첫 메시지 조각 (읽은 뒤에는 None)
+        self.last_seen = time.monotonic()  # 클라이언트에서 마지막으로 받은 시각 (유휴 검사용)
+        self.closed = False
+        self.lock = threading.Lock()
+
 
 if __name__ == "__main__":
-    # 사용할 서버 주소 (IP, 포트)
-    server_addresses = [
-        ('localhost', 5555),  # 첫 번째 게임 서버
-        ('localhost', 5556),  # 두 번째 게임 서버
-        ('localhost', 5557)   # 세 번째 게임 서버
-    ]
-    balancer = LoadBalancer(server_addresses)
-    balancer.start()  # 로드 밸런서 실행
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load Balancer")
+    # 사용할 서버 주소 (IP:포트), 실행 중에는 admin.py 로 추가/제거
+    parser.add_argument('--servers', default='localhost:5555,localhost:5556,localhost:5557',
+                        help='Comma-separated backend game servers, optionally with a map: host:port[=map]')
+    parser.add_argument('--capacity', type=int, default=None, help='Default max clients per server (default: unlimited)')
+    parser.add_argument('--admin-port', type=int, default=None, help='Local admin socket port (see admin.py)')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Expose Prometheus metrics on this port')
+    parser.add_argument('--udp', action='store_true', help='Relay UDP game traffic on the same port')
+    parser.add_argument('--impair', default=None, metavar='SPEC',
+                        help='Impair client traffic for testing, e.g. delay=0.05,jitter=0.01,loss=0.02,bandwidth=125000')
+    parser.add_argument('--sockopts', default=None, metavar='SPEC',
+                        help='Relay socket options, e.g. nodelay=1,sndbuf=65536,rcvbuf=65536,quickack=1,keepalive=10')
+    parser.add_argument('--max-sessions', type=int, default=1024, help='Concurrent relayed sessions (worker pool size)')
+    parser.add_argument('--session-queue', type=int, default=128, help='Connections allowed to wait for a relay worker')
+    parser.add_argument('--pool-policy', default='reject', choices=POLICIES, help='What to do when a pool and its queue are full')
+    parser.add_argument('--idle-timeout', type=float, default=10.0,
+                        help='Close sessions whose client sends nothing (not even keepalives) for this long (0 = never)')
+    parser.add_argument('--room-size', type=int, default=4, help='Players grouped into one matchmaking room')
+    parser.add_argument('--backlog', type=int, default=128, help='Listen backlog for the client socket')
+    parser.add_argument('--accept-rate', type=float, default=None, help='Max accepted connections per second (token bucket)')
+    parser.add_argument('--accept-burst', type=int, default=None, help='Burst size for --accept-rate')
+    parser.add_argument('--per-ip-rate', type=float, default=None, help='Max accepted connections per second from one IP')
+    parser.add_argument('--per-ip-burst', type=int, default=None, help='Burst size for --per-ip-rate')
+    parser.add_argument('--wait-queue', type=int, default=64, help='Connections allowed to wait when every server is full')
+    parser.add_argument('--request-timeout', type=float, default=1.0,
+                        help='Seconds from accept to wait for a RESUME/MATCH first packet before normal placement')
+    parser.add_argument('--checkpoint-secret', default=os.environ.get('SNAKE_CHECKPOINT_SECRET'),
+                        help='Shared secret sent with CHECKPOINT requests (default: $SNAKE_CHECKPOINT_SECRET)')
+    parser.add_argument('--log-level', default='info', choices=list(jsonlog.LEVELS), help='Minimum log level')
+    args = parser.parse_args()
+    jsonlog.set_level(args.log_level)
+
+    server_maps = {}
+    for entry in filter(None, args.servers.split(',')):
+        address, _, map_name = entry.partition('=')
+        server_maps[parse_address(address)] = map_name or DEFAULT_MAP
+    impairment = Impairment.parse(args.impair) if args.impair else None
+    socket_options = SocketOptions.parse(args.sockopts) if args.sockopts else None
+    balancer = LoadBalancer(list(server_maps), capacity=args.capacity, impairment=impairment, socket_options=socket_options,
+                            max_sessions=args.max_sessions, session_queue=args.session_queue, pool_policy=args.pool_policy,
+                            admission=AdmissionControl(args.accept_rate, args.accept_burst, args.per_ip_rate,
+                                                       args.per_ip_burst, args.wait_queue),
+                            idle_timeout=args.idle_timeout, server_maps=server_maps, room_size=args.room_size,
+                            checkpoint_secret=args.checkpoint_secret, request_timeout=args.request_timeout)
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, lambda *_: balancer.drain())  # 롤링 재시작용 드레인
+    balancer.start(metrics_port=args.metrics_port, admin_port=args.admin_port, udp=args.udp,
+                   backlog=args.backlog)  # 로드 밸런서 실행
@@ -0,0 +1,86 @@
+import itertools
+import threading
+
+DEFAULT_MAP = "default"
+
+
+class Room:
+    """한 서버에 함께 배정된 같은 맵의 플레이어 묶음"""
+
+    __slots__ = ("room_id", "map_name", "server", "target", "members")
+
+    def __init__(self, room_id, map_name, server, target):
+        self.room_id = room_id
+        self.map_name = map_name
+        self.server = server  # 방이 열린 서버 주소
+        self.target = target  # 채울 인원 (방을 열 때 서버에 남은 자리와 room_size 중 작은 값)
+        self.members = set()
+
+    def is_open(self):
+        return len(self.members) < self.target
+
+
+class Matchmaker:
+    """
+    밸런서의 매치메이킹. 들어온 플레이어를 맵별 방(Room)으로 묶어 서버에 배정.
+      - 원하는 맵의 서버에 자리가 남은 열린 방이 있으면 가장 많이 찬 방부터 채움 (방을 목표 인원까지 채운 뒤 새 방을 엶)
+      - 열린 방이 없으면 그 맵 서버 중 가중치 대비 부하가 가장 낮은 서버에 새 방을 엶
+      - 맵을 고르지 않은 플레이어(map_name=None)는 모든 맵이 대상
+    서버 목록과 부하는 밸런서가 place() 때마다 넘겨 줌 (밸런서의 서버 설정을 그대로 사용).
+    """
+
+    def __init__(self, room_size=4):
+        self.room_size = room_size
+        self.rooms = {}  # room_id -> Room
+        self.player_room = {}  # 플레이어 -> Room
+        self.room_ids = itertools.cycle(range(1, 1 << 16))  # 게임 서버에 codec 방 번호(16비트)로 전달
+        self.lock = threading.Lock()
+
+    def place(self, player, map_name, candidates):
+        """
+        :param map_name: 원하는 맵 (None 이면 아무 맵)
+        :param candidates: [(서버 주소, 맵, 남은 자리(None 이면 무제한), 부하)] 새 클라이언트를 받을 수 있는 서버
+        :return: 배정된 Room, 맞는 서버에 자리가 없으면 None
+        """
+        servers = {address: (server_map, free, load) for address, server_map, free, load in candidates
+                   if (free is None or free > 0) and map_name in (None, server_map)}
+        if not servers:
+            return None
+        with self.lock:
+            open_rooms = [room for room in self.rooms.values()
+                          if room.server in servers and room.is_open() and map_name in (None, room.map_name)]
+            if open_rooms:
+                room = max(open_rooms, key=lambda room: (len(room.members), -servers[room.server][2]))
+            else:
+                server = min(servers, key=lambda address: servers[address][2])
+                server_map, free, _ = servers[server]
+                room_id = next(self.room_ids)
+                while room_id in self.rooms:
+                    room_id = next(self.room_ids)  # 오래 열려 있는 방의 번호는 건너뜀
+                room = Room(room_id, server_map, server,
+                            self.room_size if free is None else min(self.room_size, free))
+                self.rooms[room.room_id] = room
+            room.members.add(player)
+            self.player_room[player] = room
+            return room
+
+    def leave(self, player):
+        """플레이어를 방에서 빼고 빈 방은 닫음 (방에 없던 플레이어면 무시)"""
+        with self.lock:
+            room = self.player_room.pop(player, None)
+            if room is None:
+                return None
+            room.members.discard(player)
+            if not room.members:
+                self.rooms.pop(room.room_id, None)
+            return room
+
+    def room_of(self, player):
+        return self.player_room.get(player)
+
+    def describe(self):
+        """관리 소켓 / 지표용 방 목록"""
+        with self.lock:
+            return [{"room": room.room_id, "map": room.map_name, "server": f"{room.server[0]}:{room.server[1]}",
+                     "players": len(room.members), "target": room.target}
+                    for room in self.rooms.values()]
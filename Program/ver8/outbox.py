@@ -0,0 +1,83 @@
+import collections
+import select
+import socket
+import threading
+import time
+
+MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)  # 윈도우에는 없으므로 select 로 대신 확인
+
+
+class Outbox:
+    """
+    소켓 하나의 송신 큐.
+    put() 은 메시지를 쌓기만 하고, flush() 가 쌓인 메시지를 합쳐 한 번의 논블로킹 send 로 보냄
+    (틱마다 flush 하면 수신자당 시스템 콜이 메시지 수와 관계없이 한 번).
+    수신이 느린 클라이언트 때문에 방송 쓰레드가 막히지 않도록:
+      - 큐에는 최대 limit 개만 두고 넘치면 가장 오래된 메시지를 버림 (상태 스냅샷은 새 스냅샷이 대체)
+      - 커널 송신 버퍼가 가득 차 보내지 못한 바이트는 다음 flush 에서 이어서 보냄
+      - 보내다 만 바이트가 stall_timeout 초 넘게 남아 있으면 should_evict() 가 True (느린 클라이언트)
+    """
+
+    def __init__(self, sock, limit=8, stall_timeout=5.0):
+        self.sock = sock
+        self.limit = limit
+        self.stall_timeout = stall_timeout
+        self.queue = collections.deque()  # 아직 보내기 시작하지 않은 메시지
+        self.pending = b''  # 보내다 만 바이트 (스트림이 깨지지 않도록 버리지 않음)
+        self.pending_messages = 0
+        self.stalled_since = None  # 송신 버퍼가 가득 차기 시작한 시각
+        self.dropped = 0
+        self.lock = threading.Lock()  # queue 보호
+        self.send_lock = threading.Lock()  # flush 가 겹쳐 바이트 순서가 섞이지 않도록
+
+    def put(self, data):
+        """:return: 큐가 넘쳐 버린 메시지 수"""
+        with self.lock:
+            self.queue.append(data)
+            if len(self.queue) <= self.limit:
+                return 0
+            self.queue.popleft()
+            self.dropped += 1
+            return 1
+
+    def depth(self):
+        return len(self.queue) + self.pending_messages
+
+    def _send(self, data):
+        """블로킹 없이 보낼 수 있는 만큼만 전송. :return: 보낸 바이트 수"""
+        try:
+            if MSG_DONTWAIT:
+                return self.sock.send(data, MSG_DONTWAIT)
+            if not select.select([], [self.sock], [], 0)[1]:
+                return 0
+            return self.sock.send(data)
+        except (BlockingIOError, InterruptedError):
+            return 0
+
+    def flush(self):
+        """
+        :return: 이번에 전송을 마친 메시지 수 (보낼 것이 없거나 송신 버퍼가 가득 차면 0).
+                 연결 오류 시 OSError
+        """
+        with self.send_lock:
+            if not self.pending:
+                with self.lock:
+                    if not self.queue:
+                        return 0
+                    chunks = list(self.queue)
+                    self.queue.clear()
+                self.pending = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+                self.pending_messages = len(chunks)
+            sent = self._send(self.pending)
+            self.pending = self.pending[sent:]
+            if self.pending:
+                if self.stalled_since is None:
+                    self.stalled_since = time.monotonic()
+                return 0
+            self.stalled_since = None
+            done, self.pending_messages = self.pending_messages, 0
+            return done
+
+    def should_evict(self):
+        """stall_timeout 넘게 송신 버퍼가 비워지지 않는 느린 클라이언트인지"""
+        return self.stalled_since is not None and time.monotonic() - self.stalled_since > self.stall_timeout
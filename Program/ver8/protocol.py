@@ -0,0 +1,106 @@
+import hmac
+import io
+import pickle
+import struct
+
+# 서버 간 영속 연결(리더보드 등)에서 사용하는 길이 접두 프레임: 4바이트 길이 + pickle 본문
+HEADER = struct.Struct("!I")
+MAX_FRAME = 1 << 20  # 1MB 초과 프레임은 손상/악성으로 간주
+
+# 게임 연결의 응용 계층 keepalive. 한동안 보낼 것이 없을 때 양방향으로 보내 연결이 살아 있음을 알림 (상태에는 반영하지 않음)
+KEEPALIVE = pickle.dumps({"keepalive": True})
+
+
+def is_keepalive(message):
+    return isinstance(message, dict) and "keepalive" in message
+
+
+def control_authorized(request, addr, secret=None):
+    """
+    플레이어 상태를 내주는 제어 요청(b'CHECKPOINT' 또는 b'CHECKPOINT <비밀값>') 확인.
+    secret 을 설정했으면 요청의 비밀값이 같아야 하고, 설정하지 않았으면 같은 호스트(루프백)에서 온 요청만 허용.
+    """
+    if secret is None:
+        return addr[0] in ('127.0.0.1', '::1')
+    _, _, supplied = request.partition(b' ')
+    return hmac.compare_digest(supplied.strip(), secret.encode())
+
+
+def send_frame(sock, message):
+    """메시지 하나를 길이 접두 프레임으로 전송"""
+    body = pickle.dumps(message)
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def recv_exact(sock, size):
+    """정확히 size 바이트 수신. 상대가 연결을 닫으면 EOFError"""
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    """프레임 하나를 받아 메시지로 복원"""
+    (length,) = HEADER.unpack(recv_exact(sock, HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"frame too large: {length}")
+    return pickle.loads(recv_exact(sock, length))
+
+
+PICKLE_FRAME = struct.Struct("<BBBQ")  # pickle 프로토콜 4 이상의 시작: PROTO, 버전, FRAME, 첫 프레임 길이
+
+
+class MessageStream:
+    """
+    프레임 없는 게임 연결(서버 -> 클라이언트 상태)의 수신 버퍼. 연결마다 하나씩 두고 recv 한 bytes 를 feed() 에 넘김.
+    recv 경계에서 잘린 마지막 pickle 은 버리지 않고 보관했다가 다음 feed() 에서 이어 붙여 복원 (codec.Decoder 와 같은 방식).
+    큰 상태가 여러 recv 에 걸쳐 와도 첫 pickle 프레임이 다 올 때까지는 다시 풀어 보지 않으므로 매번 처음부터 풀지 않음.
+    :param limit: 보관할 수 있는 미완성 메시지 크기. 넘으면 손상된 스트림으로 보고 ValueError
+    """
+
+    def __init__(self, limit=MAX_FRAME):
+        self.limit = limit
+        self.pending = b""
+
+    def feed(self, data):
+        """:return: 이번까지 받은 bytes 로 완성된 메시지 목록 (순서대로)"""
+        data = self.pending + data if self.pending else data
+        messages = []
+        stream = io.BytesIO(data)
+        consumed = 0
+        while consumed < len(data):
+            if len(data) - consumed >= PICKLE_FRAME.size:
+                proto, version, opcode, length = PICKLE_FRAME.unpack_from(data, consumed)
+                if proto == pickle.PROTO[0] and version >= 4 and opcode == pickle.FRAME[0] \
+                        and len(data) - consumed < PICKLE_FRAME.size + length:
+                    break  # 첫 프레임이 아직 다 오지 않음
+            try:
+                messages.append(pickle.load(stream))
+            except (EOFError, pickle.UnpicklingError):
+                break  # 잘린 메시지: 나머지를 기다림
+            consumed = stream.tell()
+        self.pending = data[consumed:]
+        if len(self.pending) > self.limit:
+            raise ValueError(f"incomplete message larger than {self.limit} bytes")
+        return messages
+
+
+def loads_all(data):
+    """
+    bytes 안의 pickle 메시지를 모두 복원 (송신 측 묶음 전송이나 TCP 병합으로 여러 메시지가 한 번에 도착할 수 있음).
+    마지막 메시지가 잘려 있으면 그 앞까지만 반환하고 잘린 부분은 버리므로,
+    연결에서 계속 받는 데이터는 MessageStream 으로 복원해야 함 (이미 모아 둔 bytes 를 확인할 때만 사용).
+    """
+    stream = io.BytesIO(data)
+    messages = []
+    while stream.tell() < len(data):
+        try:
+            messages.append(pickle.load(stream))
+        except (EOFError, pickle.UnpicklingError):
+            break
+    return messages
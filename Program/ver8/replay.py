@@ -0,0 +1,348 @@
+import hashlib
+import socket
+import struct
+import threading
+import time
+
+import jsonlog
+from codec import DecodeError, decode, encode, restored
+
+log = jsonlog.get_logger("replay")
+
+# 로그 = 구간들의 연속. 구간 = 헤더(서버 시작마다 하나) + 기록들 (파일에 덧붙이기만 함)
+LOG_HEADER = struct.Struct("<6sBHHd")  # 매직, 버전, 월드 가로, 세로, 기록 시작 시각(time.time)
+LOG_MAGIC = b"SNKREC"
+LOG_VERSION = 1
+RECORD = struct.Struct("<BIH")  # 종류, 값, 본문 길이
+START = 0  # 구간 시작 (읽을 때만 나옴. 값 = (가로, 세로), 본문 = 기록 시작 시각)
+JOIN = 1  # 값 = 플레이어 번호, 본문 = codec 복원 메시지 (참가 직후의 뱀과 점수)
+INPUT = 2  # 값 = 플레이어 번호, 본문 = codec 입력 메시지 (서버가 적용한 입력)
+LEAVE = 3  # 값 = 플레이어 번호, 본문 없음
+TICK = 4  # 값 = 직전 TICK 이후 지난 시간 (마이크로초), 본문 없음. 그 앞의 기록들이 한 번의 run_tick
+MAX_DELAY_US = 0xFFFFFFFF
+
+
+class SessionRecorder:
+    """
+    룸 하나의 입력 기록기. 시뮬레이션 쓰레드가 적용한 참가/입력/퇴장을 틱 단위로 바이너리 로그에 덧붙임.
+    기록 호출은 메모리 버퍼에 붙이기만 하고, 전용 쓰레드가 flush_interval 마다 파일에 씀 (ScoreStore 와 같은 write-behind).
+    참가는 서버가 정한 (또는 복원한) 뱀과 점수로 기록하므로 재생 결과가 무작위 시작 위치에 좌우되지 않음.
+    """
+
+    def __init__(self, path, world, flush_interval=1.0, max_pending=1 << 20):
+        """
+        :param world: (가로, 세로) 월드 크기
+        :param max_pending: 버퍼가 이 바이트 수를 넘으면 주기를 기다리지 않고 기록
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.players = {}  # 연결 -> 플레이어 번호
+        self.next_player = 1
+        self.last_tick = time.monotonic()
+        self.dirty = False  # 마지막 TICK 이후 기록한 것이 있는지 (빈 틱은 기록하지 않음)
+        self.pending = bytearray(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, world[0], world[1], time.time()))
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.file = open(path, 'ab')
+        self.thread = threading.Thread(target=self.run, name="replay-writer", daemon=True)
+        self.thread.start()
+        log.info("recording_started", path=path, world=list(world))
+
+    def append(self, kind, value, body=b''):
+        with self.lock:
+            self.pending += RECORD.pack(kind, value, len(body))
+            self.pending += body
+            full = len(self.pending) >= self.max_pending
+        if full:
+            self.wakeup.set()
+        self.dirty = kind != TICK
+
+    def join(self, conn, snake, score):
+        """참가 직후 상태 기록 (시뮬레이션 쓰레드)"""
+        player = self.players[conn] = self.next_player
+        self.next_player += 1
+        try:
+            body = encode({"restore": {"snake": snake, "score": score}})
+        except ValueError as e:
+            log.warning("record_join_not_encodable", player=player, error=str(e))
+            body = encode({"restore": {}})
+        self.append(JOIN, player, body)
+
+    def input(self, conn, message):
+        """적용한 입력 하나 기록 (디코더가 확인한 메시지이므로 다시 인코딩해도 실패하지 않음)"""
+        player = self.players.get(conn)
+        if player is not None:
+            self.append(INPUT, player, encode(message))
+
+    def leave(self, conn):
+        player = self.players.pop(conn, None)
+        if player is not None:
+            self.append(LEAVE, player)
+
+    def tick(self):
+        """run_tick 한 번의 끝. 앞서 기록한 참가/입력/퇴장을 한 묶음으로 구분"""
+        if not self.dirty:
+            return
+        now = time.monotonic()
+        delay = min(MAX_DELAY_US, int((now - self.last_tick) * 1e6))
+        self.last_tick = now
+        self.append(TICK, delay)
+
+    def run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            data, self.pending = self.pending, bytearray()
+        if data and not self.file.closed:
+            try:
+                self.file.write(data)
+                self.file.flush()
+            except (OSError, ValueError) as e:
+                log.error("recording_write_failed", path=self.path, error=str(e), lost=len(data))
+
+    def close(self):
+        """남은 기록을 쓰고 파일을 닫음"""
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join(timeout=5)
+        self.flush()
+        self.file.close()
+
+
+def read_log(path):
+    """
+    기록 로그를 순서대로 읽음. 쓰던 도중 끝난 마지막 기록은 건너뜀 (서버가 비정상 종료된 경우).
+    :return: (종류, 값, 본문) 생성기. 본문은 JOIN 이면 복원 상태 dict, INPUT 이면 codec 입력 튜플, START 이면 기록 시작 시각
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset, world = 0, None
+    while offset < len(data):
+        if data.startswith(LOG_MAGIC, offset):
+            if len(data) - offset < LOG_HEADER.size:
+                break
+            _, version, width, height, started = LOG_HEADER.unpack_from(data, offset)
+            if version != LOG_VERSION:
+                raise ValueError(f"{path}: unsupported log version {version} at offset {offset}")
+            offset += LOG_HEADER.size
+            world = (width, height)
+            yield START, world, started
+            continue
+        if world is None:
+            raise ValueError(f"{path}: not a recording")
+        if len(data) - offset < RECORD.size:
+            break
+        kind, value, length = RECORD.unpack_from(data, offset)
+        end = offset + RECORD.size + length
+        if end > len(data):
+            break
+        body = None
+        if kind in (JOIN, INPUT):
+            try:
+                messages, used = decode(data[offset + RECORD.size:end], world)
+            except DecodeError as e:
+                raise ValueError(f"{path}: corrupt record at offset {offset}: {e}") from None
+            if len(messages) != 1 or used != length:
+                raise ValueError(f"{path}: corrupt record at offset {offset}")
+            body = restored(messages[0]) if kind == JOIN else messages[0]
+        elif kind not in (LEAVE, TICK):
+            raise ValueError(f"{path}: unknown record type {kind} at offset {offset}")
+        offset = end
+        yield kind, value, body
+    if offset < len(data):
+        log.warning("recording_truncated", path=path, offset=offset, dropped=len(data) - offset)
+
+
+class Pacer:
+    """
+    TICK 기록의 시간 간격대로 기다림.
+    :param speed: 1 이면 기록된 속도, 2 면 두 배 빠르게. 0 이면 기다리지 않음 (최대 속도)
+    """
+
+    def __init__(self, speed):
+        self.speed = speed
+        self.due = time.perf_counter()
+
+    def wait(self, delay_us):
+        if not self.speed:
+            return
+        self.due += delay_us / 1e6 / self.speed
+        remaining = self.due - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class NullConnection:
+    """시뮬레이션 재생용 가짜 클라이언트 연결. 방송을 받아 버리기만 하므로 송신 큐가 쌓이지 않음"""
+
+    def __init__(self, player):
+        self.player = player
+        self.bytes_received = 0
+
+    def fileno(self):
+        return self.player  # 방송 상태의 키가 기록마다 같도록 플레이어 번호 사용
+
+    def send(self, data, flags=0):
+        self.bytes_received += len(data)
+        return len(data)
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+
+def percentiles(samples):
+    """초 단위 샘플의 p50 / p99 / 최대 (밀리초)"""
+    if not samples:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+    return {"p50_ms": round(ordered[len(ordered) // 2] * 1e3, 3),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e3, 3),
+            "max_ms": round(ordered[-1] * 1e3, 3)}
+
+
+def replay_simulation(path, speed=0.0, tick_seconds=None):
+    """
+    기록을 GameServer 시뮬레이션(run_tick: update_game_state + broadcast_game_state)에 직접 넣어 재생.
+    네트워크 없이 기록된 틱 묶음 그대로 실행하므로 같은 로그는 항상 같은 상태를 만듦 (state_digest 로 확인).
+    :param tick_seconds: 목록을 주면 틱마다의 run_tick 소요 시간(초)을 덧붙임 (벤치마크용)
+    :return: 틱 수, 입력 수, 틱 소요 시간 분포, 최종 상태 요약 등 결과 dict
+    """
+    from server import GameServer  # server 가 이 모듈을 import 하므로 재생할 때만 가져옴
+
+    digest = hashlib.blake2b(digest_size=16)
+    tick_seconds = [] if tick_seconds is None else tick_seconds
+    counts = {"segments": 0, "joins": 0, "inputs": 0, "leaves": 0}
+    server, connections, events = None, {}, []
+    pacer = Pacer(speed)
+    start = time.perf_counter()
+    for kind, value, body in read_log(path):
+        if kind == START:
+            counts["segments"] += 1
+            server = GameServer(port=None, room=f"replay-{counts['segments']}",
+                                idle_timeout=0, keepalive_interval=0, world_size=value)
+            connections, events = {}, []
+        elif kind == JOIN:
+            conn = connections[value] = NullConnection(value)
+            events.append(("join", conn, ("replay", value), b'', body))
+            counts["joins"] += 1
+        elif kind == INPUT:
+            if value in connections:
+                events.append(("input", connections[value], [body]))
+                counts["inputs"] += 1
+        elif kind == LEAVE:
+            conn = connections.pop(value, None)
+            if conn is not None:
+                events.append(("leave", conn, None))
+                counts["leaves"] += 1
+        elif kind == TICK:
+            pacer.wait(value)
+            tick_start = time.perf_counter()
+            server.run_tick(events)
+            tick_seconds.append(time.perf_counter() - tick_start)
+            events = []
+            state = sorted((conn.fileno(), client["snake"], client["score"]) for conn, client in server.clients.items())
+            digest.update(repr((state, sorted(server.top_scores.items(), key=repr))).encode())
+    elapsed = time.perf_counter() - start
+    return dict(counts, ticks=len(tick_seconds), seconds=round(elapsed, 3),
+                ticks_per_second=round(len(tick_seconds) / elapsed, 1) if elapsed else 0.0,
+                tick=percentiles(tick_seconds), state_digest=digest.hexdigest())
+
+
+def replay_server(path, address, speed=1.0):
+    """
+    기록된 플레이어마다 실제 TCP 연결을 열어 서버(또는 밸런서)에 같은 입력을 다시 보냄.
+    참가 시 첫 패킷으로 기록된 뱀과 점수를 복원 메시지로 보내므로 시작 상태가 같음.
+    대상 서버의 월드 크기는 기록과 같아야 함 (다르면 월드 밖 좌표로 보고 연결을 끊음).
+    서버의 틱 묶음은 네트워크 타이밍에 따라 달라지므로 결과 상태까지 같다고 보장하지는 않음.
+    :return: 보낸 입력 수, 받은 바이트 수 등 결과 dict
+    """
+    connections = {}
+    received = [0]
+    counts = {"segments": 0, "joins": 0, "inputs": 0, "leaves": 0, "send_errors": 0}
+
+    def receive(sock):
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    return
+                received[0] += len(data)
+        except OSError:
+            pass
+
+    def close_all():
+        for sock in connections.values():
+            sock.close()
+        connections.clear()
+
+    pacer = Pacer(speed)
+    start = time.perf_counter()
+    try:
+        for kind, value, body in read_log(path):
+            if kind == START:
+                counts["segments"] += 1
+                close_all()  # 기록한 서버가 다시 시작된 구간이면 이전 플레이어는 모두 나간 것
+            elif kind == JOIN:
+                sock = socket.create_connection(address)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.sendall(encode({"restore": body}))  # 서버가 소비하는 첫 패킷
+                threading.Thread(target=receive, args=(sock,), daemon=True).start()
+                connections[value] = sock
+                counts["joins"] += 1
+            elif kind == INPUT:
+                sock = connections.get(value)
+                if sock is None:
+                    continue
+                try:
+                    sock.sendall(encode(body))
+                    counts["inputs"] += 1
+                except OSError:
+                    counts["send_errors"] += 1
+                    connections.pop(value).close()
+            elif kind == LEAVE:
+                sock = connections.pop(value, None)
+                if sock is not None:
+                    sock.close()
+                    counts["leaves"] += 1
+            elif kind == TICK:
+                pacer.wait(value)
+    finally:
+        close_all()
+    elapsed = time.perf_counter() - start
+    return dict(counts, seconds=round(elapsed, 3), bytes_received=received[0])
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Replay a recorded game session")
+    parser.add_argument('log', help='Recording written by server.py --record / room_server.py --record-dir')
+    parser.add_argument('--speed', type=float, default=0.0, help='1 = recorded pace, 2 = twice as fast, 0 = as fast as possible')
+    parser.add_argument('--server', default=None, metavar='HOST:PORT',
+                        help='Re-drive a running server over TCP instead of the in-process simulation')
+    parser.add_argument('--summary', action='store_true', help='Only print record counts, do not replay')
+    args = parser.parse_args()
+    jsonlog.set_level("warning")  # 재생 중 참가/퇴장 로그가 결과 출력을 덮지 않도록
+
+    if args.summary:
+        totals = {}
+        for kind, _, _ in read_log(args.log):
+            name = {START: "segments", JOIN: "joins", INPUT: "inputs", LEAVE: "leaves", TICK: "ticks"}[kind]
+            totals[name] = totals.get(name, 0) + 1
+        result = totals
+    elif args.server:
+        host, port = args.server.rsplit(':', 1)
+        result = replay_server(args.log, (host, int(port)), args.speed)
+    else:
+        result = replay_simulation(args.log, args.speed)
+    print(json.dumps(result, indent=2))
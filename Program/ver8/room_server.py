@@ -0,0 +1,300 @@
+import multiprocessing
+import os
+import pickle
+import signal
+import socket
+import threading
+import time
+
+import jsonlog
+from codec import MSG_ROOM, DecodeError, decode
+from executor import BoundedExecutor
+from metrics import Registry, start_metrics_server
+from protocol import control_authorized, recv_frame, send_frame
+from score_store import ScoreStore
+from server import GameServer
+from world import DEFAULT_SIZE as DEFAULT_WORLD_SIZE, parse_size
+
+log = jsonlog.get_logger("room_server")
+
+
+def room_worker(channel, room_ids, score_db=None, world_size=DEFAULT_WORLD_SIZE, record_dir=None, front=None):
+    """
+    워커 프로세스 본체. 담당 룸마다 별도의 GameServer 상태를 가지고,
+    프론트 프로세스가 넘겨준 클라이언트 소켓을 해당 룸에서 처리.
+    :param channel: 프론트 프로세스와 연결된 유닉스 데이터그램 소켓 (fd 수신 / 인원 보고)
+    :param room_ids: 이 워커가 담당하는 룸 번호 목록
+    :param score_db: 점수 저장용 SQLite 파일 (워커들이 같은 파일을 공유)
+    :param world_size: 룸마다의 월드 크기 (가로, 세로)
+    :param record_dir: 지정하면 룸마다 이 디렉터리의 room-<번호>.snlog 에 입력을 기록 (replay.py 로 재생)
+    :param front: 프론트 프로세스의 수신 주소 (IP, 포트). 세션 토큰이 '<IP>:<포트>/room-<번호>/...' 가 되어
+                  밸런서는 재접속을 프론트로 보내고 프론트는 토큰의 룸으로 배정
+    """
+    store = ScoreStore(score_db) if score_db else None
+    rooms = {room_id: GameServer(port=None, score_store=store, room=f"room-{room_id}", world_size=world_size,
+                                 record=os.path.join(record_dir, f"room-{room_id}.snlog") if record_dir else None,
+                                 public_name=f"{front[0]}:{front[1]}/room-{room_id}" if front else None)
+             for room_id in room_ids}
+    log.info("worker_started", pid=os.getpid(), rooms=list(room_ids))
+
+    def serve(room_id, conn, addr):
+        room = rooms[room_id]
+        try:
+            room.handle_client(conn, addr)
+        finally:
+            # 퇴장 후 인원을 프론트에 보고 (룸 선택에 사용)
+            channel.send(pickle.dumps({"room": room_id, "clients": len(room.clients)}))
+
+    def answer(room_id, conn, op):
+        """프론트가 모든 룸에 보낸 요청에 이 룸의 상태로 응답 (checkpoint: 플레이어 상태, drain: 드레인 후 남은 인원)"""
+        with conn:
+            if op == "checkpoint":
+                send_frame(conn, rooms[room_id].checkpoint())
+            elif op == "drain":
+                rooms[room_id].drain()
+                send_frame(conn, {"draining": True, "clients": len(rooms[room_id].clients)})
+
+    def reject(room_id, conn):
+        conn.close()  # 룸의 처리 쓰레드와 대기열이 모두 찬 경우
+        channel.send(pickle.dumps({"room": room_id, "clients": len(rooms[room_id].clients)}))
+
+    while True:
+        message, fds, _, _ = socket.recv_fds(channel, 1024, 1)
+        if not message:
+            break  # 프론트 프로세스 종료
+        handoff = pickle.loads(message)
+        conn = socket.socket(fileno=fds[0])
+        room_id = handoff["room"]
+        if "op" in handoff:  # 클라이언트가 아닌 프론트의 요청 (응답용 소켓)
+            if not rooms[room_id].handlers.submit(answer, room_id, conn, handoff["op"]):
+                conn.close()
+            continue
+        if not rooms[room_id].handlers.submit(serve, room_id, conn, handoff["addr"]):
+            rooms[room_id].handlers_rejected_total.inc()
+            reject(room_id, conn)
+    for room in rooms.values():
+        if room.recorder is not None:
+            room.recorder.close()  # 버퍼에 남은 기록 저장
+
+
+class RoomShardedServer:
+    """
+    룸 단위로 워커 프로세스를 나누어 실행하는 게임 서버.
+    프론트 프로세스는 연결 수락과 룸 배정만 하고, 소켓 fd 를 유닉스 소켓으로 담당 워커에 넘김.
+    한 룸이 바빠도 다른 프로세스의 룸은 GIL 을 공유하지 않으므로 영향을 받지 않음.
+    첫 패킷을 기다리는 배정 작업은 최대 max_handoffs 개 쓰레드에서 하고 handoff_queue 개까지 대기,
+    그 이상 몰리는 연결은 바로 닫음 (첫 패킷을 보내지 않는 연결이 쓰레드를 무한히 늘리지 않도록).
+    CHECKPOINT 는 한 룸이 아니라 모든 룸에 물어 합친 결과로 응답 (checkpoint_secret 은 GameServer 와 같은 규칙).
+    DRAIN 도 모든 룸에 보내고, 드레인 중인 룸이 하나라도 있으면 PING 에 DRAINING 으로 답해 밸런서가 새 클라이언트를 보내지 않음.
+    """
+
+    def __init__(self, host='localhost', port=5555, rooms=4, workers=None, metrics_port=None, score_db=None,
+                 world_size=DEFAULT_WORLD_SIZE, record_dir=None, max_handoffs=64, handoff_queue=256,
+                 checkpoint_secret=None):
+        if not hasattr(socket, "send_fds"):
+            raise RuntimeError("Room sharding needs Unix fd passing (socket.send_fds)")
+        self.host = host
+        self.port = port
+        self.room_ids = list(range(rooms))
+        self.worker_count = max(1, min(workers or os.cpu_count() or 1, rooms))
+        self.room_owner = {room_id: room_id % self.worker_count for room_id in self.room_ids}  # 룸 -> 워커 번호
+        self.room_clients = {room_id: 0 for room_id in self.room_ids}  # 룸별 인원 (워커 보고 기준)
+        self.room_draining = {room_id: False for room_id in self.room_ids}  # 드레인 요청을 받은 룸
+        self.lock = threading.Lock()
+        self.handoffs = BoundedExecutor("handoff", max_handoffs, handoff_queue, "reject")
+        self.channels = []
+        self.processes = []
+        self.metrics = Registry()
+        self.handoffs_total = self.metrics.counter("snake_rooms_handoffs_total", "Connections handed to room workers", ["room"])
+        self.handoffs_rejected_total = self.metrics.counter("snake_rooms_handoffs_rejected_total",
+                                                            "Connections closed because the handoff pool and its queue were full")
+        self.metrics.gauge("snake_rooms_handoffs_active", "Handoff tasks waiting for a first packet or passing a socket",
+                           callback=lambda: self.handoffs.active)
+        self.metrics.gauge("snake_rooms_clients", "Clients per room", ["room"],
+                           callback=lambda: {(str(room_id),): count for room_id, count in self.room_clients.items()})
+        self.metrics_port = metrics_port
+        self.score_db = score_db
+        self.world_size = world_size
+        self.record_dir = record_dir
+        self.checkpoint_secret = checkpoint_secret
+
+    def start_workers(self):
+        """워커 프로세스 실행 및 인원 보고 수신 쓰레드 시작"""
+        for index in range(self.worker_count):
+            front, worker = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+            owned = [room_id for room_id, owner in self.room_owner.items() if owner == index]
+            process = multiprocessing.Process(target=room_worker, daemon=True,
+                                              args=(worker, owned, self.score_db, self.world_size, self.record_dir,
+                                                    (self.host, self.port)))
+            process.start()
+            worker.close()
+            self.channels.append(front)
+            self.processes.append(process)
+            threading.Thread(target=self.receive_reports, args=(front,), daemon=True).start()
+
+    def receive_reports(self, channel):
+        """워커가 보내는 룸 인원 보고 반영"""
+        while True:
+            try:
+                report = pickle.loads(channel.recv(1024))
+            except (OSError, EOFError):
+                return
+            with self.lock:
+                self.room_clients[report["room"]] = report["clients"]
+
+    def ask_rooms(self, op, timeout=2):
+        """
+        모든 룸에 op 요청을 보내고 응답을 모음. 룸마다 응답용 소켓쌍의 한쪽을 담당 워커에 넘기고 나머지로 받음.
+        :return: {룸 번호: 응답} (제때 응답하지 않은 룸은 빠짐)
+        """
+        pending = []
+        for room_id in self.room_ids:
+            front, worker = socket.socketpair()
+            try:
+                socket.send_fds(self.channels[self.room_owner[room_id]], [pickle.dumps({"room": room_id, "op": op})],
+                                [worker.fileno()])
+                pending.append((room_id, front))
+            except OSError as e:
+                log.warning("room_request_failed", room=room_id, op=op, error=str(e))
+                front.close()
+            finally:
+                worker.close()
+        replies = {}
+        deadline = time.monotonic() + timeout
+        for room_id, front in pending:
+            with front:
+                try:
+                    front.settimeout(max(0.01, deadline - time.monotonic()))
+                    replies[room_id] = recv_frame(front)
+                except (OSError, EOFError, ValueError) as e:
+                    log.warning("room_request_failed", room=room_id, op=op, error=str(e))
+        return replies
+
+    def checkpoint(self):
+        """모든 룸의 플레이어 상태를 합친 체크포인트 {클라이언트 주소: 상태} (주소는 룸끼리 겹치지 않음)"""
+        merged = {}
+        for states in self.ask_rooms("checkpoint").values():
+            merged.update(states)
+        return merged
+
+    def drain(self):
+        """
+        모든 룸 드레인 (새 참가 거절, 남은 클라이언트가 나가면 완료).
+        :return: 드레인 중인 룸의 남은 클라이언트 수 합계
+        """
+        replies = self.ask_rooms("drain")
+        with self.lock:
+            for room_id, reply in replies.items():
+                self.room_draining[room_id] = reply["draining"]
+        log.warning("drain_started", rooms=sorted(replies), clients=sum(reply["clients"] for reply in replies.values()))
+        return sum(reply["clients"] for reply in replies.values())
+
+    def choose_room(self, first_packet):
+        """
+        클라이언트의 첫 패킷이 룸 선택 메시지(codec MSG_ROOM, 룸 수보다 크면 나머지)거나
+        재접속 토큰(b'RESUME <IP>:<포트>/room-N/...')이면 그 룸, 없으면 인원이 가장 적은 룸 선택.
+        """
+        requested = None
+        if first_packet.startswith(b'RESUME '):
+            parts = first_packet[7:].split(b'\n', 1)[0].split(b'/')
+            if len(parts) == 3 and parts[1].startswith(b'room-'):
+                try:
+                    requested = int(parts[1][5:])
+                except ValueError:
+                    pass
+        else:
+            try:
+                messages = decode(first_packet)[0]
+            except DecodeError:
+                messages = []  # 워커의 게임 서버가 같은 패킷을 받아 연결을 끊음
+            requested = messages[0][1] if messages and messages[0][0] == MSG_ROOM else None
+            if requested is not None:
+                requested %= len(self.room_ids)  # 밸런서 매치메이킹 방 번호는 한 샤드에 모아 같은 월드에서 플레이
+        with self.lock:
+            room_id = requested if requested in self.room_clients else min(self.room_clients, key=self.room_clients.get)
+            self.room_clients[room_id] += 1  # 워커 보고 전까지 미리 반영
+        return room_id
+
+    def hand_off(self, conn, addr):
+        """첫 패킷을 소비하지 않고 확인(MSG_PEEK)한 뒤 담당 워커로 소켓을 넘김"""
+        try:
+            conn.settimeout(10)
+            first_packet = conn.recv(1024, socket.MSG_PEEK)
+            if first_packet == b'PING':  # 로드 밸런서 하트비트는 프론트에서 응답
+                conn.recv(1024)
+                conn.sendall(b'DRAINING' if any(self.room_draining.values()) else b'PONG')
+                return
+            if first_packet == b'DRAIN':  # 로컬 드레인 명령은 모든 룸에 전달
+                conn.recv(1024)
+                if addr[0] in ('127.0.0.1', '::1'):
+                    conn.sendall(f"DRAINING {self.drain()}".encode())
+                return
+            if first_packet.split(b' ', 1)[0] == b'CHECKPOINT':  # 한 룸이 아니라 모든 룸의 상태를 합쳐 응답
+                conn.recv(1024)
+                if control_authorized(first_packet, addr, self.checkpoint_secret):
+                    send_frame(conn, self.checkpoint())
+                else:
+                    log.warning("checkpoint_refused", addr=addr)
+                return
+            if not first_packet:
+                return
+            room_id = self.choose_room(first_packet)
+            conn.settimeout(None)  # 워커가 블로킹 소켓으로 사용하도록 복구
+            channel = self.channels[self.room_owner[room_id]]
+            socket.send_fds(channel, [pickle.dumps({"room": room_id, "addr": addr})], [conn.fileno()])
+            self.handoffs_total.inc(room=str(room_id))
+            log.info("client_handed_off", addr=addr, room=room_id, worker=self.room_owner[room_id])
+        except OSError as e:
+            log.warning("handoff_failed", addr=addr, error=str(e))
+        finally:
+            conn.close()  # 워커가 fd 사본을 가지므로 프론트 쪽은 닫음
+
+    def start(self):
+        """
+        수신 소켓을 바인드한 뒤 워커 실행 (port=0 이면 바인드한 포트가 세션 토큰에 들어감), 그리고 연결 수락 루프.
+        listen 은 fork 뒤에 해야 fork 도중 열린 연결 소켓이 워커에 복제되어 닫혀도 EOF 가 가지 않는 일이 없음.
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        self.port = listener.getsockname()[1]
+        self.start_workers()
+        listener.listen()
+        log.info("room_server_started", host=self.host, port=self.port,
+                 rooms=len(self.room_ids), workers=self.worker_count)
+        if self.metrics_port is not None:
+            start_metrics_server(self.metrics, self.host, self.metrics_port)
+        while True:
+            conn, addr = listener.accept()
+            if not self.handoffs.submit(self.hand_off, conn, addr):
+                self.handoffs_rejected_total.inc()
+                conn.close()  # 배정 쓰레드와 대기열이 모두 찬 경우
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Room-sharded Game Server")
+    parser.add_argument('--port', type=int, default=5555, help='Port to run the server on')
+    parser.add_argument('--rooms', type=int, default=4, help='Number of rooms')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core, at most one per room)')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Expose Prometheus metrics on this port')
+    parser.add_argument('--score-db', default=None, help='SQLite file for persistent scores')
+    parser.add_argument('--world', default=None, metavar='WxH', help='World size per room in cells, e.g. 64x64 (default 20x20)')
+    parser.add_argument('--max-handoffs', type=int, default=64, help='Threads waiting for first packets before handing off')
+    parser.add_argument('--handoff-queue', type=int, default=256, help='Accepted connections waiting for a handoff thread')
+    parser.add_argument('--record-dir', default=None, help='Record each room to room-<id>.snlog in this directory for replay.py')
+    parser.add_argument('--checkpoint-secret', default=os.environ.get('SNAKE_CHECKPOINT_SECRET'),
+                        help='Shared secret the balancer must send with CHECKPOINT (default: $SNAKE_CHECKPOINT_SECRET, '
+                             'unset = local requests only)')
+    parser.add_argument('--log-level', default='info', choices=list(jsonlog.LEVELS), help='Minimum log level')
+    args = parser.parse_args()
+    jsonlog.set_level(args.log_level)
+
+    server = RoomShardedServer(port=args.port, rooms=args.rooms, workers=args.workers, metrics_port=args.metrics_port,
+                              score_db=args.score_db, world_size=parse_size(args.world) if args.world else DEFAULT_WORLD_SIZE,
+                              record_dir=args.record_dir, max_handoffs=args.max_handoffs, handoff_queue=args.handoff_queue,
+                              checkpoint_secret=args.checkpoint_secret)
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, lambda *_: threading.Thread(target=server.drain, daemon=True).start())
+    server.start()
@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+import time
+
+import jsonlog
+
+log = jsonlog.get_logger("score_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_scores (
+    room TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (room, player)
+);
+CREATE TABLE IF NOT EXISTS top_scores (
+    room TEXT PRIMARY KEY,
+    score INTEGER NOT NULL,
+    player TEXT NOT NULL
+);
+"""
+
+
+class ScoreStore:
+    """
+    SQLite 점수 저장소 (write-behind).
+    record() 는 메모리에 최신 점수만 모아 두고, 전용 쓰레드가 주기적으로 한 트랜잭션에 묶어 기록.
+    룸별 최고 점수는 top_scores 테이블에 함께 유지하므로 시작 시 전체 기록을 훑지 않고 바로 읽음.
+    플레이어는 게임 서버의 플레이어 이름(재접속해도 유지)으로 기록하므로 같은 플레이어가 접속할 때마다 행이 늘지 않음.
+    """
+
+    def __init__(self, path, flush_interval=1.0, max_pending=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = {}  # (룸, 플레이어) -> 아직 기록하지 않은 최고 점수
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.db = sqlite3.connect(path, check_same_thread=False)  # 시작 후에는 기록 쓰레드만 사용
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA busy_timeout=5000")  # 룸 워커 프로세스들이 같은 파일을 공유할 때 대기
+        self.db.executescript(SCHEMA)
+        self.top_scores = self.load_top_scores()
+        self.thread = threading.Thread(target=self.run, name="score-writer", daemon=True)
+        self.thread.start()
+
+    def load_top_scores(self):
+        """룸별 최고 점수 스냅샷 로드 {룸: 점수}"""
+        rows = self.db.execute("SELECT room, score FROM top_scores").fetchall()
+        log.info("top_scores_loaded", path=self.path, rooms=len(rows))
+        return dict(rows)
+
+    def top_score(self, room):
+        return self.top_scores.get(room, 0)
+
+    def record(self, room, player, score):
+        """
+        점수 기록 요청 (게임 쓰레드에서 호출, 디스크 I/O 없음).
+        :param player: 연결 주소가 아닌 세션 동안 유지되는 플레이어 이름 (GameServer 의 client["player"])
+        """
+        key = (room, player)
+        with self.lock:
+            if score > self.pending.get(key, -1):
+                self.pending[key] = score
+            if score > self.top_scores.get(room, 0):
+                self.top_scores[room] = score
+            full = len(self.pending) >= self.max_pending
+        if full:
+            self.wakeup.set()  # 쌓인 양이 많으면 주기를 기다리지 않고 기록
+
+    def run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """쌓인 점수를 한 트랜잭션으로 기록"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        now = time.time()
+        rows = [(room, player, score, now) for (room, player), score in batch.items()]
+        best = {}
+        for room, player, score, _ in rows:
+            if score > best.get(room, (-1, None))[0]:
+                best[room] = (score, player)
+        start = time.perf_counter()
+        try:
+            with self.db:
+                self.db.executemany(
+                    "INSERT INTO player_scores (room, player, score, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(room, player) DO UPDATE SET score = MAX(score, excluded.score), updated = excluded.updated",
+                    rows)
+                self.db.executemany(
+                    "INSERT INTO top_scores (room, score, player) VALUES (?, ?, ?) "
+                    "ON CONFLICT(room) DO UPDATE SET score = excluded.score, player = excluded.player "
+                    "WHERE excluded.score > top_scores.score",
+                    [(room, score, player) for room, (score, player) in best.items()])
+        except sqlite3.Error as e:
+            log.error("score_flush_failed", error=str(e), rows=len(rows))
+            with self.lock:
+                for key, score in batch.items():  # 다음 주기에 다시 시도
+                    if score > self.pending.get(key, -1):
+                        self.pending[key] = score
+            return
+        log.debug("scores_flushed", rows=len(rows), seconds=round(time.perf_counter() - start, 6))
+
+    def close(self):
+        """남은 점수를 기록하고 종료"""
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join()
+        self.flush()
+        self.db.close()
@@ -1,79 +1,610 @@
+import os
+import signal
 import socket
 import threading
 import pickle
-import random
+import queue
+import secrets
+import time
+
+import jsonlog
+from codec import MSG_INPUT, MSG_RESTORE, MSG_ROOM, DecodeError, Decoder, decode_batch, restored
+from executor import POLICIES, BoundedExecutor
+from leaderboard import LeaderboardClient
+from metrics import Registry, start_metrics_server
+from outbox import Outbox
+from protocol import KEEPALIVE, control_authorized, send_frame
+from replay import SessionRecorder
+from score_store import ScoreStore
+from sockopts import DEFAULT as DEFAULT_SOCKET_OPTIONS, SocketOptions
+from timerwheel import shared_wheel
+from tracing import install_dump_signal, tracer
+from udp_transport import INPUT, MAX_DATAGRAM, STATE, LossySocket, decode_packet, encode_packet, seq_newer
+from world import DEFAULT_SIZE as DEFAULT_WORLD_SIZE, World, parse_size
+
+log = jsonlog.get_logger("server")
 
 class GameServer:
-    def __init__(self, host='localhost', port=5555, max_rooms=3):
-        """게임 서버 초기화"""
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind((host, port))
-        self.server.listen()
-        print(f"Server started on {host}:{port}")
+    def __init__(self, host='localhost', port=5555, max_rooms=3, metrics_port=None, leaderboard=None,
+                 score_store=None, room="default", udp=False, udp_loss=0.0, socket_options=None,
+                 outbox_limit=8, slow_client_timeout=5.0, max_handlers=256, handler_queue=64, pool_policy="reject",
+                 idle_timeout=15.0, keepalive_interval=5.0, world_size=DEFAULT_WORLD_SIZE, record=None,
+                 checkpoint_secret=None, public_name=None):
+        """
+        게임 서버 초기화 (metrics_port 지정 시 /metrics HTTP 엔드포인트 실행).
+        port=None 이면 직접 수신하지 않고 외부에서 넘겨준 연결만 handle_client 로 처리 (룸 워커용).
+        leaderboard 에 (IP, 포트) 를 주면 전체 서버 리더보드에 점수를 보고하고 결과를 방송에 포함.
+        score_store(ScoreStore) 를 주면 점수를 저장하고 재시작 시 최고 점수를 복원. 매치메이킹 방에 든 플레이어는
+        '<room>/match-<방 번호>', 방 없이 들어온 플레이어는 room 이름으로 기록하고 최고 점수도 방마다 따로 방송.
+        udp=True 이면 같은 포트의 UDP 로 입력/상태를 주고받음 (참가, 재접속 등 제어는 계속 TCP).
+        udp_loss 는 시험용 UDP 송신 손실 확률.
+        socket_options(SocketOptions) 는 클라이언트 연결에 적용할 TCP 옵션 (기본 TCP_NODELAY).
+        한 틱(run_tick) 동안 클라이언트별로 쌓인 메시지는 틱 끝에 한 번의 send 로 보냄 (지연 추가 없이 틱 단위 묶음 전송).
+        클라이언트별 송신 큐는 outbox_limit 개까지 두고 넘치면 오래된 상태부터 버리며,
+        slow_client_timeout 초 넘게 송신 버퍼를 비우지 못하는 클라이언트는 연결을 끊음.
+        연결 처리는 최대 max_handlers 개 쓰레드에서 하고, 넘치는 연결은 handler_queue 개까지 대기,
+        그 이상은 pool_policy(BoundedExecutor 참고)에 따라 처리.
+        idle_timeout 초 동안 아무것도 보내지 않은 클라이언트는 끊긴 것으로 보고 정리 (0 이면 사용 안 함).
+        방송할 상태 변화가 keepalive_interval 초 동안 없으면 클라이언트에 keepalive 를 보냄.
+        world_size 는 (가로, 세로) 칸 수. 세션 메시지로 클라이언트에 알려 주고 뱀 위치를 청크 격자(World)로 관리.
+        첫 패킷에 방 번호(codec {"room_id"}, 밸런서 매치메이킹)가 있으면 방마다 따로 World 를 두고 상태도 방 안에서만 방송.
+        record 에 파일 경로를 주면 적용한 참가/입력/퇴장을 틱 단위로 그 파일에 덧붙여 기록 (replay.py 로 재생).
+        CHECKPOINT(전체 플레이어 상태) 요청은 checkpoint_secret 을 함께 보낸 경우에만 응답 (없으면 같은 호스트에서만).
+        public_name 은 세션 토큰 접두어. 없으면 직접 수신하는 주소 '<IP>:<포트>' (룸 워커는 room_server 가
+        프론트 주소 뒤에 룸을 붙여 넘겨 주므로 밸런서가 재접속을 프론트로 보내고 프론트는 같은 룸에 배정).
+        """
+        self.server = None
+        if port is not None:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind((host, port))
+            self.server.listen()
+            log.info("server_started", host=host, port=self.server.getsockname()[1])
         self.clients = {}  # 클라이언트 목록
+        self.world = World(*world_size)  # 뱀이 차지한 칸 (빈 칸에 새 플레이어 배치). 방 번호 없이 들어온 플레이어용
+        self.room_worlds = {}  # 매치메이킹 방 번호 -> World (플레이어가 있는 동안만 유지)
         self.rooms = {i: [] for i in range(max_rooms)}
         self.scores = {}  # 점수 목록
-        self.top_score = 0  # 최고 점수
+        self.room = room
+        self.score_store = score_store
+        self.top_scores = {}  # 매치메이킹 방 번호(방 없이 들어온 플레이어는 None) -> 최고 점수 (저장소가 있으면 복원)
+        self.leaderboard = None
+        if leaderboard is not None:
+            bound_port = self.server.getsockname()[1] if self.server else port
+            self.leaderboard = LeaderboardClient(leaderboard, f"{host}:{bound_port}")
+        self.name = public_name or (f"{host}:{self.server.getsockname()[1]}" if self.server else room)  # 세션 토큰 접두어 (재접속 라우팅용)
+        # TRACE_DUMP 요청 / SIGUSR1 시 프로파일 저장 위치 (서버 이름이라 포트가 없는 룸 워커끼리도 겹치지 않음)
+        self.trace_path = f"trace_profile_{self.name.replace(':', '_').replace('/', '_')}.json"
+        self.session_cache = {}  # 세션 토큰 -> (만료 시각, 플레이어 상태). 끊긴 플레이어의 재접속 복원용
+        self.session_ttl = 30  # 끊긴 뒤 상태를 보관하는 시간 (초)
+        self.session_lock = threading.Lock()
+        self.checkpoint_secret = checkpoint_secret
+        self.udp = None
+        self.udp_tokens = {}  # 세션 토큰 -> TCP 연결 (UDP 패킷의 플레이어 식별)
+        self.udp_seq = 0  # 상태 스냅샷 순번
+        if udp and self.server is not None:
+            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            udp_socket.bind(self.server.getsockname())
+            self.udp = LossySocket(udp_socket, udp_loss) if udp_loss else udp_socket
+            threading.Thread(target=self.udp_loop, daemon=True).start()
+            log.info("udp_started", port=udp_socket.getsockname()[1], loss=udp_loss)
+        self.socket_options = socket_options or DEFAULT_SOCKET_OPTIONS
+        self.outbox_limit = outbox_limit
+        self.slow_client_timeout = slow_client_timeout
+        self.draining = False  # True 이면 새 참가는 거절하고 기존 게임만 계속 진행
+        self.on_drained = None  # 드레인 중 마지막 클라이언트가 나가면 호출
+        self.drain_complete = False
+        # 단일 작성자 모델: 처리 쓰레드들은 이벤트만 넣고, 시뮬레이션 쓰레드 하나만 clients / top_scores 를 변경
+        self.events = queue.SimpleQueue()
+        self.handlers = BoundedExecutor("handler", max_handlers, handler_queue, pool_policy)
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.last_seen = {}  # 연결 -> 마지막 수신 시각 (처리 쓰레드가 갱신, 유휴 검사 타이머가 확인)
+        self.last_broadcast = time.monotonic()
+        self.timers = shared_wheel()  # 유휴 검사와 keepalive 주기 (같은 프로세스의 다른 서버/밸런서와 공용)
+        self.recorder = SessionRecorder(record, world_size) if record else None  # 시뮬레이션 쓰레드에서만 기록
+        self.init_metrics()
+        if metrics_port is not None:
+            start_metrics_server(self.metrics, host, metrics_port)
+        threading.Thread(target=self.simulate, name="simulation", daemon=True).start()
+        if keepalive_interval:
+            self.timers.repeat(keepalive_interval, self.events.put, ("keepalive",))  # 전송 여부는 시뮬레이션 쓰레드가 판단
+
+    def init_metrics(self):
+        """운영 지표 등록"""
+        self.metrics = Registry()
+        self.connections_total = self.metrics.counter("snake_server_connections_total", "Accepted game client connections")
+        self.disconnects_total = self.metrics.counter("snake_server_disconnects_total", "Game client disconnections")
+        self.heartbeats_total = self.metrics.counter("snake_server_heartbeats_total", "PING heartbeats answered")
+        self.metrics.gauge("snake_server_clients", "Currently connected game clients", callback=lambda: len(self.clients))
+        self.metrics.gauge("snake_server_draining", "1 while refusing new joins", callback=lambda: int(self.draining))
+        self.metrics.gauge("snake_server_top_score", "Highest score among the rooms in play on this server",
+                           callback=lambda: max(list(self.top_scores.values()), default=0))
+        self.tick_seconds = self.metrics.histogram("snake_server_tick_seconds", "update_game_state duration including broadcast")
+        self.broadcast_seconds = self.metrics.histogram("snake_server_broadcast_seconds", "broadcast_game_state duration")
+        self.codec_seconds = self.metrics.histogram("snake_server_codec_seconds", "Message encode/decode duration", ["op"])
+        self.decode_errors_total = self.metrics.counter("snake_server_decode_errors_total",
+                                                        "Malformed client messages (TCP connections are closed)", ["transport"])
+        self.writes_total = self.metrics.counter("snake_server_writes_total", "TCP send calls to game clients")
+        self.messages_sent_total = self.metrics.counter("snake_server_messages_sent_total", "State messages sent to game clients over TCP")
+        self.snapshots_dropped_total = self.metrics.counter("snake_server_snapshots_dropped_total",
+                                                            "Queued state snapshots dropped because a client's outbox was full")
+        self.slow_clients_evicted_total = self.metrics.counter("snake_server_slow_clients_evicted_total",
+                                                               "Clients disconnected for not draining their outbox")
+        self.metrics.gauge("snake_server_outbox_messages", "Queued outbound messages across all clients",
+                           callback=lambda: sum(entry["outbox"].depth() for entry in list(self.clients.values())))
+        self.handlers_rejected_total = self.metrics.counter("snake_server_handlers_rejected_total",
+                                                            "Connections closed because the handler pool and its queue were full")
+        self.metrics.gauge("snake_server_handlers_active", "Connection handler tasks running", callback=lambda: self.handlers.active)
+        self.metrics.gauge("snake_server_handlers_queued", "Accepted connections waiting for a handler thread",
+                           callback=lambda: self.handlers.queued())
+        self.metrics.gauge("snake_server_event_queue", "Events waiting for the simulation thread", callback=lambda: self.events.qsize())
+        self.idle_disconnects_total = self.metrics.counter("snake_server_idle_disconnects_total",
+                                                           "Clients disconnected after sending nothing for idle_timeout")
+        self.keepalives_sent_total = self.metrics.counter("snake_server_keepalives_sent_total",
+                                                          "Keepalive messages queued to clients during quiet periods")
+        self.metrics.gauge("snake_server_world_chunks", "World chunks currently allocated", callback=lambda: len(self.world.chunks) + sum(len(world.chunks) for world in list(self.room_worlds.values())))
+        self.metrics.gauge("snake_server_outbox_max_depth", "Deepest client outbox",
+                           callback=lambda: max((entry["outbox"].depth() for entry in list(self.clients.values())), default=0))
 
     def handle_client(self, conn, addr):
         """클라이언트 요청 처리"""
         try:
             # 데이터 확인 (하트비트 요청 구분)
             initial_data = conn.recv(1024)
-            if initial_data == b'PING':  # 하트비트 요청 처리
-                conn.sendall(b'PONG')
+            if initial_data == b'PING':  # 하트비트 요청 처리 (드레인 중이면 밸런서가 새 클라이언트를 보내지 않도록 알림)
+                conn.sendall(b'DRAINING' if self.draining else b'PONG')
+                self.heartbeats_total.inc()
+                conn.close()
+                return
+            if initial_data == b'TRACE_DUMP' and addr[0] in ('127.0.0.1', '::1'):  # 로컬 프로파일 저장 요청
+                path = tracer.dump(self.trace_path)
+                conn.sendall(path.encode())
+                conn.close()
+                return
+
+            if initial_data == b'DRAIN' and addr[0] in ('127.0.0.1', '::1'):  # 로컬 드레인 명령
+                self.drain()
+                conn.sendall(f"DRAINING {len(self.clients)}".encode())
+                conn.close()
+                return
+
+            if initial_data.split(b' ', 1)[0] == b'CHECKPOINT':  # 로드 밸런서의 플레이어 상태 체크포인트 요청
+                if control_authorized(initial_data, addr, self.checkpoint_secret):
+                    send_frame(conn, self.checkpoint())
+                else:
+                    log.warning("checkpoint_refused", addr=addr)
+                conn.close()
+                return
+
+            if self.draining:
+                log.info("join_refused_draining", addr=addr)
                 conn.close()
                 return
 
             # 일반 클라이언트 연결 처리
-            print(f"Client connected: {addr}")
-            self.clients[conn] = {"snake": [(random.randint(0, 19), random.randint(0, 19))], "score": 0}
+            log.info("client_connected", addr=addr)
+            self.connections_total.inc()
+            self.socket_options.apply(conn)
+            self.last_seen[conn] = time.monotonic()
+            if self.idle_timeout:
+                self.timers.schedule(self.idle_timeout, self.check_idle, conn, addr)
+            # 클라이언트 입력은 스키마를 확인하는 바이너리 디코더로만 복원 (pickle 은 받은 바이트로 임의 코드를 실행할 수 있음)
+            decoder = Decoder(self.world.size())
+            data = initial_data.partition(b'\n')[2] if initial_data.startswith(b'RESUME ') else initial_data
+            messages = decoder.feed(data)  # 형식이 틀린 첫 패킷이면 참가 없이 종료
+            restore = next((restored(message) for message in messages if message[0] == MSG_RESTORE), None)
+            room = next((message[1] for message in messages if message[0] == MSG_ROOM), None)
+            self.events.put(("join", conn, addr, initial_data, restore, room))
 
             while True:
+                inputs = [message for message in messages if message[0] == MSG_INPUT]  # keepalive 등 제외
+                if inputs:
+                    self.events.put(("input", conn, inputs))
                 data = conn.recv(4096)
                 if not data:
                     break
-                message = pickle.loads(data)  # 클라이언트 데이터 역직렬화
-                self.update_game_state(conn, message)
+                self.last_seen[conn] = time.monotonic()
+                self.socket_options.after_recv(conn)
+                with self.codec_seconds.time(op="decode"), tracer.span("codec.decode"):
+                    messages = decoder.feed(data)  # 여러 입력이 한 번에 오거나 입력이 recv 경계에서 잘릴 수 있음
+        except DecodeError as e:
+            self.decode_errors_total.inc(transport="tcp")
+            log.warning("client_protocol_error", addr=addr, error=str(e), data=data[:32].hex())
         except (ConnectionResetError, EOFError):
-            print(f"Client disconnected: {addr}")
+            log.info("client_disconnected", addr=addr)
         finally:
-            self.disconnect_client(conn)
+            self.last_seen.pop(conn, None)
+            left = threading.Event()
+            self.events.put(("leave", conn, left))
+            left.wait(1)  # 퇴장이 반영된 뒤 돌아가도록 (룸 워커의 인원 보고 등)
+
+    def check_idle(self, conn, addr):
+        """유휴 검사 타이머 (휠 쓰레드). 수신이 있었으면 남은 시간만큼 다시 예약, 없었으면 연결을 끊음"""
+        last_seen = self.last_seen.get(conn)
+        if last_seen is None:
+            return  # 이미 나간 클라이언트
+        idle = time.monotonic() - last_seen
+        if idle < self.idle_timeout:
+            self.timers.schedule(self.idle_timeout - idle, self.check_idle, conn, addr)
+            return
+        log.warning("client_idle_timeout", addr=addr, idle=round(idle, 1))
+        self.idle_disconnects_total.inc()
+        self.close_connection(conn)  # 처리 쓰레드가 깨어나 퇴장 이벤트를 넣음
+
+    def send_keepalives(self):
+        """최근 방송이 없었으면 모든 클라이언트에 keepalive 전송 (시뮬레이션 쓰레드)"""
+        if time.monotonic() - self.last_broadcast < self.keepalive_interval:
+            return
+        self.last_broadcast = time.monotonic()
+        for client, entry in list(self.clients.items()):
+            try:
+                entry["outbox"].put(KEEPALIVE)  # 틱 끝의 flush_clients 에서 전송
+                self.keepalives_sent_total.inc()
+            except OSError:
+                self.disconnect_client(client)
+
+    def simulate(self):
+        """
+        시뮬레이션 쓰레드. 쌓인 이벤트를 한 번에 꺼내 순서대로 반영하고, 입력이 있었으면 한 번만 방송.
+        월드 상태를 바꾸는 쓰레드가 하나뿐이므로 잠금 없이도 방송 중 clients 가 바뀌지 않음.
+        """
+        while True:
+            events = [self.events.get()]
+            while True:
+                try:
+                    events.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            with self.tick_seconds.time():
+                self.run_tick(events)
+
+    @tracer.traced("update_game_state")
+    def run_tick(self, events):
+        changed = False
+        for event in events:
+            kind = event[0]
+            if kind == "input":
+                _, conn, messages = event
+                if conn in self.clients:
+                    for message in messages:
+                        self.apply_input(conn, message)
+                    changed = True
+            elif kind == "udp":
+                changed = self.apply_udp_input(*event[1:]) or changed
+            elif kind == "join":
+                self.add_client(*event[1:])
+            elif kind == "keepalive":
+                self.send_keepalives()
+            elif kind == "drain":
+                self.check_drained()
+            elif kind == "leave":
+                _, conn, done = event
+                self.disconnect_client(conn)
+                if done is not None:
+                    done.set()
+        if self.recorder is not None:
+            self.recorder.tick()
+        if changed:
+            self.broadcast_game_state()
+        self.flush_clients()
+
+    def add_client(self, conn, addr, initial_data, restore=None, room=None):
+        """
+        새 플레이어 등록 (시뮬레이션 쓰레드). 이전/재접속 상태 복원 후 세션 토큰 발급.
+        :param restore: 첫 패킷의 이전 세션 상태 {"snake", "score"} (밸런서가 보냄)
+        :param room: 첫 패킷의 매치메이킹 방 번호 (None 이면 기본 월드)
+        """
+        world = self.world_of(room)
+        spawn = world.random_free_cell()
+        world.occupy([spawn])
+        self.clients[conn] = {"snake": [spawn], "score": 0, "room": room, "world": world,
+                              "name": f"{addr[0]}:{addr[1]}",
+                              "player": f"player-{secrets.token_hex(4)}",  # 점수 기록용 이름 (재접속해도 유지, 토큰과 무관)
+                              "outbox": Outbox(conn, self.outbox_limit, self.slow_client_timeout)}
+        if restore is not None:
+            self.restore_client(conn, restore)
+        self.resume_client(conn, initial_data)
+        if self.recorder is not None:
+            self.recorder.join(conn, self.clients[conn]["snake"], self.clients[conn]["score"])
+        self.issue_token(conn)
+
+    def world_of(self, room):
+        """방 번호의 World (처음 들어온 플레이어가 만들고, 마지막 플레이어가 나가면 disconnect_client 가 정리)"""
+        if room is None:
+            return self.world
+        world = self.room_worlds.get(room)
+        if world is None:
+            world = self.room_worlds[room] = World(self.world.width, self.world.height)
+        return world
+
+    def move_to_room(self, conn, room):
+        """플레이어의 뱀을 다른 방의 World 로 옮김 (재접속한 플레이어를 원래 방으로 되돌릴 때)"""
+        client = self.clients[conn]
+        if client["room"] == room:
+            return
+        client["world"].release(set(client["snake"]))
+        self.release_room(client["room"])
+        client["room"], client["world"] = room, self.world_of(room)
+        client["world"].occupy(set(client["snake"]))
+
+    def release_room(self, room):
+        """방의 World 가 비었으면 제거 (방의 최고 점수도 메모리에서 정리, 저장소에는 남음)"""
+        if room is not None and room in self.room_worlds and not self.room_worlds[room].chunks:
+            del self.room_worlds[room]
+            self.top_scores.pop(room, None)
 
-    def update_game_state(self, conn, data):
-        """게임 상태 업데이트"""
-        if "move" in data:
-            self.clients[conn]["snake"] = data["move"]
-        if "score" in data:
-            self.clients[conn]["score"] = data["score"]
-            self.top_score = max(self.top_score, data["score"])  # 최고 점수 갱신
+    def score_key(self, room):
+        """점수 저장소의 룸 이름 (매치메이킹 방이면 방 번호별로 따로 기록)"""
+        return self.room if room is None else f"{self.room}/match-{room}"
 
-        self.broadcast_game_state()
+    def top_score(self, room):
+        """방의 최고 점수 (처음 찾는 방이면 저장소의 기록에서 복원)"""
+        top = self.top_scores.get(room)
+        if top is None:
+            top = self.top_scores[room] = self.score_store.top_score(self.score_key(room)) if self.score_store else 0
+        return top
 
+    def raise_top_score(self, room, score):
+        self.top_scores[room] = max(self.top_score(room), score)
+
+    def drain(self):
+        """
+        드레인 시작: 새 참가를 거절하고, 남은 클라이언트가 모두 나가면 drain_complete 를 기록.
+        """
+        if self.draining:
+            return
+        self.draining = True
+        log.warning("drain_started", clients=len(self.clients))
+        self.events.put(("drain",))  # 이미 비어 있으면 바로 완료 (확인은 시뮬레이션 쓰레드에서)
+
+    def check_drained(self):
+        """드레인 중 마지막 클라이언트가 나갔으면 drain_complete 기록 (시뮬레이션 쓰레드, 한 번만)"""
+        if not self.draining or self.clients or self.drain_complete:
+            return
+        self.drain_complete = True
+        log.warning("drain_complete")
+        if self.on_drained is not None:
+            self.on_drained()
+
+    def checkpoint(self):
+        """세션 이전용 플레이어 상태 {클라이언트 주소: {"snake", "score"}}"""
+        return {client["name"]: {"snake": client["snake"], "score": client["score"]}
+                for client in list(self.clients.values())}
+
+    def restore_client(self, conn, state):
+        """
+        다른 서버에서 이전된 세션의 체크포인트로 뱀과 점수를 복원.
+        """
+        self.place_snake(conn, state.get("snake", self.clients[conn]["snake"]))
+        self.clients[conn]["score"] = state.get("score", 0)
+        self.raise_top_score(self.clients[conn]["room"], self.clients[conn]["score"])
+        log.info("client_restored", name=self.clients[conn]["name"], score=self.clients[conn]["score"])
+
+    def issue_token(self, conn):
+        """재접속용 세션 토큰 발급 (토큰 앞부분의 서버 이름으로 밸런서가 같은 서버에 연결)"""
+        token = f"{self.name}/{secrets.token_hex(8)}"
+        self.clients[conn]["token"] = token
+        session = {"session": token, "world": self.world.size(), "snake": self.clients[conn]["snake"]}  # 시작 위치 (복원된 뱀)
+        if self.udp is not None:
+            self.udp_tokens[token] = conn
+            session["udp"] = True  # 클라이언트가 이 토큰으로 UDP 입력을 보내면 상태도 UDP 로 전송
+        self.clients[conn]["outbox"].put(pickle.dumps(session))  # 틱 끝에 전송
+
+    def resume_client(self, conn, initial_data):
+        """
+        첫 패킷이 b'RESUME <토큰>' 이면 세션 캐시에서 뱀과 점수를 복원.
+        """
+        if not initial_data.startswith(b'RESUME '):
+            return
+        token = initial_data[7:].split(b'\n', 1)[0].decode(errors='replace')
+        now = time.time()
+        with self.session_lock:
+            entry = self.session_cache.pop(token, None)
+        if entry is None or entry[0] < now:
+            log.info("resume_unknown_session", name=self.clients[conn]["name"])
+            return
+        state = entry[1]
+        self.clients[conn]["player"] = state.get("player", self.clients[conn]["player"])
+        self.move_to_room(conn, state.get("room"))
+        self.place_snake(conn, state["snake"])
+        self.clients[conn]["score"] = state["score"]
+        log.info("client_resumed", name=self.clients[conn]["name"], score=state["score"])
+
+    def cache_session(self, client):
+        """끊긴 플레이어 상태를 session_ttl 동안 보관 (만료된 항목은 이때 정리)"""
+        token = client.get("token")
+        if token is None:
+            return
+        now = time.time()
+        with self.session_lock:
+            expired = [key for key, (expires, _) in self.session_cache.items() if expires < now]
+            for key in expired:
+                del self.session_cache[key]
+            self.session_cache[token] = (now + self.session_ttl, {"snake": client["snake"], "score": client["score"],
+                                                                     "room": client["room"], "player": client["player"]})
+
+    def udp_loop(self):
+        """
+        UDP 입력 수신. 패킷을 풀어 시뮬레이션 쓰레드에 넘기기만 함 (적용은 apply_udp_input).
+        """
+        while True:
+            try:
+                packet, addr = self.udp.recvfrom(MAX_DATAGRAM)
+                kind, seq, token, body = decode_packet(packet)
+            except (ValueError, ConnectionError):
+                continue  # 깨진 패킷 / 윈도우에서 이전 전송의 ICMP 오류
+            except OSError:
+                return
+            conn = self.udp_tokens.get(token.decode(errors='replace'))
+            if kind != INPUT or conn is None:
+                continue
+            try:
+                inputs = decode_batch(body, self.world.size())
+            except DecodeError:
+                self.decode_errors_total.inc(transport="udp")
+                continue
+            self.events.put(("udp", conn, addr, seq, inputs))
+
+    def apply_udp_input(self, conn, addr, seq, inputs):
+        """
+        UDP 입력 반영. 패킷마다 최근 입력 몇 개가 함께 오므로 마지막으로 적용한 순번 이후 입력만 순서대로 적용하고,
+        이미 본 순번보다 오래된(늦게 도착한) 패킷은 버림.
+        :return: 반영한 입력이 있는지
+        """
+        client = self.clients.get(conn)
+        if client is None:
+            return False
+        last = client.get("udp_seq")
+        if not seq_newer(seq, last):
+            return False
+        client["udp_seq"] = seq
+        client["udp_addr"] = addr
+        for input_seq, message in inputs:
+            if seq_newer(input_seq, last):
+                self.apply_input(conn, message)
+        return True
+
+    def apply_input(self, conn, message):
+        """클라이언트 입력 하나(codec (MSG_INPUT, 칸 목록, 점수))를 상태에 반영 (시뮬레이션 쓰레드, 방송은 하지 않음)"""
+        kind, move, score = message
+        if kind != MSG_INPUT:
+            return  # UDP 묶음의 keepalive 등
+        if self.recorder is not None:
+            self.recorder.input(conn, message)
+        if move is not None:
+            self.place_snake(conn, move, checked=True)
+        if score is not None:
+            self.clients[conn]["score"] = score
+            room = self.clients[conn]["room"]
+            self.raise_top_score(room, score)  # 플레이어가 속한 방의 최고 점수 갱신
+            if self.score_store is not None:
+                # 기록은 별도 쓰레드에서 묶어서 처리
+                self.score_store.record(self.score_key(room), self.clients[conn]["player"], score)
+            if self.leaderboard is not None:
+                self.leaderboard.report(self.clients[conn]["player"], score)  # 전송은 백그라운드에서 묶어서 처리
+
+    def place_snake(self, conn, snake, checked=False):
+        """
+        뱀 위치 교체 및 월드 점유 갱신. 월드 밖 좌표는 반대편으로 감싸고, 형식이 틀린 입력은 무시.
+        :param checked: 디코더가 월드 안의 정수 좌표임을 이미 확인한 입력 (감싸기 생략)
+        """
+        if checked:
+            cells = snake
+        else:
+            try:
+                cells = [self.world.wrap(cell) for cell in snake]
+            except (TypeError, ValueError):
+                return
+        client = self.clients[conn]
+        old, new = set(client["snake"]), set(cells)  # 이동 시 보통 머리와 꼬리 두 칸만 바뀜
+        client["world"].release(old - new)
+        client["world"].occupy(new - old)
+        client["snake"] = cells
+
+    @tracer.traced("broadcast_game_state")
     def broadcast_game_state(self):
-        """현재 게임 상태를 모든 클라이언트에 전송"""
-        game_state = {
-            "snakes": {conn.fileno(): self.clients[conn]["snake"] for conn in self.clients},
-            "scores": {conn.fileno(): self.clients[conn]["score"] for conn in self.clients},
-            "top_score": self.top_score
-        }
-        for client in self.clients:
+        """현재 게임 상태를 클라이언트에 전송 (방이 있으면 같은 방의 뱀과 점수만 그 방 플레이어에게)"""
+        start = time.perf_counter()
+        self.last_broadcast = time.monotonic()
+        rooms = {}
+        for conn, entry in self.clients.items():
+            rooms.setdefault(entry["room"], []).append(conn)
+        for room, members in rooms.items():
+            game_state = {
+                "snakes": {conn.fileno(): self.clients[conn]["snake"] for conn in members},
+                "scores": {conn.fileno(): self.clients[conn]["score"] for conn in members},
+                "top_score": self.top_score(room)
+            }
+            if self.leaderboard is not None:
+                game_state["global_top"] = self.leaderboard.top  # [(플레이어, 점수, 서버)]
+                game_state["global_top_score"] = self.leaderboard.top_score()
+            self.send_state(members, game_state)
+        self.broadcast_seconds.observe(time.perf_counter() - start)
+
+    def send_state(self, members, game_state):
+        """상태를 한 번만 직렬화해 members 에게 전송 (UDP 주소가 있으면 UDP, 아니면 송신 큐)"""
+        encode_start = time.perf_counter()
+        payload = pickle.dumps(game_state)
+        self.codec_seconds.observe(time.perf_counter() - encode_start, op="encode")
+        datagram = None
+        if self.udp is not None:
+            self.udp_seq += 1
+            datagram = encode_packet(STATE, self.udp_seq, payload)
+            if len(datagram) > MAX_DATAGRAM:
+                datagram = None  # 한 데이터그램에 담기지 않으면 TCP 로 전송
+        for client in members:
+            entry = self.clients.get(client)
+            if entry is None:
+                continue
             try:
-                client.send(pickle.dumps(game_state))
-            except (ConnectionResetError, EOFError):
+                if datagram is not None and entry.get("udp_addr") is not None:
+                    with tracer.span("socket.send"):
+                        self.udp.sendto(datagram, entry["udp_addr"])  # 최신 상태만 의미 있으므로 손실돼도 재전송하지 않음
+                else:
+                    dropped = entry["outbox"].put(payload)  # 블로킹 없음: 넘치면 가장 오래된 상태를 버림. 전송은 틱 끝에
+                    if dropped:
+                        self.snapshots_dropped_total.inc(dropped)
+            except OSError:
                 self.disconnect_client(client)
 
+    def flush_client(self, conn, entry):
+        """클라이언트 송신 큐를 한 번의 논블로킹 시스템 콜로 전송. 오래 막힌 느린 클라이언트는 연결 종료"""
+        outbox = entry["outbox"]
+        sent = outbox.flush()
+        if sent:
+            self.writes_total.inc()
+            self.messages_sent_total.inc(sent)
+        elif outbox.should_evict():
+            log.warning("slow_client_evicted", name=entry["name"], queued=outbox.depth(), dropped=outbox.dropped)
+            self.slow_clients_evicted_total.inc()
+            self.close_connection(conn)  # 처리 쓰레드가 깨어나 퇴장 이벤트를 넣음
+
+    def flush_clients(self):
+        """
+        틱 끝에서 쌓인 메시지가 있는 클라이언트마다 한 번씩 전송 (시뮬레이션 쓰레드).
+        한 틱의 세션 메시지, 방송, keepalive 가 클라이언트당 한 번의 send 로 묶이고 기다리는 시간은 없음.
+        지난 틱에 송신 버퍼가 가득 차 남은 바이트도 여기서 이어서 보냄.
+        """
+        for conn, entry in list(self.clients.items()):
+            if not entry["outbox"].depth():
+                continue
+            try:
+                with tracer.span("socket.send"):
+                    self.flush_client(conn, entry)
+            except OSError:
+                self.disconnect_client(conn)
+
     def disconnect_client(self, conn):
-        """클라이언트 연결 종료 처리"""
-        if conn in self.clients:
-            del self.clients[conn]
+        """클라이언트 연결 종료 처리 (시뮬레이션 쓰레드에서만 호출)"""
+        client = self.clients.pop(conn, None)
+        if client is not None:
+            client["world"].release(set(client["snake"]))
+            self.release_room(client["room"])
+            self.udp_tokens.pop(client.get("token"), None)
+            self.cache_session(client)
+            if self.recorder is not None:
+                self.recorder.leave(conn)
+            self.disconnects_total.inc()
+            if self.draining:
+                self.check_drained()
+        self.close_connection(conn)
         conn.close()
 
+    @staticmethod
+    def close_connection(conn):
+        """연결을 끊어 recv 에서 대기 중인 처리 쓰레드를 깨움 (어느 쓰레드에서든 호출 가능)"""
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
     def start(self):
         """서버 시작"""
         while True:
             conn, addr = self.server.accept()
-            threading.Thread(target=self.handle_client, args=(conn, addr)).start()
+            if not self.handlers.submit(self.handle_client, conn, addr):
+                self.handlers_rejected_total.inc()
+                conn.close()  # 처리 쓰레드와 대기열이 모두 찬 경우
 
 if __name__ == "__main__":
     import argparse
@@ -81,7 +612,70 @@ if __name__ == "__main__":
     # 포트 번호를 인자로 받아 다중 서버 실행 가능
     parser = argparse.ArgumentParser(description="Game Server")
     parser.add_argument('--port', type=int, default=5555, help='Port to run the server on')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Expose Prometheus metrics on this port')
+    parser.add_argument('--leaderboard', default=None, help='Global leaderboard service as host:port')
+    parser.add_argument('--score-db', default=None, help='SQLite file for persistent scores')
+    parser.add_argument('--exit-when-drained', action='store_true', help='Exit once a drain (SIGUSR2 / DRAIN) empties the server')
+    parser.add_argument('--udp', action='store_true', help='Also exchange inputs/state over UDP on the same port')
+    parser.add_argument('--udp-loss', type=float, default=0.0, help='Drop this fraction of outgoing UDP packets (testing)')
+    parser.add_argument('--sockopts', default=None, metavar='SPEC',
+                        help='Client socket options, e.g. nodelay=1,sndbuf=65536,rcvbuf=65536,quickack=1,keepalive=10')
+    parser.add_argument('--outbox-limit', type=int, default=8, help='Max queued state messages per client (oldest dropped)')
+    parser.add_argument('--slow-client-timeout', type=float, default=5.0,
+                        help='Disconnect clients whose send buffer stays full this long (seconds)')
+    parser.add_argument('--idle-timeout', type=float, default=15.0,
+                        help='Disconnect clients that send nothing (not even keepalives) for this long (0 = never)')
+    parser.add_argument('--keepalive-interval', type=float, default=5.0,
+                        help='Send clients a keepalive when no state was broadcast for this long (0 = off)')
+    parser.add_argument('--world', default=None, metavar='WxH', help='World size in cells, e.g. 64x64 (default 20x20)')
+    parser.add_argument('--record', default=None, metavar='FILE', help='Append applied joins/inputs/leaves to this replay log')
+    parser.add_argument('--checkpoint-secret', default=os.environ.get('SNAKE_CHECKPOINT_SECRET'),
+                        help='Shared secret the balancer must send with CHECKPOINT (default: $SNAKE_CHECKPOINT_SECRET, '
+                             'unset = local requests only)')
+    parser.add_argument('--max-handlers', type=int, default=256, help='Connection handler threads')
+    parser.add_argument('--handler-queue', type=int, default=64, help='Accepted connections allowed to wait for a handler')
+    parser.add_argument('--pool-policy', default='reject', choices=POLICIES, help='What to do when handlers and queue are full')
+    parser.add_argument('--log-level', default='info', choices=list(jsonlog.LEVELS), help='Minimum log level')
+    parser.add_argument('--trace-sample', type=float, default=0.0, help='Fraction of hot-path calls to time (0 = off)')
+    parser.add_argument('--trace-dump', default=None, help='Profile file written on SIGUSR1 / TRACE_DUMP')
     args = parser.parse_args()
+    jsonlog.set_level(args.log_level)
+
+    leaderboard = None
+    if args.leaderboard:
+        lb_host, lb_port = args.leaderboard.rsplit(':', 1)
+        leaderboard = (lb_host, int(lb_port))
+    score_store = ScoreStore(args.score_db) if args.score_db else None
+    server = GameServer(port=args.port, metrics_port=args.metrics_port, leaderboard=leaderboard,
+                        score_store=score_store, room=f"server-{args.port}", udp=args.udp, udp_loss=args.udp_loss,
+                        socket_options=SocketOptions.parse(args.sockopts) if args.sockopts else None,
+                        outbox_limit=args.outbox_limit,
+                        slow_client_timeout=args.slow_client_timeout, max_handlers=args.max_handlers,
+                        handler_queue=args.handler_queue, pool_policy=args.pool_policy,
+                        idle_timeout=args.idle_timeout, keepalive_interval=args.keepalive_interval,
+                        world_size=parse_size(args.world) if args.world else DEFAULT_WORLD_SIZE, record=args.record,
+                        checkpoint_secret=args.checkpoint_secret)
+    tracer.configure(args.trace_sample)
+    if args.trace_dump:
+        server.trace_path = args.trace_dump
+    install_dump_signal(server.trace_path)
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, lambda *_: server.drain())
+
+    def exit_drained():
+        if score_store is not None:
+            score_store.close()
+        if server.recorder is not None:
+            server.recorder.close()
+        jsonlog.flush()
+        os._exit(0)  # accept 에서 대기 중인 메인 쓰레드까지 종료
 
-    server = GameServer(port=args.port)
-    server.start()
+    if args.exit_when_drained:
+        server.on_drained = exit_drained
+    try:
+        server.start()
+    finally:
+        if score_store is not None:
+            score_store.close()  # 아직 기록하지 않은 점수 저장
+        if server.recorder is not None:
+            server.recorder.close()
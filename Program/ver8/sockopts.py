@@ -0,0 +1,76 @@
+import socket
+
+import jsonlog
+
+log = jsonlog.get_logger("sockopts")
+
+
+class SocketOptions:
+    """
+    게임 트래픽용 TCP 소켓 옵션 묶음 (서버, 밸런서, 클라이언트가 같은 설정을 사용).
+    :param nodelay: TCP_NODELAY. 작은 이동/상태 패킷이 Nagle 알고리즘에 묶여 늦게 나가지 않도록 기본 사용
+    :param sndbuf: SO_SNDBUF 크기 (None 이면 OS 기본값)
+    :param rcvbuf: SO_RCVBUF 크기 (None 이면 OS 기본값)
+    :param quickack: TCP_QUICKACK (리눅스). 커널이 매번 해제하므로 after_recv() 에서 다시 설정
+    :param keepalive: SO_KEEPALIVE 첫 탐침까지의 유휴 시간 (초, 0 이면 사용 안 함).
+                      이후 keepalive/3 초 간격으로 3번 응답이 없으면 커널이 연결을 끊음 (전원이 나간 상대 등)
+    """
+
+    FIELDS = ("nodelay", "sndbuf", "rcvbuf", "quickack", "keepalive")
+    KEEPALIVE_PROBES = 3
+
+    def __init__(self, nodelay=True, sndbuf=None, rcvbuf=None, quickack=False, keepalive=10):
+        self.nodelay = nodelay
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+        self.quickack = quickack and hasattr(socket, "TCP_QUICKACK")
+        self.keepalive = keepalive
+
+    @classmethod
+    def parse(cls, text):
+        """'nodelay=1,sndbuf=65536,quickack=1,keepalive=10' 형식 문자열로 생성"""
+        options = {}
+        for item in filter(None, text.split(',')):
+            key, _, value = item.partition('=')
+            key = key.strip()
+            if key not in cls.FIELDS:
+                raise ValueError(f"unknown socket option: {key}")
+            options[key] = bool(int(value)) if key in ("nodelay", "quickack") else int(value)
+        return cls(**options)
+
+    def apply(self, sock):
+        """연결된(또는 연결할) TCP 소켓에 옵션 적용. 지원하지 않는 옵션은 무시"""
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.nodelay))
+            if self.sndbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+            if self.rcvbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            if self.keepalive:
+                self.apply_keepalive(sock)
+            self.after_recv(sock)
+        except OSError as e:
+            log.debug("sockopt_failed", error=str(e))
+        return sock
+
+    def apply_keepalive(self, sock):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # 세부 시간은 플랫폼마다 옵션 이름이 달라 있는 것만 설정 (macOS 는 TCP_KEEPALIVE 가 유휴 시간)
+        idle = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+        if idle is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, idle, self.keepalive)
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, self.keepalive // self.KEEPALIVE_PROBES))
+        if hasattr(socket, "TCP_KEEPCNT"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, self.KEEPALIVE_PROBES)
+
+    def after_recv(self, sock):
+        """quickack 사용 시 수신 직후 호출 (지연 ACK 없이 바로 응답)"""
+        if self.quickack:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            except OSError:
+                pass
+
+
+DEFAULT = SocketOptions()
@@ -0,0 +1,155 @@
+import math
+import threading
+import time
+
+import jsonlog
+
+log = jsonlog.get_logger("timerwheel")
+
+
+class Timer:
+    """schedule() 이 돌려주는 타이머. cancel() 하면 만료되어도 실행하지 않음"""
+
+    __slots__ = ("expires", "fn", "args", "cancelled")
+
+    def __init__(self, expires, fn, args):
+        self.expires = expires  # 만료 틱 (휠이 시작된 뒤 지난 틱 수 기준)
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Periodic:
+    """repeat() 이 돌려주는 주기 작업. cancel() 하면 다음 실행부터 멈춤"""
+
+    __slots__ = ("wheel", "interval", "fn", "args", "executor", "timer", "cancelled")
+
+    def __init__(self, wheel, interval, fn, args, executor):
+        self.wheel = wheel
+        self.interval = interval
+        self.fn = fn
+        self.args = args
+        self.executor = executor
+        self.timer = None
+        self.cancelled = False
+
+    def start(self, delay):
+        if not self.cancelled:
+            self.timer = self.wheel.schedule(delay, self.fire)
+
+    def fire(self):
+        if self.executor is None:
+            self.run()
+        elif not self.executor.submit(self.run):
+            self.start(self.interval)  # 풀이 가득 차면 이번 회차는 건너뜀
+
+    def run(self):
+        try:
+            self.fn(*self.args)
+        finally:
+            self.start(self.interval)  # 실행이 끝난 뒤 다음 회차 예약 (오래 걸려도 겹치지 않음)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+class TimerWheel:
+    """
+    계층 타이머 휠. 연결마다 쓰레드나 소켓 타임아웃을 두지 않고 쓰레드 하나로 많은 타이머를 처리.
+    0단 휠은 tick 초 단위 slots 칸, 위 단의 한 칸은 아래 단 한 바퀴에 해당 (기본 0.05초 x 256^3 ≈ 9.7일).
+    먼 타이머는 위 단에 두었다가 아래 단이 한 바퀴 돌 때마다 한 칸씩 내려보냄 (등록/취소 O(1), 만료 정확도는 tick).
+    가장 큰 휠보다 먼 타이머는 overflow 목록에 두고 맨 위 단이 한 칸 돌 때마다 다시 배치 (일찍 실행하지 않음).
+    콜백은 휠 쓰레드에서 실행되므로 오래 막히는 작업은 repeat(executor=...) 나 별도 풀로 넘겨야 함.
+    """
+
+    def __init__(self, tick=0.05, slots=256, levels=3, name="timer-wheel"):
+        self.tick = tick
+        self.size = slots
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []  # 가장 큰 휠의 범위보다 먼 타이머
+        self.now = 0  # 지금까지 돈 틱 수
+        self.lock = threading.Lock()
+        threading.Thread(target=self.run, name=name, daemon=True).start()
+
+    def schedule(self, delay, fn, *args):
+        """delay 초 뒤 fn(*args) 실행. :return: Timer (취소용)"""
+        ticks = max(1, math.ceil(delay / self.tick))
+        with self.lock:
+            timer = Timer(self.now + ticks, fn, args)
+            self.place(timer)
+        return timer
+
+    def repeat(self, interval, fn, *args, executor=None, delay=None):
+        """
+        fn(*args) 를 interval 초마다 실행 (첫 실행은 delay 초 뒤, 기본 interval).
+        :param executor: 막힐 수 있는 작업(서버 접속 등)을 실행할 BoundedExecutor. None 이면 휠 쓰레드에서 실행
+        :return: Periodic (취소용)
+        """
+        periodic = Periodic(self, interval, fn, args, executor)
+        periodic.start(interval if delay is None else delay)
+        return periodic
+
+    def place(self, timer):
+        """만료까지 남은 틱 수에 맞는 단의 칸에 넣음 (lock 안에서 호출)"""
+        remaining = timer.expires - self.now
+        span = self.size
+        for wheel in self.wheels:
+            if remaining < span:
+                wheel[(timer.expires // (span // self.size)) % self.size].append(timer)
+                return
+            span *= self.size
+        self.overflow.append(timer)  # 범위 안에 들어올 때까지 대기
+
+    def advance(self):
+        """휠을 한 틱 돌리고 만료된 타이머 목록 반환"""
+        with self.lock:
+            self.now += 1
+            # 아래 단이 한 바퀴 돌 때마다 위 단의 다음 칸을 내려보냄 (높은 단부터)
+            span = self.size ** (len(self.wheels) - 1)
+            if self.overflow and self.now % span == 0:  # 맨 위 단이 한 칸 돌 때마다 범위에 들어온 먼 타이머를 배치
+                waiting, self.overflow = self.overflow, []
+                for timer in waiting:
+                    if not timer.cancelled:
+                        self.place(timer)
+            for level in range(len(self.wheels) - 1, 0, -1):
+                if self.now % span == 0:
+                    slot = (self.now // span) % self.size
+                    timers, self.wheels[level][slot] = self.wheels[level][slot], []
+                    for timer in timers:
+                        if not timer.cancelled:
+                            self.place(timer)
+                span //= self.size
+            slot = self.now % self.size
+            due, self.wheels[0][slot] = self.wheels[0][slot], []
+        return [timer for timer in due if not timer.cancelled]
+
+    def run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_tick += self.tick  # 늦어진 만큼은 다음 반복에서 바로 따라잡음
+            for timer in self.advance():
+                try:
+                    timer.fn(*timer.args)
+                except Exception as e:
+                    log.error("timer_failed", error=repr(e))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_wheel():
+    """프로세스 전체가 함께 쓰는 타이머 휠 (처음 호출할 때 쓰레드 시작)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TimerWheel(name="shared-timers")
+        return _shared
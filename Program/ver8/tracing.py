@@ -0,0 +1,177 @@
+import functools
+import json
+import signal
+import threading
+import time
+
+import jsonlog
+
+log = jsonlog.get_logger("tracing")
+
+BUCKETS = 48  # 2^0 ns ~ 2^47 ns(약 39시간) 구간을 고정 크기 배열로 관리
+
+
+class SpanStats:
+    """구간 하나의 호출 수와 샘플링된 실행 시간 분포 (고정 크기 log2 히스토그램)"""
+
+    __slots__ = ("name", "calls", "sampled", "total_ns", "max_ns", "buckets")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0  # 전체 호출 수 (샘플링 여부와 무관)
+        self.sampled = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, elapsed_ns):
+        # 여러 쓰레드에서 동시에 갱신될 수 있지만 통계용이므로 잠금 없이 근사치 허용
+        self.sampled += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.buckets[min(elapsed_ns.bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, ratio):
+        """구간 상한값 기준 백분위수 (ns)"""
+        target = self.sampled * ratio
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return 1 << index
+        return 0
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "sampled": self.sampled,
+            "mean_us": self.total_ns / self.sampled / 1000 if self.sampled else 0,
+            "max_us": self.max_ns / 1000,
+            "p50_us": self.percentile(0.5) / 1000,
+            "p99_us": self.percentile(0.99) / 1000,
+            "buckets_ns": {str(1 << i): count for i, count in enumerate(self.buckets) if count},
+        }
+
+
+class _Span:
+    __slots__ = ("stats", "start")
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    """
+    핫패스 실행 시간 샘플링 수집기.
+    sample_rate 비율만큼의 호출만 시간을 재므로 켜 두어도 오버헤드가 작음.
+    """
+
+    def __init__(self, sample_rate=0.0):
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.configure(sample_rate)
+
+    def configure(self, sample_rate):
+        """
+        샘플링 비율 설정.
+        :param sample_rate: 0 이면 끔, 1 이면 모든 호출 측정, 0.01 이면 100번 중 1번 측정
+        """
+        self.sample_rate = sample_rate
+        self.sample_every = round(1 / sample_rate) if sample_rate > 0 else 0
+
+    def get(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            with self.lock:
+                stats = self.stats.setdefault(name, SpanStats(name))
+        return stats
+
+    def span(self, name):
+        """with tracer.span("name"): 형태로 쓰는 측정 구간"""
+        if not self.sample_every:
+            return _NOOP
+        stats = self.get(name)
+        stats.calls += 1
+        if stats.calls % self.sample_every:
+            return _NOOP
+        return _Span(stats)
+
+    def traced(self, name=None):
+        """함수 전체를 측정 구간으로 감싸는 데코레이터"""
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.sample_every:
+                    return func(*args, **kwargs)
+                stats = self.get(label)
+                stats.calls += 1
+                if stats.calls % self.sample_every:
+                    return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    stats.record(time.perf_counter_ns() - start)
+            return wrapper
+        return decorator
+
+    def profile(self):
+        """현재까지 수집한 프로파일"""
+        return {
+            "started": self.started,
+            "dumped": time.time(),
+            "sample_rate": self.sample_rate,
+            "spans": {name: stats.snapshot() for name, stats in list(self.stats.items())},
+        }
+
+    def dump(self, path):
+        """프로파일을 JSON 파일로 저장"""
+        with open(path, 'w') as f:
+            json.dump(self.profile(), f, indent=2)
+        log.info("trace_dumped", path=path)
+        return path
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.started = time.time()
+
+
+tracer = Tracer()  # 프로세스 공용 수집기 (모듈 import 시점에 데코레이터에서 사용)
+
+
+def install_dump_signal(path, signum=None):
+    """
+    시그널을 받으면 프로파일을 파일로 저장 (기본 SIGUSR1, 윈도우에서는 지원하지 않음).
+    메인 쓰레드에서 호출해야 함.
+    """
+    signum = signum or getattr(signal, "SIGUSR1", None)
+    if signum is None:
+        return False
+    signal.signal(signum, lambda *_: tracer.dump(path))
+    return True
@@ -0,0 +1,256 @@
+import random
+import socket
+import struct
+import threading
+import time
+
+import jsonlog
+from codec import decode_batch, encode_batch
+from executor import BoundedExecutor
+from timerwheel import shared_wheel
+
+log = jsonlog.get_logger("udp")
+
+# 패킷 = 헤더(종류, 순번, 토큰 길이) + 세션 토큰 + 본문 (입력은 codec 묶음, 상태는 pickle)
+HEADER = struct.Struct("!BIH")
+INPUT = 1  # 클라이언트 -> 서버: 최근 입력 묶음
+STATE = 2  # 서버 -> 클라이언트: 게임 상태 스냅샷
+MAX_DATAGRAM = 65000  # 이보다 큰 상태는 TCP 로 전송
+REDUNDANCY = 3  # 입력 패킷마다 함께 다시 보내는 최근 입력 수
+
+
+def encode_packet(kind, seq, payload, token=b""):
+    """:param payload: 이미 직렬화한 본문 (상태는 한 번만 pickle 해서 모든 클라이언트에 재사용)"""
+    return HEADER.pack(kind, seq & 0xFFFFFFFF, len(token)) + token + payload
+
+
+def decode_packet(packet):
+    """:return: (종류, 순번, 토큰 bytes, 본문 bytes). 헤더가 깨진 패킷은 ValueError"""
+    if len(packet) < HEADER.size:
+        raise ValueError("short packet")
+    kind, seq, token_length = HEADER.unpack_from(packet)
+    body_start = HEADER.size + token_length
+    if body_start > len(packet):
+        raise ValueError("truncated token")
+    return kind, seq, packet[HEADER.size:body_start], packet[body_start:]
+
+
+def seq_newer(seq, last):
+    """순번 비교 (32비트 순환 고려). last 가 None 이면 항상 새 패킷"""
+    return last is None or 0 < ((seq - last) & 0xFFFFFFFF) < 0x80000000
+
+
+class LossySocket:
+    """
+    루프백 테스트용 패킷 손실 시뮬레이터.
+    UDP 소켓을 감싸 보내는 패킷을 loss 확률로 버림 (나머지 메서드는 원래 소켓으로 전달).
+    """
+
+    def __init__(self, sock, loss=0.0, seed=None):
+        self.sock = sock
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.sent = 0
+        self.dropped = 0
+
+    def _lost(self):
+        self.sent += 1
+        if self.loss and self.random.random() < self.loss:
+            self.dropped += 1
+            return True
+        return False
+
+    def send(self, data):
+        return len(data) if self._lost() else self.sock.send(data)
+
+    def sendto(self, data, address):
+        return len(data) if self._lost() else self.sock.sendto(data, address)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class InputSender:
+    """
+    클라이언트 쪽 입력 전송기.
+    입력마다 순번을 붙이고 최근 REDUNDANCY 개 입력을 함께 보내므로, 패킷 몇 개가 빠져도 다음 패킷으로 복구됨.
+    """
+
+    def __init__(self, sock, redundancy=REDUNDANCY):
+        self.sock = sock
+        self.redundancy = redundancy
+        self.seq = 0
+        self.recent = []  # [(순번, 입력)]
+
+    def send(self, token, data):
+        self.seq += 1
+        self.recent = (self.recent + [(self.seq, data)])[-self.redundancy:]
+        self.sock.send(encode_packet(INPUT, self.seq, encode_batch(self.recent), token.encode()))
+
+
+class UdpRelay:
+    """
+    로드 밸런서용 UDP 중계.
+    패킷의 세션 토큰으로 담당 게임 서버를 찾아 전달하고, 클라이언트 주소마다 둔 업스트림 소켓으로 받은 응답을 되돌려 줌.
+    :param resolve: 토큰 문자열 -> 게임 서버 주소. 밸런서가 발급을 확인한 살아 있는 세션의 토큰만 주소를 돌려주고
+                    나머지는 None (경로를 만들기 전에 확인하므로 위조 토큰으로는 소켓도 쓰레드도 생기지 않음)
+    :param idle_timeout: 클라이언트가 이 시간 동안 보내지 않은 경로는 타이머 휠에서 정리
+    :param max_routes: 경로(업스트림 소켓 + 응답 중계 쓰레드) 수 상한. 넘치면 새 경로를 만들지 않고 패킷을 버림
+    """
+
+    def __init__(self, resolve, idle_timeout=30, max_routes=1024, timers=None):
+        self.resolve = resolve
+        self.idle_timeout = idle_timeout
+        self.max_routes = max_routes
+        self.routes = {}  # 클라이언트 주소 -> (게임 서버 주소, 업스트림 소켓)
+        self.last_seen = {}  # 클라이언트 주소 -> 마지막으로 패킷을 받은 시각 (유휴 검사용)
+        self.lock = threading.Lock()
+        self.relays = BoundedExecutor("udp_relay", max_routes, 0, "reject")
+        self.timers = timers or shared_wheel()
+        self.rejected = 0  # 경로 수 상한이나 쓰레드 부족으로 만들지 못한 경로 수
+        self.evicted = 0  # 유휴로 정리한 경로 수
+        self.sock = None
+
+    def start(self, host, port):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        threading.Thread(target=self.run, daemon=True).start()
+        log.info("udp_relay_started", host=host, port=self.sock.getsockname()[1])
+        return self.sock.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                packet, client_addr = self.sock.recvfrom(MAX_DATAGRAM)
+                _, _, token, _ = decode_packet(packet)
+            except (ValueError, ConnectionError):
+                continue  # 깨진 패킷 / 윈도우에서 이전 전송의 ICMP 오류
+            except OSError:
+                return
+            target = self.resolve(token.decode(errors='replace'))
+            if target is None:
+                continue  # 발급되지 않았거나 끝난 세션의 토큰
+            upstream = self.route(client_addr, target)
+            if upstream is None:
+                continue
+            try:
+                upstream.send(packet)
+            except OSError:
+                pass  # 서버가 아직 준비되지 않았거나 다운, UDP 이므로 그대로 손실 처리
+
+    def route(self, client_addr, target):
+        """
+        클라이언트 주소의 업스트림 소켓 (세션이 다른 서버로 옮겨 가면 새로 만듦).
+        :return: 경로 수 상한에 걸렸거나 중계 쓰레드가 모두 사용 중이라 경로를 만들 수 없으면 None
+        """
+        with self.lock:
+            self.last_seen[client_addr] = time.monotonic()
+            route = self.routes.get(client_addr)
+            if route is not None and route[0] == target:
+                return route[1]
+            if route is not None:
+                self.close_upstream(route[1])  # 이전 응답 중계 쓰레드가 깨어나 정리
+            elif len(self.routes) >= self.max_routes:
+                del self.last_seen[client_addr]
+                self.rejected += 1
+                return None
+            upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            upstream.connect(target)
+            self.routes[client_addr] = (target, upstream)
+        if not self.relays.submit(self.relay_back, client_addr, upstream):
+            self.rejected += 1
+            self.forget(client_addr, upstream)
+            return None
+        self.timers.schedule(self.idle_timeout, self.check_idle, client_addr, upstream)
+        return upstream
+
+    def check_idle(self, client_addr, upstream):
+        """
+        유휴 검사 타이머 (휠 쓰레드). 클라이언트가 idle_timeout 동안 보내지 않았으면 업스트림을 닫아
+        응답 중계 쓰레드를 깨우고 경로를 정리. 아니면 남은 시간만큼 다시 예약.
+        """
+        with self.lock:
+            if self.routes.get(client_addr, (None, None))[1] is not upstream:
+                return  # 이미 정리되었거나 다른 서버로 옮긴 경로
+            idle = time.monotonic() - self.last_seen.get(client_addr, 0)
+        if idle < self.idle_timeout:
+            self.timers.schedule(self.idle_timeout - idle, self.check_idle, client_addr, upstream)
+            return
+        self.evicted += 1
+        self.close_upstream(upstream)
+
+    @staticmethod
+    def close_upstream(upstream):
+        """업스트림 소켓을 끊어 recv 에서 대기 중인 응답 중계 쓰레드를 깨움"""
+        try:
+            upstream.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def relay_back(self, client_addr, upstream):
+        """게임 서버 응답을 클라이언트로 전달. 업스트림이 닫히면 경로 정리"""
+        while True:
+            try:
+                packet = upstream.recv(MAX_DATAGRAM)
+                if not packet:
+                    break  # close_upstream (유휴 정리 또는 서버 변경)
+                self.sock.sendto(packet, client_addr)
+            except ConnectionRefusedError:
+                continue  # 이전 전송에 대한 ICMP 오류, 다음 패킷은 정상일 수 있음
+            except OSError:
+                break
+        self.forget(client_addr, upstream)
+
+    def forget(self, client_addr, upstream):
+        """경로 정리 (그 사이 새 경로로 바뀌었으면 새 경로는 유지)"""
+        with self.lock:
+            if self.routes.get(client_addr, (None, None))[1] is upstream:
+                del self.routes[client_addr]
+                self.last_seen.pop(client_addr, None)
+        upstream.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # 루프백 손실 시험: 입력 전송기 -> 손실 소켓 -> 수신 측에서 순번 기준으로 적용된 입력 수 확인
+    parser = argparse.ArgumentParser(description="UDP input redundancy loopback test")
+    parser.add_argument('--loss', type=float, default=0.2, help='Packet loss probability')
+    parser.add_argument('--packets', type=int, default=2000, help='Inputs to send')
+    parser.add_argument('--redundancy', type=int, default=REDUNDANCY, help='Recent inputs repeated in each packet')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the loss simulator')
+    args = parser.parse_args()
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('localhost', 0))
+    receiver.settimeout(0.5)
+    sender_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender_sock.connect(receiver.getsockname())
+    lossy = LossySocket(sender_sock, args.loss, args.seed)
+    sender = InputSender(lossy, args.redundancy)
+
+    applied = set()
+    last_seq = None
+
+    def receive():
+        global last_seq
+        while True:
+            try:
+                kind, seq, _, body = decode_packet(receiver.recv(MAX_DATAGRAM))
+            except (socket.timeout, OSError):
+                return
+            for input_seq, _ in decode_batch(body):
+                if seq_newer(input_seq, last_seq):
+                    applied.add(input_seq)
+            if seq_newer(seq, last_seq):
+                last_seq = seq
+
+    thread = threading.Thread(target=receive)
+    thread.start()
+    for i in range(args.packets):
+        sender.send("loopback", {"move": [(i % 20, i % 20)]})
+        time.sleep(0.0002)
+    thread.join()
+    print(f"packets dropped: {lossy.dropped}/{lossy.sent} ({lossy.dropped / lossy.sent:.1%})")
+    print(f"inputs applied:  {len(applied)}/{args.packets} ({len(applied) / args.packets:.1%}) "
+          f"with redundancy {args.redundancy}")
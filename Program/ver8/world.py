@@ -0,0 +1,114 @@
+import random
+from array import array
+
+DEFAULT_SIZE = (20, 20)  # (가로 칸 수, 세로 칸 수). 기존 20x20 보드
+CHUNK_SIZE = 16  # 청크 한 변의 칸 수
+
+
+def parse_size(text):
+    """'64x48' (가로x세로) 형식 문자열을 (가로, 세로) 로 변환"""
+    width, _, height = text.lower().partition('x')
+    size = (int(width), int(height or width))
+    if min(size) < 1:
+        raise ValueError(f"invalid world size: {text}")
+    return size
+
+
+class Chunk:
+    __slots__ = ("cells", "population")
+
+    def __init__(self, size):
+        self.cells = array('H', bytes(2 * size * size))  # 칸마다 그 칸을 차지한 뱀 수
+        self.population = 0  # 차지된 칸 수의 합 (0 이 되면 청크 해제)
+
+
+class World:
+    """
+    칸 단위 게임 월드. 좌표는 (행, 열) 이고 가장자리는 반대편과 이어짐.
+    칸 점유 정보는 CHUNK_SIZE x CHUNK_SIZE 청크에 저장하며, 청크는 처음 점유될 때 만들고 비면 해제
+    (큰 맵이라도 메모리는 뱀이 있는 영역만큼만 사용).
+    시뮬레이션 쓰레드에서만 사용하므로 잠금 없음.
+    """
+
+    def __init__(self, width=DEFAULT_SIZE[0], height=DEFAULT_SIZE[1], chunk_size=CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self.chunks = {}  # (청크 행, 청크 열) -> Chunk
+
+    def size(self):
+        return [self.width, self.height]
+
+    def wrap(self, cell):
+        """월드 밖 좌표를 반대편으로 감싼 (행, 열). 형식이 틀리면 TypeError / ValueError"""
+        row, col = cell
+        return int(row) % self.height, int(col) % self.width
+
+    def locate(self, cell):
+        """:return: (청크 키, 청크 안의 칸 번호)"""
+        row, col = cell
+        size = self.chunk_size
+        return (row // size, col // size), (row % size) * size + col % size
+
+    def occupy(self, cells):
+        for cell in cells:
+            key, index = self.locate(cell)
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = self.chunks[key] = Chunk(self.chunk_size)
+            chunk.cells[index] += 1
+            chunk.population += 1
+
+    def release(self, cells):
+        for cell in cells:
+            key, index = self.locate(cell)
+            chunk = self.chunks.get(key)
+            if chunk is None or not chunk.cells[index]:
+                continue
+            chunk.cells[index] -= 1
+            chunk.population -= 1
+            if not chunk.population:
+                del self.chunks[key]
+
+    def occupied(self, cell):
+        key, index = self.locate(cell)
+        chunk = self.chunks.get(key)
+        return chunk is not None and chunk.cells[index] > 0
+
+    def random_free_cell(self, attempts=64):
+        """비어 있는 임의의 칸 (몇 번 뽑아도 빈 칸이 없으면 아무 칸)"""
+        for _ in range(attempts):
+            cell = (random.randrange(self.height), random.randrange(self.width))
+            if not self.occupied(cell):
+                return cell
+        return cell
+
+
+class Viewport:
+    """
+    월드의 rows x cols 칸만 화면에 보여 주는 카메라 (클라이언트용).
+    월드가 화면보다 크면 플레이어 머리를 가운데에 두고 따라가며, 작거나 같으면 기존처럼 월드 전체를 고정해서 보여 줌.
+    """
+
+    def __init__(self, rows=20, cols=20):
+        self.rows = rows
+        self.cols = cols
+        self.origin = (0, 0)  # 화면 왼쪽 위 칸의 월드 좌표
+        self.world = DEFAULT_SIZE
+
+    def follow(self, head, world):
+        """:param world: (가로, 세로) 월드 크기"""
+        self.world = world
+        width, height = world
+        top = (head[0] - self.rows // 2) % height if height > self.rows else 0
+        left = (head[1] - self.cols // 2) % width if width > self.cols else 0
+        self.origin = (top, left)
+
+    def to_screen(self, cell):
+        """월드 칸의 화면 (행, 열). 화면 밖이면 None"""
+        width, height = self.world
+        row = (cell[0] - self.origin[0]) % height
+        col = (cell[1] - self.origin[1]) % width
+        if row < self.rows and col < self.cols:
+            return row, col
+        return None
@@ -0,0 +1,162 @@
+"""
+LoadBalancer 벤치마크: transfer 중계 처리량, 헬스체크 1회 순회 시간, 밸런서를 통한 접속 지연,
+룸 샤딩 서버로의 재접속(RESUME) 지연.
+"""
+import socket
+import threading
+import time
+
+from codec import encode
+from common import free_port, measure, rate, summarize, tcp_pair, wait_for_port
+from loadBalance import LoadBalancer, Session
+from protocol import MessageStream
+from room_server import RoomShardedServer
+from server import GameServer
+
+
+def start_game_servers(count):
+    """루프백에 게임 서버들을 띄우고 주소 목록 반환"""
+    servers = []
+    for _ in range(count):
+        server = GameServer(port=0)
+        threading.Thread(target=server.start, daemon=True).start()
+        servers.append(server)
+    addresses = [('localhost', server.server.getsockname()[1]) for server in servers]
+    return servers, addresses
+
+
+def bench_relay(quick):
+    """클라이언트 -> 밸런서 -> 서버 방향 단방향 중계(relay_upstream) 처리량 (MB/s)"""
+    total = (16 if quick else 128) * 1024 * 1024
+    chunk = b'x' * 4096
+    balancer = LoadBalancer([])
+    client, balancer_in = tcp_pair()
+    balancer_out, backend = tcp_pair()
+    session = Session(balancer_in, None, None)
+    session.server_conn = balancer_out
+    threading.Thread(target=balancer.relay_upstream, args=(session,), daemon=True).start()
+
+    def send_all():
+        sent = 0
+        while sent < total:
+            client.sendall(chunk)
+            sent += len(chunk)
+        client.shutdown(socket.SHUT_WR)
+
+    start = time.perf_counter()
+    threading.Thread(target=send_all, daemon=True).start()
+    received = 0
+    while received < total:
+        data = backend.recv(65536)
+        if not data:
+            break
+        received += len(data)
+    elapsed = time.perf_counter() - start
+    client.close()
+    backend.close()
+    return rate(received / (1024 * 1024), elapsed, 'MB/s')
+
+
+def bench_health_sweep(quick, addresses):
+    """health_check 한 바퀴(모든 서버 PING) 소요 시간. 응답 없는 서버 하나 포함"""
+    dead = ('localhost', free_port())
+    balancer = LoadBalancer(addresses + [dead])
+
+    def sweep():
+        for address in balancer.server_addresses:
+            balancer.ping_server(address)
+
+    return summarize(measure(sweep, 20 if quick else 200, warmup=2), unit='ms')
+
+
+def bench_join_latency(quick, addresses):
+    """밸런서 접속부터 첫 게임 상태 수신까지의 지연"""
+    port = free_port()
+    balancer = LoadBalancer(addresses)
+    threading.Thread(target=balancer.start, kwargs={"port": port}, daemon=True).start()
+    wait_for_port(('localhost', port))
+    move = encode({"move": [(5, 5)]})
+
+    def attempt():
+        with socket.create_connection(('localhost', port)) as sock:
+            sock.settimeout(0.005)
+            # 서버는 첫 패킷을 하트비트 판별용으로 소비하므로 응답이 올 때까지 이동을 재전송
+            while True:
+                sock.sendall(move)
+                try:
+                    if sock.recv(4096):
+                        return
+                except socket.timeout:
+                    continue
+
+    def join():
+        # 다른 세션 종료와 겹쳐 연결이 끊기는 경우도 지연에 포함하여 재시도
+        for _ in range(5):
+            try:
+                return attempt()
+            except OSError:
+                continue
+        raise RuntimeError("join through the balancer failed repeatedly")
+
+    return summarize(measure(join, 20 if quick else 200, warmup=2), unit='ms')
+
+
+def bench_resume_rooms(quick):
+    """
+    룸 샤딩 서버(room_server.py) 앞의 밸런서로 끊긴 세션이 재접속해 같은 룸에서 뱀을 이어 받기까지의 지연.
+    워커의 세션 토큰으로 밸런서가 프론트를 찾고 프론트가 같은 룸에 배정해야 하므로, 이어 받지 못하면 실패로 끝냄.
+    """
+    rooms_port, port = free_port(), free_port()
+    rooms = RoomShardedServer(port=rooms_port, rooms=2, workers=1)
+    threading.Thread(target=rooms.start, daemon=True).start()
+    wait_for_port(('localhost', rooms_port))
+    balancer = LoadBalancer([('localhost', rooms_port)])
+    threading.Thread(target=balancer.start, kwargs={"port": port}, daemon=True).start()
+    wait_for_port(('localhost', port))
+    snake = [(3, 4), (3, 5)]
+
+    def session_message(first_packet):
+        """밸런서에 접속해 첫 패킷을 보내고 서버가 발급한 세션 메시지를 받음"""
+        sock = socket.create_connection(('localhost', port), timeout=5)
+        sock.sendall(first_packet)
+        stream = MessageStream()
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                raise RuntimeError("connection closed before the session message")
+            for message in stream.feed(data):
+                if isinstance(message, dict) and "session" in message:
+                    return sock, message
+
+    def leave(sock):
+        """연결을 닫고 워커가 퇴장을 반영(세션 보관)해 체크포인트에서 플레이어가 빠질 때까지 대기"""
+        sock.close()
+        deadline = time.monotonic() + 5
+        while rooms.checkpoint():
+            if time.monotonic() > deadline:
+                raise RuntimeError("room worker did not process the disconnect")
+            time.sleep(0.005)
+
+    sock, message = session_message(encode({"move": snake, "score": 7}))
+    token = message["session"]
+    samples = []
+    for _ in range(5 if quick else 50):
+        leave(sock)
+        start = time.perf_counter()
+        sock, message = session_message(b'RESUME ' + token.encode() + b'\n')
+        samples.append(time.perf_counter() - start)
+        if message["snake"] != snake or message["session"].rsplit('/', 1)[0] != token.rsplit('/', 1)[0]:
+            raise RuntimeError(f"session {token} resumed as {message['session']} with snake {message['snake']}")
+        token = message["session"]
+    sock.close()
+    return summarize(samples, unit='ms')
+
+
+def run(quick=False):
+    results = {"balancer.relay.throughput": bench_relay(quick)}
+    servers, addresses = start_game_servers(3)
+    wait_for_port(addresses[0])
+    results["balancer.health_sweep"] = bench_health_sweep(quick, addresses)
+    results["balancer.join_latency"] = bench_join_latency(quick, addresses)
+    results["balancer.resume_latency.rooms"] = bench_resume_rooms(quick)
+    return results
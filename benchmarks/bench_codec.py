@@ -0,0 +1,81 @@
+"""
+코덱 벤치마크: 서버가 주고받는 메시지의 직렬화/역직렬화 비용.
+클라이언트 입력은 기존 pickle 경로와 스키마를 확인하는 바이너리 코덱(codec.py)을 비교.
+"""
+import itertools
+import pickle
+import random
+
+from codec import Decoder, encode
+from common import measure, summarize
+from world import World
+
+
+def make_game_state(players, snake_length):
+    """broadcast_game_state 가 만드는 것과 같은 형태의 게임 상태"""
+    snakes = {}
+    for player in range(players):
+        snakes[player] = [(random.randint(0, 19), random.randint(0, 19)) for _ in range(snake_length)]
+    return {
+        "snakes": snakes,
+        "scores": {player: random.randint(0, 50) for player in range(players)},
+        "top_score": 50,
+    }
+
+
+def make_move(snake_length):
+    """클라이언트가 매 틱마다 보내는 이동 메시지"""
+    return {"move": [(random.randint(0, 19), random.randint(0, 19)) for _ in range(snake_length)], "score": 3}
+
+
+def make_moves(snake_length, ticks=64, grow_every=0, world=(20, 20)):
+    """한 플레이어가 틱마다 보내는 이동 메시지들 (머리가 한 칸씩 나아감. grow_every 틱마다 먹이를 먹어 한 칸 자람)"""
+    width, height = world
+    snake = [((row + 5) % height, 5) for row in range(snake_length)]
+    moves = []
+    for tick in range(ticks):
+        row, col = snake[0]
+        head = random.choice((((row - 1) % height, col), (row, (col + 1) % width)))
+        grow = grow_every and tick % grow_every == grow_every - 1
+        snake = [head] + (snake if grow else snake[:-1])
+        moves.append({"move": snake, "score": len(snake)})
+    return moves
+
+
+def run(quick=False):
+    iterations = 2000 if quick else 20000
+    results = {}
+    messages = {
+        "move_len10": make_move(10),
+        "state_p4_len10": make_game_state(4, 10),
+        "state_p16_len50": make_game_state(16, 50),
+    }
+    for name, message in messages.items():
+        encoded = pickle.dumps(message)
+        results[f"codec.pickle.encode.{name}"] = summarize(measure(lambda: pickle.dumps(message), iterations, warmup=100))
+        results[f"codec.pickle.decode.{name}"] = summarize(measure(lambda: pickle.loads(encoded), iterations, warmup=100))
+
+    # 클라이언트 -> 서버 입력: 같은 메시지 열(한 칸씩 움직이는 뱀)을 기존 pickle.loads 와 스키마를 확인하는 디코더로 복원.
+    # 디코더 결과는 월드 안 좌표임이 확인되어 서버가 그대로 쓰고, pickle.loads 는 확인 없이 복원만 하는 하한
+    world = World(20, 20)
+    inputs = {
+        "move_len1": make_moves(1),
+        "move_len10": make_moves(10),
+        "move_len50": make_moves(50),
+        "move_mix": make_moves(1, ticks=400, grow_every=8),  # 한 칸에서 50 칸까지 자라는 한 판
+        "keepalive": [{"keepalive": True}],
+    }
+    for name, sequence in inputs.items():
+        pickled = itertools.cycle([pickle.dumps(message) for message in sequence])
+        binary = itertools.cycle([encode(message) for message in sequence])
+        messages = itertools.cycle(sequence)
+        decoder = Decoder(world.size())
+        results[f"codec.binary.encode.{name}"] = summarize(measure(lambda: encode(next(messages)), iterations, warmup=100))
+        results[f"codec.input.pickle.decode.{name}"] = summarize(
+            measure(lambda: pickle.loads(next(pickled)), iterations, warmup=100))
+        results[f"codec.input.binary.decode.{name}"] = summarize(
+            measure(lambda: decoder.feed(next(binary)), iterations, warmup=100))
+        # pickle.loads 대비 배율 (1 보다 크면 검증하는 디코더가 pickle.loads 보다 느림)
+        ratio = results[f"codec.input.binary.decode.{name}"]["value"] / results[f"codec.input.pickle.decode.{name}"]["value"]
+        results[f"codec.input.binary_vs_pickle.{name}"] = {"value": ratio, "unit": "x", "better": "lower"}
+    return results
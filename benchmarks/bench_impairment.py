@@ -0,0 +1,126 @@
+"""
+장애 네트워크 벤치마크: ImpairmentProxy 를 거쳐 게임 서버에 접속한 클라이언트의 입력 반영 지연 (TCP / UDP).
+고정 주기로 이동 입력을 보내고, 받은 상태에 반영된 가장 최근 입력의 전송 시각으로 지연을 계산.
+"""
+import pickle
+import socket
+import threading
+import time
+
+from codec import KEEPALIVE, encode
+from common import free_port, summarize, wait_for_port
+from impairment import Impairment, ImpairmentProxy
+from protocol import MessageStream
+from server import GameServer
+from udp_transport import MAX_DATAGRAM, STATE, InputSender, decode_packet
+
+PROFILES = {
+    "lan": Impairment(seed=1),
+    "wan": Impairment(delay=0.03, jitter=0.01, loss=0.01, seed=1),
+    "lossy": Impairment(delay=0.03, jitter=0.01, loss=0.05, seed=1),
+}
+TICK = 0.01  # 입력 전송 주기 (초)
+
+
+def start_proxy(target, impairment, udp):
+    port = free_port()
+    proxy = ImpairmentProxy(('localhost', port), target, impairment, udp=udp)
+    threading.Thread(target=proxy.start, daemon=True).start()
+    if not udp:
+        wait_for_port(('localhost', port))
+    else:
+        time.sleep(0.1)
+    return ('localhost', port)
+
+
+def run_ticks(duration, send, sent_at, stop):
+    tick = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        tick += 1
+        sent_at[tick] = time.perf_counter()
+        send(tick)
+        time.sleep(TICK)
+    time.sleep(0.5)  # 지연된 마지막 상태까지 수신
+    stop.set()
+
+
+def record(state, sent_at, latencies, seen):
+    """상태에 반영된 최신 입력(점수 = 틱 번호)이 새로우면 지연 기록"""
+    tick = max(state.get("scores", {}).values(), default=0)
+    if tick > seen[0] and tick in sent_at:
+        seen[0] = tick
+        latencies.append(time.perf_counter() - sent_at[tick])
+
+
+def measure_tcp(address, duration):
+    sent_at, latencies, seen, stop = {}, [], [0], threading.Event()
+    sock = socket.create_connection(address)
+    sock.sendall(KEEPALIVE)  # 서버가 소비하는 첫 패킷
+    time.sleep(0.2)
+
+    def receive():
+        stream = MessageStream()  # recv 경계에서 잘린 상태는 다음 recv 와 이어 붙임
+        while not stop.is_set():
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            for state in stream.feed(data):
+                record(state, sent_at, latencies, seen)
+
+    threading.Thread(target=receive, daemon=True).start()
+    run_ticks(duration, lambda tick: sock.sendall(encode({"move": [(tick % 20, 0)], "score": tick})),
+              sent_at, stop)
+    sock.close()
+    return latencies
+
+
+def measure_udp(tcp_address, udp_address, duration):
+    sent_at, latencies, seen, stop = {}, [], [0], threading.Event()
+    sock = socket.create_connection(tcp_address)
+    sock.sendall(KEEPALIVE)
+    token = None
+    stream = MessageStream()
+    while token is None:
+        for state in stream.feed(sock.recv(65536)):
+            token = state.get("session", token)
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.connect(udp_address)
+    udp.settimeout(0.2)
+    inputs = InputSender(udp)
+
+    def receive():
+        while not stop.is_set():
+            try:
+                kind, _, _, body = decode_packet(udp.recv(MAX_DATAGRAM))
+            except (socket.timeout, ValueError):
+                continue
+            except OSError:
+                return
+            if kind == STATE:
+                record(pickle.loads(body), sent_at, latencies, seen)
+
+    threading.Thread(target=receive, daemon=True).start()
+    run_ticks(duration, lambda tick: inputs.send(token, {"move": [(tick % 20, 0)], "score": tick}),
+              sent_at, stop)
+    sock.close()
+    udp.close()
+    return latencies
+
+
+def run(quick=False):
+    duration = 1.0 if quick else 4.0
+    server = GameServer(port=0, udp=True)
+    threading.Thread(target=server.start, daemon=True).start()
+    target = ('localhost', server.server.getsockname()[1])
+    wait_for_port(target)
+    results = {}
+    for name, impairment in PROFILES.items():
+        tcp_proxy = start_proxy(target, impairment, udp=False)
+        results[f"impairment.{name}.tcp.input_latency"] = summarize(measure_tcp(tcp_proxy, duration), unit='ms')
+        udp_proxy = start_proxy(target, impairment, udp=True)
+        results[f"impairment.{name}.udp.input_latency"] = summarize(measure_udp(tcp_proxy, udp_proxy, duration), unit='ms')
+    return results
@@ -0,0 +1,51 @@
+"""
+재생 벤치마크: 기록된 입력 로그를 GameServer 시뮬레이션에 최대 속도로 다시 넣어
+run_tick (update_game_state + broadcast_game_state) 의 틱당 비용을 측정.
+운영에서 기록한 로그는 Program/ver8/replay.py 로 직접 재생하고, 여기서는 같은 형식의 합성 로그를 사용.
+"""
+import os
+import random
+import tempfile
+
+from common import rate, summarize
+from replay import SessionRecorder, replay_simulation
+
+
+def record_session(path, players, snake_length, ticks, world=(20, 20)):
+    """
+    players 명이 매 틱 한 칸씩 움직이는 세션을 기록 (시작 위치와 경로는 시드로 고정).
+    :return: 기록 파일 경로
+    """
+    rng = random.Random(players * 1000 + snake_length)
+    width, height = world
+    recorder = SessionRecorder(path, world)
+    snakes = {}
+    for player in range(players):
+        head = (rng.randrange(height), rng.randrange(width))
+        snakes[player] = [(head[0], (head[1] - offset) % width) for offset in range(snake_length)]
+        recorder.join(player, snakes[player], 0)
+    recorder.tick()
+    for tick in range(ticks):
+        for player, snake in snakes.items():
+            row, col = snake[0]
+            step = rng.choice(((0, 1), (1, 0), (0, -1), (-1, 0)))
+            snake.insert(0, ((row + step[0]) % height, (col + step[1]) % width))
+            snake.pop()
+            recorder.input(player, {"move": snake, "score": tick})
+        recorder.tick()
+    recorder.close()
+    return path
+
+
+def run(quick=False):
+    ticks = 200 if quick else 2000
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for players, snake_length in [(4, 10), (16, 50)]:
+            name = f"p{players}_len{snake_length}"
+            path = record_session(os.path.join(directory, f"{name}.snlog"), players, snake_length, ticks)
+            samples = []
+            report = replay_simulation(path, tick_seconds=samples)
+            results[f"replay.tick.{name}"] = summarize(samples)
+            results[f"replay.throughput.{name}"] = rate(report["ticks"], sum(samples), "ticks/s")
+    return results
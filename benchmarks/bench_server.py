@@ -0,0 +1,134 @@
+"""
+GameServer 벤치마크: broadcast_game_state 를 플레이어 수/뱀 길이별로 측정하고,
+틱 끝 묶음 전송(flush_clients)에서의 송신 시스템 콜 수와 입력 반영 지연을 측정.
+"""
+import random
+import socket
+import threading
+import time
+
+from codec import KEEPALIVE, encode
+from common import drain, measure, rate, summarize, tcp_pair, wait_for_port
+from outbox import Outbox
+from protocol import MessageStream
+from server import GameServer
+
+
+def make_server(players, snake_length, stalled=0):
+    """
+    루프백 클라이언트가 연결된 GameServer 생성 (accept 루프는 실행하지 않음).
+    :param stalled: 전혀 읽지 않는 클라이언트 수 (송신 버퍼를 작게 잡아 금방 가득 차게 함)
+    """
+    server = GameServer(port=0)
+    peers = []
+    for index in range(players):
+        server_side, client_side = tcp_pair()
+        if index < stalled:
+            server_side.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+            client_side.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        server.clients[server_side] = {
+            "snake": [(random.randint(0, 19), random.randint(0, 19)) for _ in range(snake_length)],
+            "score": 0,
+            "room": None,
+            "world": server.world,
+            "outbox": Outbox(server_side),
+        }
+        if index >= stalled:
+            drain(client_side)
+        peers.append(client_side)
+    return server, peers
+
+
+def close_server(server, peers):
+    for conn in list(server.clients):
+        server.disconnect_client(conn)
+    for peer in peers:
+        peer.close()
+    server.server.close()
+
+
+def broadcast_tick(server):
+    """한 틱의 송신 비용: 방송으로 송신 큐에 넣고 틱 끝처럼 모두 전송"""
+    server.broadcast_game_state()
+    server.flush_clients()
+
+
+def bench_coalescing(players, duration):
+    """
+    players 명이 100Hz 로 이동을 보내는 동안 서버의 초당 send 호출 수와
+    자기 입력이 반영된 상태를 받기까지의 지연 측정.
+    """
+    server = GameServer(port=0)
+    threading.Thread(target=server.start, daemon=True).start()
+    address = ('localhost', server.server.getsockname()[1])
+    wait_for_port(address)
+    latencies = []
+    stop = threading.Event()
+
+    def player(index):
+        sock = socket.create_connection(address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.sendall(KEEPALIVE)  # 참가 패킷
+        time.sleep(0.1)
+        sent_at = {}
+        stream = MessageStream()  # recv 경계에서 잘린 상태는 다음 recv 와 이어 붙임
+        sock.settimeout(0.001)
+        tick = 0
+        while not stop.is_set():
+            tick += 1
+            sent_at[tick] = time.perf_counter()
+            sock.sendall(encode({"move": [(index % 20, tick % 20)], "score": tick * 100 + index}))
+            deadline = time.perf_counter() + 0.01
+            while time.perf_counter() < deadline:
+                try:
+                    data = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return
+                for state in stream.feed(data):
+                    mine = [score for score in state.get("scores", {}).values() if score % 100 == index]
+                    seen = max(mine, default=0) // 100
+                    if seen in sent_at:
+                        latencies.append(time.perf_counter() - sent_at.pop(seen))
+        sock.close()
+
+    threads = [threading.Thread(target=player, args=(index,)) for index in range(1, players + 1)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    writes_before = server.writes_total.values.get((), 0)
+    start = time.perf_counter()
+    time.sleep(duration)
+    writes = server.writes_total.values.get((), 0) - writes_before
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.server.close()
+    return rate(writes, elapsed, 'writes/s'), summarize(latencies, unit='ms')
+
+
+def run(quick=False):
+    iterations = 200 if quick else 2000
+    results = {}
+    for players in (2, 8, 32):
+        for snake_length in (1, 20, 100):
+            server, peers = make_server(players, snake_length)
+            try:
+                samples = measure(lambda: broadcast_tick(server), iterations, warmup=20)
+            finally:
+                close_server(server, peers)
+            results[f"server.broadcast.p{players}.len{snake_length}"] = summarize(samples)
+    # 읽지 않는 클라이언트가 섞여 있어도 방송이 막히지 않는지 (송신 큐가 넘치면 오래된 상태를 버림)
+    server, peers = make_server(8, 20, stalled=1)
+    try:
+        samples = measure(lambda: broadcast_tick(server), iterations, warmup=20)
+    finally:
+        close_server(server, peers)
+    results["server.broadcast.p8.len20.stalled1"] = summarize(samples)
+    writes, latency = bench_coalescing(8, 1.0 if quick else 3.0)
+    writes["better"] = "lower"  # 같은 부하에서 시스템 콜이 적을수록 좋음
+    results["server.writes.p8"] = writes
+    results["server.input_latency.p8"] = latency
+    return results
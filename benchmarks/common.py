@@ -0,0 +1,89 @@
+"""
+벤치마크 공용 도구.
+ver8 모듈 경로 설정, 루프백 소켓 생성, 측정/요약 함수를 제공.
+"""
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAM_DIR = os.path.join(ROOT, 'Program', 'ver8')  # 벤치마크 대상 (최신 버전)
+if PROGRAM_DIR not in sys.path:
+    sys.path.insert(0, PROGRAM_DIR)
+os.environ.setdefault("SNAKE_LOG_LEVEL", "warning")  # 접속/해제 로그가 측정 결과 출력을 덮지 않도록
+
+
+def free_port(host='localhost'):
+    """사용 가능한 루프백 포트 번호 반환"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def tcp_pair():
+    """루프백 TCP로 연결된 소켓 쌍 생성 (socketpair 대신 실제 TCP 경로 사용)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        left = socket.create_connection(listener.getsockname())
+        right, _ = listener.accept()
+    return left, right
+
+
+def drain(sock):
+    """상대 소켓이 닫힐 때까지 받은 데이터를 버리는 쓰레드 시작"""
+    def run():
+        try:
+            while sock.recv(65536):
+                pass
+        except OSError:
+            pass
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for_port(address, timeout=5.0):
+    """서버가 연결을 받을 수 있을 때까지 대기"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection(address, timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError(f"{address} did not start listening")
+
+
+def measure(fn, iterations, warmup=0):
+    """fn 을 반복 실행하고 각 실행 시간(초) 목록 반환"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples, unit='us'):
+    """시간 샘플을 중앙값/p95 지표로 요약 (낮을수록 좋음)"""
+    scale = {'s': 1, 'ms': 1e3, 'us': 1e6}[unit]
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "value": statistics.median(ordered) * scale,
+        "p95": p95 * scale,
+        "unit": unit,
+        "better": "lower",
+        "samples": len(ordered),
+    }
+
+
+def rate(amount, seconds, unit):
+    """처리량 지표 (높을수록 좋음)"""
+    return {"value": amount / seconds, "unit": unit, "better": "higher"}
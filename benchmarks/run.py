@@ -0,0 +1,87 @@
+"""
+벤치마크 실행기.
+
+    python benchmarks/run.py                          # 전체 실행, 결과를 benchmarks/results.json 에 저장
+    python benchmarks/run.py --quick --only codec     # 일부만 빠르게 실행
+    python benchmarks/run.py --compare benchmarks/baseline.json --threshold 0.15
+
+--compare 를 주면 기준 결과와 비교하여 임계값 이상 나빠진 지표가 있으면 종료 코드 1 로 끝남.
+"""
+import argparse
+import importlib
+import json
+import platform
+import sys
+import time
+
+import common  # noqa: F401  (Program/ver8 경로 설정)
+
+SUITES = ["codec", "server", "balancer", "impairment", "replay"]  # bench_<이름>.py 모듈
+
+
+def run_suites(names, quick):
+    """선택한 스위트를 실행하고 {지표 이름: 결과} 반환"""
+    metrics = {}
+    for name in names:
+        module = importlib.import_module(f"bench_{name}")
+        start = time.perf_counter()
+        metrics.update(module.run(quick=quick))
+        print(f"[{name}] done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return metrics
+
+
+def compare(current, baseline, threshold):
+    """
+    기준 결과 대비 회귀 지표 목록 반환.
+    :param threshold: 허용 비율 (0.15 = 15% 까지 허용)
+    :return: (이름, 기준값, 현재값, 변화율) 목록
+    """
+    regressions = []
+    for name, base in baseline.items():
+        if name not in current or not base["value"]:
+            continue
+        value = current[name]["value"]
+        change = (value - base["value"]) / base["value"]
+        if base.get("better", "lower") == "higher":
+            change = -change  # 처리량은 줄어들면 회귀
+        marker = "REGRESSION" if change > threshold else ""
+        print(f"{name:45s} {base['value']:12.2f} -> {value:12.2f} {base['unit']:5s} {change:+7.1%} {marker}")
+        if change > threshold:
+            regressions.append((name, base["value"], value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snake game benchmarks")
+    parser.add_argument('--only', action='append', choices=SUITES, help='Run only the given suite (repeatable)')
+    parser.add_argument('--quick', action='store_true', help='Fewer iterations for a fast smoke run')
+    parser.add_argument('--output', default='benchmarks/results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed regression ratio (default 0.15)')
+    args = parser.parse_args()
+
+    metrics = run_suites(args.only or SUITES, args.quick)
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "metrics": metrics,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["metrics"]
+        regressions = compare(metrics, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed more than {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()